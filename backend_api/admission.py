@@ -0,0 +1,123 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        """
+        Raised when a request is not admitted.
+
+        Parameters
+        ----------
+        retry_after : int
+            Seconds the client should wait before retrying.
+        """
+        super().__init__(f"server is saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Abandoned(Exception):
+    """
+    Raised when a waiting request is given up on before it got a slot.
+    """
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = 1, max_queued: int = 8, smoothing: float = 0.2):
+        """
+        Bound the generations running and waiting in the server.
+
+        Requests beyond ``max_queued`` waiting ones are rejected at once, and
+        waiting requests give up when their deadline passes, so an overload
+        sheds work instead of growing a backlog that makes every request late.
+
+        Parameters
+        ----------
+        max_concurrent : int, default=1
+            Generations running at the same time.
+        max_queued : int, default=8
+            Requests allowed to wait for a running slot.
+        smoothing : float, default=0.2
+            Weight of the latest request in the moving average of service
+            times used for ``Retry-After``.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.smoothing = smoothing
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.service_time = 1.0
+
+    def retry_after(self) -> int:
+        """
+        Estimate when the current backlog will have drained, in whole seconds.
+        """
+        backlog = self.running + self.waiting
+        return max(1, math.ceil(backlog * self.service_time / self.max_concurrent))
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "rejected": self.rejected,
+            "service_time": self.service_time,
+        }
+
+    @asynccontextmanager
+    async def admit(
+        self, timeout: "float | None" = None, abandoned: "asyncio.Future | None" = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold a running slot for the duration of the block.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait for a slot, usually the time left until the
+            request's deadline.
+        abandoned : asyncio.Future, optional
+            Completes when the request is no longer wanted, e.g. its client
+            disconnected, which takes it out of the queue.
+
+        Raises
+        ------
+        Overloaded
+            When the queue is full or no slot frees up in time.
+        Abandoned
+            When ``abandoned`` completes while the request waits for a slot.
+        """
+        if self.semaphore.locked() and self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+
+        self.waiting += 1
+        acquire = asyncio.ensure_future(asyncio.wait_for(self.semaphore.acquire(), timeout))
+        try:
+            if abandoned is not None:
+                await asyncio.wait({acquire, abandoned}, return_when=asyncio.FIRST_COMPLETED)
+                if not acquire.done():
+                    acquire.cancel()
+                    raise Abandoned()
+            await acquire
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded(self.retry_after()) from None
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self.semaphore.release()
+            elapsed = time.monotonic() - start
+            self.service_time += self.smoothing * (elapsed - self.service_time)
@@ -1,9 +1,26 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
+from src.backends.http_backend import write_discovery_file
+from src.cancellation import CancellationToken, cancellation_scope
+from starlette.concurrency import run_in_threadpool
 
-from backend_api.llm import get_local_llm_output, get_replicate_llm_output
+from backend_api import config
+from backend_api.admission import Abandoned, AdmissionController, Overloaded
+from backend_api.llm import (backend, get_local_llm_batch_output,
+                             get_local_llm_output, get_replicate_llm_output)
+from backend_api.tree_cache import tree_cache
 
 app = FastAPI()
+admission = AdmissionController(
+    config.max_concurrent or (backend.capabilities.concurrency if backend is not None else 1),
+    config.max_queued,
+)
+
+DISCONNECT_POLL_INTERVAL = 0.1
 
 
 class GetDocsString(BaseModel):
@@ -11,17 +28,181 @@ class GetDocsString(BaseModel):
     commented: bool = True
     source: str
     code: str
+    max_new_tokens: Optional[int] = None
+    context: Optional[str] = None
+    uri: Optional[str] = None
+    version: Optional[int] = None
+    location: Optional[int] = None
+    timeout: Optional[float] = None
+    adapter: Optional[str] = None
+
+
+class BatchItem(BaseModel):
+    code: str
+    max_new_tokens: Optional[int] = None
+    adapter: Optional[str] = None
+
+
+class GetDocsStringBatch(BaseModel):
+    languageId: str
+    source: str
+    items: List[BatchItem]
+    timeout: Optional[float] = None
+    adapter: Optional[str] = None
+
+
+@app.on_event("startup")
+def advertise_server():
+    if config.server_url:
+        write_discovery_file(config.server_url, config.backend)
+
+
+@app.get("/health")
+def health():
+    return {
+        "status": "ok",
+        "backend": config.backend,
+        "capabilities": backend.capabilities.to_dict() if backend is not None else None,
+        "admission": admission.stats(),
+    }
+
+
+def check_backend():
+    if backend is None:
+        raise HTTPException(status_code=503, detail="no local model is loaded")
+
+
+def check_adapters(adapters: List[Optional[str]]):
+    unknown = sorted(
+        {adapter for adapter in adapters if adapter is not None}
+        - set(backend.capabilities.adapters)
+    )
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"unknown adapters {', '.join(unknown)}")
+
+
+def run_cancellable(token: CancellationToken, function, *args):
+    with cancellation_scope(token):
+        return function(*args)
+
+
+async def watch_disconnect(request: Request, token: CancellationToken):
+    # runs past the deadline, so a disconnect is not mistaken for an expiry
+    while not token.event.is_set():
+        if await request.is_disconnected():
+            token.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+async def run_admitted(request: Request, timeout: Optional[float], function, *args):
+    """
+    Run a generation under admission control, a deadline and disconnect checks.
+
+    Parameters
+    ----------
+    request : Request
+        The request being served, polled for a client disconnect.
+    timeout : float, optional
+        Seconds the client is willing to wait, defaults to the server's
+        request timeout, without a deadline when neither is set.
+    function : callable
+        The blocking generation, run in the thread pool.
+    *args
+        Arguments of ``function``.
+
+    Returns
+    -------
+    object
+        The result of ``function``.
+
+    Raises
+    ------
+    HTTPException
+        429 with ``Retry-After`` when the server is saturated, 499 when the
+        client went away and 504 when the deadline cut the generation short.
+    """
+    timeout = timeout or config.request_timeout
+    token = CancellationToken(time.monotonic() + timeout if timeout else None)
+    # watched while queued too, a request whose client left never takes a slot
+    watcher = asyncio.create_task(watch_disconnect(request, token))
+    try:
+        async with admission.admit(token.remaining(), abandoned=watcher):
+            result = await run_in_threadpool(run_cancellable, token, function, *args)
+    except Overloaded as err:
+        raise HTTPException(
+            status_code=429, detail=str(err), headers={"Retry-After": str(err.retry_after)}
+        )
+    except Abandoned:
+        raise HTTPException(status_code=499, detail="client closed request")
+    finally:
+        watcher.cancel()
+
+    # a generation that stopped early has an incomplete output, one that
+    # finished just after the deadline is still returned
+    if token.interrupted and token.event.is_set():
+        raise HTTPException(status_code=499, detail="client closed request")
+    if token.interrupted:
+        raise HTTPException(status_code=504, detail="deadline exceeded")
+    return result
 
 
 @app.post("/generate_docs")
-def get_new_text(generate_docs_string: GetDocsString):
-    generate_docs_json = generate_docs_string.dict()
+async def get_new_text(generate_docs_string: GetDocsString, request: Request):
+    check_backend()
+    check_adapters([generate_docs_string.adapter])
+    return await run_admitted(
+        request, generate_docs_string.timeout, document_function, generate_docs_string.dict()
+    )
+
+
+def document_function(generate_docs_json: dict) -> dict:
+    code = generate_docs_json["code"]
+
+    # the document is only parsed to find the function under the cursor
+    if (
+        not code
+        and generate_docs_json["languageId"] == "python"
+        and generate_docs_json["uri"]
+        and generate_docs_json["context"] is not None
+        and generate_docs_json["location"] is not None
+    ):
+        code = (
+            tree_cache.enclosing_function(
+                generate_docs_json["uri"],
+                generate_docs_json["version"],
+                generate_docs_json["context"],
+                generate_docs_json["location"],
+            )
+            or code
+        )
+
     docstring = get_local_llm_output(
-        generate_docs_json["code"], generate_docs_json["languageId"]
+        code,
+        generate_docs_json["languageId"],
+        generate_docs_json["max_new_tokens"],
+        generate_docs_json["adapter"],
     )
     return {"docstring": docstring, "position": "below", "cursorMarker": None}
 
 
+@app.post("/generate_docs_batch")
+async def get_new_texts(generate_docs_batch: GetDocsStringBatch, request: Request):
+    check_backend()
+    adapters = [item.adapter or generate_docs_batch.adapter for item in generate_docs_batch.items]
+    check_adapters(adapters)
+    docstrings = await run_admitted(
+        request,
+        generate_docs_batch.timeout,
+        get_local_llm_batch_output,
+        [item.code for item in generate_docs_batch.items],
+        generate_docs_batch.languageId,
+        [item.max_new_tokens for item in generate_docs_batch.items],
+        adapters,
+    )
+    return {"docstrings": docstrings}
+
+
 @app.post("/get_sample_output")
 def get_sample_out():
     return {"docstring": "A" * 20, "position": "below", "cursorMarker": None}
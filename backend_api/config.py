@@ -1,4 +1,37 @@
 import os
 
+from src.adapters import parse_adapters
+
 load_local = True
 model_path = "manijhriya/phi2-doctify"
+draft_model_path = os.environ.get("DOCTIFY_DRAFT_MODEL")
+prefill_skeleton = os.environ.get("DOCTIFY_PREFILL_SKELETON", "") == "1"
+compiled = os.environ.get("DOCTIFY_COMPILE", "") == "1"
+# LoRA adapters served on the one base model, "name=path,name=path"
+adapters = parse_adapters(os.environ.get("DOCTIFY_ADAPTERS"))
+max_loaded_adapters = int(os.environ.get("DOCTIFY_MAX_LOADED_ADAPTERS", 4))
+backend = os.environ.get("DOCTIFY_BACKEND", "transformers")
+backend_options = {
+    "transformers": {
+        "model_name": model_path,
+        "draft_model_name": draft_model_path,
+        "prefill_skeleton": prefill_skeleton,
+        "compiled": compiled,
+        "adapters": adapters,
+        "max_loaded_adapters": max_loaded_adapters,
+    },
+    "fake": {
+        "latency": float(os.environ.get("DOCTIFY_FAKE_LATENCY", 0)),
+        "seconds_per_token": float(os.environ.get("DOCTIFY_FAKE_SECONDS_PER_TOKEN", 0)),
+        "adapters": sorted(adapters),
+    },
+}
+# advertised to local clients, set by ``python -m backend_api.serve`` to the
+# address it bound; nothing is advertised when unknown
+server_url = os.environ.get("DOCTIFY_SERVER_URL")
+# admission control, max_concurrent defaults to the backend's concurrency
+max_concurrent = int(os.environ.get("DOCTIFY_MAX_CONCURRENT", 0)) or None
+max_queued = int(os.environ.get("DOCTIFY_MAX_QUEUED", 8))
+# used when the client sends no timeout, generous for a slow CPU generation
+# but finite, so a stuck request still frees its slot; 0 disables it
+request_timeout = float(os.environ.get("DOCTIFY_REQUEST_TIMEOUT", 120)) or None
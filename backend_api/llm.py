@@ -1,10 +1,14 @@
 import replicate
-from src.inference import Inference
+from src.backends import create_backend
 
 from backend_api import config, prompts
 
 if config.load_local:
-    inference = Inference(config.model_path)
+    backend = create_backend(
+        config.backend, **config.backend_options.get(config.backend, {})
+    )
+else:
+    backend = None
 
 REPLICATE_EP = "meta/llama-2-70b-chat:02e509c789964a7ea8736978a43525956ef40397be9033abf9fd2badfe68c9e3"
 
@@ -45,7 +49,9 @@ def get_replicate_llm_output(code, language):
     return "".join(output["output"])
 
 
-def get_local_llm_output(code: str, language: str):
+def get_local_llm_output(
+    code: str, language: str, max_new_tokens: "int | None" = None, adapter: "str | None" = None
+):
     """
     Get the local llm output.
 
@@ -55,10 +61,62 @@ def get_local_llm_output(code: str, language: str):
         The code to be compiled.
     language : str
         The language to be compiled.
+    max_new_tokens : int, optional
+        The maximum number of generated tokens.
+    adapter : str, optional
+        The adapter to generate with, the base model by default.
 
     Returns
     -------
     str
         The local llm output.
     """
-    return inference.generate_docstring(code=code, language=language)
+    return backend.generate(
+        code, language=language, max_new_tokens=max_new_tokens, adapter=adapter
+    )
+
+
+def get_local_llm_batch_output(
+    codes: list[str],
+    language: str,
+    max_new_tokens: "list[int | None] | None" = None,
+    adapters: "list[str | None] | None" = None,
+):
+    """
+    Get the local llm output for several functions at once.
+
+    Functions asking for the same adapter are generated as one batch, so a
+    batch mixing styles costs one call per adapter.
+
+    Parameters
+    ----------
+    codes : list of str
+        The functions to document.
+    language : str
+        The language of the functions.
+    max_new_tokens : list of int, optional
+        The maximum number of generated tokens of each function.
+    adapters : list of str, optional
+        The adapter of each function, None for the base model.
+
+    Returns
+    -------
+    list of str
+        The docstrings, in input order.
+    """
+    max_new_tokens = max_new_tokens or [None] * len(codes)
+    groups = {}
+    for index, adapter in enumerate(adapters or [None] * len(codes)):
+        groups.setdefault(adapter, []).append(index)
+
+    docstrings = [None] * len(codes)
+    for adapter, indices in groups.items():
+        outputs = backend.generate_batch(
+            [codes[index] for index in indices],
+            language=language,
+            max_new_tokens=[max_new_tokens[index] for index in indices],
+            adapter=adapter,
+        )
+        for index, docstring in zip(indices, outputs):
+            docstrings[index] = docstring
+    return docstrings
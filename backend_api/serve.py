@@ -0,0 +1,43 @@
+import argparse
+import os
+import socket
+
+import uvicorn
+
+
+def bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def main():
+    """
+    Serve ``backend_api.app`` and advertise the address it is bound to.
+
+    The socket is bound before the app is imported, so the discovery file
+    names the port actually listened on, also with ``--port 0``.
+    """
+    parser = argparse.ArgumentParser(prog="python -m backend_api.serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--log-level", default="info")
+    parsed_args = parser.parse_args()
+
+    sock = bind(parsed_args.host, parsed_args.port)
+    host, port = sock.getsockname()[:2]
+    # a wildcard bind is reached through loopback by local clients
+    if host in ("0.0.0.0", "::"):
+        host = "localhost"
+    elif ":" in host:
+        host = f"[{host}]"
+    os.environ["DOCTIFY_SERVER_URL"] = f"http://{host}:{port}"
+
+    config = uvicorn.Config("backend_api.app:app", log_level=parsed_args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import bisect
+import re
+import threading
+from collections import OrderedDict
+
+import tree_sitter
+from src.constants import Language
+from src.treesitter import Treesitter
+
+RE_ASTRAL = re.compile("[\U00010000-\U0010ffff]")
+
+
+def common_prefix_length(old: bytes, new: bytes) -> int:
+    """
+    Length of the common prefix of two byte strings.
+
+    Binary search over slice comparisons keeps the work in ``memcmp``.
+    """
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old[:mid] == new[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def common_suffix_length(old: bytes, new: bytes, limit: int) -> int:
+    """
+    Length of the common suffix of two byte strings, at most ``limit``.
+    """
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old[len(old) - mid :] == new[len(new) - mid :]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def point_at(source: bytes, byte_offset: int) -> tuple[int, int]:
+    row = source.count(b"\n", 0, byte_offset)
+    return row, byte_offset - (source.rfind(b"\n", 0, byte_offset) + 1)
+
+
+def compute_edit(old: bytes, new: bytes) -> "dict | None":
+    """
+    Describe the change between two versions of a document as one edit.
+
+    Parameters
+    ----------
+    old : bytes
+        The previous source.
+    new : bytes
+        The current source.
+
+    Returns
+    -------
+    dict or None
+        Keyword arguments for ``tree_sitter.Tree.edit``, or None when the
+        sources are identical.
+    """
+    if old == new:
+        return None
+    start = common_prefix_length(old, new)
+    suffix = common_suffix_length(old, new, min(len(old), len(new)) - start)
+    old_end, new_end = len(old) - suffix, len(new) - suffix
+    return {
+        "start_byte": start,
+        "old_end_byte": old_end,
+        "new_end_byte": new_end,
+        "start_point": point_at(old, start),
+        "old_end_point": point_at(old, old_end),
+        "new_end_point": point_at(new, new_end),
+    }
+
+
+class CachedDocument:
+    __slots__ = ("version", "text", "source", "tree", "astral")
+
+    def __init__(self, version: "int | None", text: str, source: bytes, tree: tree_sitter.Tree):
+        """
+        One version of a document and its parse tree.
+
+        Parameters
+        ----------
+        version : int, optional
+            The editor's document version.
+        text : str
+            The document text.
+        source : bytes
+            The UTF-8 encoded text.
+        tree : tree_sitter.Tree
+            The parse tree, edited in place for the next version.
+        """
+        self.version = version
+        self.text = text
+        self.source = source
+        self.tree = tree
+        # UTF-16 offsets of the characters outside the BMP, found on the
+        # first offset conversion of a non-ASCII document
+        self.astral: "list[int] | None" = None
+
+    def byte_offset(self, utf16_offset: int) -> int:
+        """
+        Convert an editor offset in UTF-16 code units to a UTF-8 byte offset.
+        """
+        if len(self.text) == len(self.source):
+            return utf16_offset
+        if self.astral is None:
+            self.astral = [
+                match.start() + index for index, match in enumerate(RE_ASTRAL.finditer(self.text))
+            ]
+        # every astral character starting before the offset takes two code
+        # units; an offset inside one rounds down to the character start
+        index = utf16_offset - bisect.bisect_left(self.astral, utf16_offset)
+        return len(self.text[:index].encode())
+
+
+class DocumentTreeCache:
+    def __init__(self, max_documents: int = 64):
+        """
+        Bounded LRU of parse trees keyed by document URI.
+
+        A new version of a cached document is applied to the tree of the
+        previous version with ``Tree.edit`` and reparsed incrementally. Trees
+        are only read under the cache's lock, so editing them in place never
+        races a reader.
+
+        Parameters
+        ----------
+        max_documents : int, default=64
+            Documents kept before the least recently used one is evicted.
+        """
+        self.max_documents = max_documents
+        self.treesitter = Treesitter.create_treesitter(Language.PYTHON)
+        self.documents: "OrderedDict[str, CachedDocument]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _update(self, uri: str, version: "int | None", text: str) -> CachedDocument:
+        document = self.documents.pop(uri, None)
+        if document is not None and version is not None and document.version == version:
+            self.documents[uri] = document
+            return document
+
+        source = text.encode()
+        edit = None if document is None else compute_edit(document.source, source)
+        if document is None:
+            tree = self.treesitter.parser.parse(source)
+        elif edit is None:
+            tree = document.tree
+        else:
+            document.tree.edit(**edit)
+            tree = self.treesitter.parser.parse(source, document.tree)
+
+        self.documents[uri] = CachedDocument(version, text, source, tree)
+        while len(self.documents) > self.max_documents:
+            self.documents.popitem(last=False)
+        return self.documents[uri]
+
+    def enclosing_function(
+        self, uri: str, version: "int | None", text: str, utf16_offset: int
+    ) -> "str | None":
+        """
+        Find the innermost function around a cursor position.
+
+        Parameters
+        ----------
+        uri : str
+            The document URI.
+        version : int, optional
+            The editor's document version. When it matches the cached
+            version the text is assumed unchanged and not reparsed.
+        text : str
+            The full document text.
+        utf16_offset : int
+            The cursor position in UTF-16 code units, as editors count it.
+
+        Returns
+        -------
+        str or None
+            The function source, or None when the cursor is not inside a
+            function.
+        """
+        with self.lock:
+            document = self._update(uri, version, text)
+            byte_offset = document.byte_offset(utf16_offset)
+            node = document.tree.root_node.descendant_for_byte_range(byte_offset, byte_offset)
+            while node is not None and node.type != "function_definition":
+                node = node.parent
+            return None if node is None else node.text.decode()
+
+
+tree_cache = DocumentTreeCache()
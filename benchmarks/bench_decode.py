@@ -0,0 +1,143 @@
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from benchmarks.bench_load import percentile
+from benchmarks.bench_pipeline import git_commit
+from benchmarks.bench_sharding import synthetic_functions
+from src import doctify
+
+
+def bench_mode(model_name: str, compiled: bool, codes: list[str], max_new_tokens: int) -> dict:
+    """
+    Load the model in one decoding mode and time greedy generation.
+
+    Parameters
+    ----------
+    model_name : str
+        The model to load.
+    compiled : bool
+        Use the static cache and compiled decode step.
+    codes : list of str
+        Functions documented one at a time.
+    max_new_tokens : int
+        Token budget of every generation.
+
+    Returns
+    -------
+    dict
+        Load and compilation time, the first call on its own, and per-token
+        latency percentiles over the remaining calls.
+    """
+    # torch is only imported once a local mode is benchmarked
+    from src.inference import DEVICE, Inference
+
+    start = time.perf_counter()
+    inference = Inference(model_name, compiled=compiled)
+    load_seconds = time.perf_counter() - start
+
+    calls = []
+    for code in codes:
+        tokens_before = inference.generated_tokens
+        start = time.perf_counter()
+        inference.generate_docstring(code, max_new_tokens=max_new_tokens)
+        seconds = time.perf_counter() - start
+        calls.append((seconds, inference.generated_tokens - tokens_before))
+    compiled_active = inference.static_cache is not None
+    compile_seconds = inference.compile_seconds
+    inference.close_llm()
+
+    first_seconds, _ = calls[0]
+    steady = calls[1:] or calls
+    per_token = [seconds / tokens for seconds, tokens in steady if tokens]
+    seconds = sum(seconds for seconds, _ in steady)
+    tokens = sum(tokens for _, tokens in steady)
+    return {
+        "mode": "compiled" if compiled else "eager",
+        "compiled_active": compiled_active,
+        "device": DEVICE,
+        "load_seconds": load_seconds,
+        "compile_seconds": compile_seconds,
+        "first_call_seconds": first_seconds,
+        "seconds_per_call": seconds / len(steady),
+        "tokens": tokens,
+        "tokens_per_second": tokens / seconds if seconds else 0.0,
+        "token_latency_p50": percentile(per_token, 50),
+        "token_latency_p95": percentile(per_token, 95),
+    }
+
+
+def run_benchmark(model_name: str, functions: int, max_new_tokens: int) -> dict:
+    """
+    Compare eager decoding against the compiled static cache path.
+
+    Parameters
+    ----------
+    model_name : str
+        The model to load.
+    functions : int
+        Functions documented per mode.
+    max_new_tokens : int
+        Token budget of every generation.
+
+    Returns
+    -------
+    dict
+        The results of both modes, the speedup of a decode token and the
+        number of calls after which the compilation has paid for itself.
+    """
+    import torch
+
+    codes = synthetic_functions(functions)
+    eager = bench_mode(model_name, False, codes, max_new_tokens)
+    compiled = bench_mode(model_name, True, codes, max_new_tokens)
+
+    saved_per_call = eager["seconds_per_call"] - compiled["seconds_per_call"]
+    extra_load = compiled["load_seconds"] - eager["load_seconds"]
+    return {
+        "commit": git_commit(),
+        "model": model_name,
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+        "cpu_count": os.cpu_count(),
+        "functions": functions,
+        "max_new_tokens": max_new_tokens,
+        "results": [eager, compiled],
+        "token_speedup": (
+            eager["token_latency_p50"] / compiled["token_latency_p50"]
+            if eager["token_latency_p50"] and compiled["token_latency_p50"]
+            else None
+        ),
+        "break_even_calls": extra_load / saved_per_call if saved_per_call > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-token decode latency of eager against compiled static cache decoding."
+    )
+    parser.add_argument("--model", default=doctify.model_name)
+    parser.add_argument("--functions", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (default: torch's).")
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.threads:
+        import torch
+
+        torch.set_num_threads(args.threads)
+    results = json.dumps(
+        run_benchmark(args.model, args.functions, args.max_new_tokens), indent=2
+    )
+    if args.output:
+        Path(args.output).write_text(results)
+    print(results)
+
+
+if __name__ == "__main__":
+    main()
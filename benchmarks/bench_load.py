@@ -0,0 +1,345 @@
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from benchmarks.bench_pipeline import git_commit
+from benchmarks.bench_sharding import synthetic_functions
+from src.backends.http_backend import server_is_alive
+from src.shards import dataset_shards, read_shards
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, fake_latency: float, seconds_per_token: float) -> subprocess.Popen:
+    """
+    Start ``backend_api.app`` with the fake backend and wait until it answers.
+
+    The admission settings (``DOCTIFY_MAX_CONCURRENT``, ``DOCTIFY_MAX_QUEUED``,
+    ``DOCTIFY_REQUEST_TIMEOUT``) are passed through from the environment.
+    """
+    discovery_file = Path(tempfile.gettempdir()) / f"doctify-load-{port}.json"
+    env = {
+        **os.environ,
+        "DOCTIFY_BACKEND": "fake",
+        "DOCTIFY_FAKE_LATENCY": str(fake_latency),
+        "DOCTIFY_FAKE_SECONDS_PER_TOKEN": str(seconds_per_token),
+        "DOCTIFY_SERVER_URL": f"http://127.0.0.1:{port}",
+        "DOCTIFY_DISCOVERY_FILE": str(discovery_file),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend_api.app:app", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while not server_is_alive(url):
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            raise RuntimeError("the doctify server did not start")
+        time.sleep(0.1)
+    return server
+
+
+def sample_payloads(data: list[Path], count: int, seed: int = 0) -> list[dict]:
+    """
+    Build ``/generate_docs`` payloads like the editor extension sends.
+
+    Parameters
+    ----------
+    data : list of Path
+        Scraper JSONL files or directories. Synthetic functions are used
+        when empty.
+    count : int
+        Payloads to sample.
+    seed : int, default=0
+        Seed of the sampling.
+
+    Returns
+    -------
+    list of dict
+        The payloads, each with the function as code and document context.
+    """
+    rng = random.Random(seed)
+    if data:
+        shards = []
+        for path in data:
+            shards.extend(dataset_shards(path) if path.is_dir() else [path])
+        records = [
+            {"uri": f"file://{record['filaname']}", "code": record["code"]}
+            for record in read_shards(shards)
+            if record.get("code")
+        ]
+    else:
+        records = [
+            {"uri": f"file:///synthetic/module_{index}.py", "code": code}
+            for index, code in enumerate(synthetic_functions(count, seed))
+        ]
+
+    payloads = []
+    for _ in range(count):
+        record = rng.choice(records)
+        payloads.append(
+            {
+                "languageId": "python",
+                "source": "vscode",
+                "code": record["code"],
+                "context": record["code"],
+                "uri": record["uri"],
+                "version": rng.randint(1, 5),
+            }
+        )
+    return payloads
+
+
+def percentile(values: list[float], q: float) -> "float | None":
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+class LoadGenerator:
+    def __init__(self, url: str, payloads: list[dict], timeout: float = 60.0):
+        """
+        Send ``/generate_docs`` requests and record their outcome.
+
+        Parameters
+        ----------
+        url : str
+            Base URL of the server.
+        payloads : list of dict
+            Payloads, replayed round robin.
+        timeout : float, default=60.0
+            Client timeout of every request.
+        """
+        self.url = url.rstrip("/")
+        self.payloads = payloads
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=512))
+        self.results: list[tuple["int | str", float]] = []
+        self.lock = threading.Lock()
+        self.sent = 0
+
+    def next_payload(self) -> dict:
+        with self.lock:
+            payload = self.payloads[self.sent % len(self.payloads)]
+            self.sent += 1
+            return payload
+
+    def send(self, scheduled: "float | None" = None):
+        # open-loop latency counts from the scheduled arrival, so time spent
+        # waiting for a free client thread is not hidden
+        start = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            response = self.session.post(
+                f"{self.url}/generate_docs", json=self.next_payload(), timeout=self.timeout
+            )
+            status = response.status_code
+        except requests.Timeout:
+            status = "timeout"
+        except requests.RequestException:
+            status = "error"
+        with self.lock:
+            self.results.append((status, time.perf_counter() - start))
+
+    def run_closed_loop(self, concurrency: int, duration: float):
+        """
+        Keep ``concurrency`` requests in flight for ``duration`` seconds.
+        """
+        end = time.perf_counter() + duration
+
+        def worker():
+            while time.perf_counter() < end:
+                self.send()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open_loop(self, rate: float, duration: float, max_connections: int, seed: int = 0):
+        """
+        Send requests with exponential inter-arrival times at ``rate`` per second.
+        """
+        rng = random.Random(seed)
+        with ThreadPoolExecutor(max_workers=max_connections) as executor:
+            start = time.perf_counter()
+            arrival = start
+            while arrival < start + duration:
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.send, arrival)
+                arrival += rng.expovariate(rate)
+
+    def summary(self, seconds: float) -> dict:
+        statuses = Counter(str(status) for status, _ in self.results)
+        ok = [latency for status, latency in self.results if status == 200]
+        total = len(self.results)
+        return {
+            "requests": total,
+            "seconds": seconds,
+            "throughput": len(ok) / seconds if seconds else 0.0,
+            "latency_p50": percentile(ok, 50),
+            "latency_p95": percentile(ok, 95),
+            "latency_p99": percentile(ok, 99),
+            "error_rate": (total - len(ok)) / total if total else 0.0,
+            "rejected_rate": statuses["429"] / total if total else 0.0,
+            "statuses": dict(statuses),
+        }
+
+
+def run_benchmark(
+    url: str,
+    payloads: list[dict],
+    duration: float,
+    rate: "float | None",
+    concurrency: int,
+    max_connections: int,
+    timeout: float,
+) -> dict:
+    """
+    Replay payloads against a server and summarize the outcome.
+
+    Parameters
+    ----------
+    url : str
+        Base URL of the server.
+    payloads : list of dict
+        The ``/generate_docs`` payloads.
+    duration : float
+        Seconds to generate load for.
+    rate : float, optional
+        Arrivals per second of an open-loop run. A closed-loop run with
+        ``concurrency`` clients is used when None.
+    concurrency : int
+        Clients of a closed-loop run.
+    max_connections : int
+        Client threads of an open-loop run.
+    timeout : float
+        Client timeout of every request.
+
+    Returns
+    -------
+    dict
+        Throughput of successful requests, their latency percentiles,
+        error rates, status counts and the server's admission counters.
+    """
+    generator = LoadGenerator(url, payloads, timeout)
+    start = time.perf_counter()
+    if rate:
+        generator.run_open_loop(rate, duration, max_connections)
+    else:
+        generator.run_closed_loop(concurrency, duration)
+    seconds = time.perf_counter() - start
+
+    try:
+        health = requests.get(f"{url}/health", timeout=5).json()
+    except requests.RequestException:
+        health = {}
+    return {
+        "commit": git_commit(),
+        "mode": "open" if rate else "closed",
+        "rate": rate,
+        "concurrency": None if rate else concurrency,
+        **generator.summary(seconds),
+        "server": health.get("admission"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay /generate_docs traffic against a doctify server."
+    )
+    parser.add_argument(
+        "--url",
+        help="Server to load. By default a local server with the fake backend is started.",
+    )
+    parser.add_argument(
+        "--data",
+        type=Path,
+        nargs="*",
+        default=[],
+        help="Scraper JSONL files or directories to sample functions from "
+        "(default: synthetic functions).",
+    )
+    parser.add_argument("--payloads", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Open-loop arrivals per second. Without it, --concurrency clients "
+        "send requests back to back.",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--fake-latency",
+        type=float,
+        default=0.05,
+        help="Per-call latency of the local fake backend (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--fake-seconds-per-token",
+        type=float,
+        default=0.0,
+        help="Per-token latency of the local fake backend (default: %(default)s).",
+    )
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    payloads = sample_payloads(args.data, args.payloads)
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        server = start_server(port, args.fake_latency, args.fake_seconds_per_token)
+        url = f"http://127.0.0.1:{port}"
+    try:
+        results = run_benchmark(
+            url,
+            payloads,
+            args.duration,
+            args.rate,
+            args.concurrency,
+            args.max_connections,
+            args.timeout,
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(results)
+    print(results)
+
+
+if __name__ == "__main__":
+    main()
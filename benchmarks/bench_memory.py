@@ -0,0 +1,148 @@
+import argparse
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.bench_pipeline import git_commit
+from benchmarks.synthetic_repo import SyntheticRepoConfig, generate_repo
+from src.treesitter import TreesitterPython, read_source
+
+
+def rss_bytes() -> "int | None":
+    # resident memory, which unlike tracemalloc includes tree-sitter's native
+    # trees; only available on Linux
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+def rss_growth(func, filepaths: list[Path]) -> "int | None":
+    gc.collect()
+    before = rss_bytes()
+    rows = func(filepaths)
+    gc.collect()
+    after = rss_bytes()
+    del rows
+    return None if before is None else after - before
+
+
+def measure_rss(func, filepaths: list[Path]) -> "int | None":
+    # a fresh process per layout, so memory freed by an earlier run is not reused
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        return pool.apply(rss_growth, (func, filepaths))
+
+
+def measure(func) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, retained, peak
+
+
+def parse_records(filepaths: list[Path]) -> list:
+    parser = TreesitterPython()
+    records = []
+    for filepath in filepaths:
+        records.extend(parser.parse(read_source(filepath)))
+    return records
+
+
+def parse_and_decode(filepaths: list[Path]) -> list:
+    # records as they used to be built: the decoded name and source, plus the
+    # function and doc comment nodes, which keep every file's tree alive
+    parser = TreesitterPython()
+    records = []
+    for filepath in filepaths:
+        tree = parser.parser.parse(read_source(filepath))
+        for node in parser._query_all_methods(tree.root_node):
+            name = parser._query_method_name_node(node)
+            records.append(
+                (
+                    name.text.decode() if name is not None else None,
+                    parser._query_doc_comment_node(node),
+                    node.text.decode(),
+                    node,
+                )
+            )
+    return records
+
+
+def run_benchmark(config: SyntheticRepoConfig) -> dict:
+    """
+    Measure the memory held by the parsed function records of a repository.
+
+    ``tracemalloc`` only sees Python allocations, not the native trees that
+    tree-sitter nodes keep alive, so the retained resident memory of each
+    layout is also measured, in a fresh process, where ``/proc`` has it.
+
+    Parameters
+    ----------
+    config : SyntheticRepoConfig
+        The repository shape.
+
+    Returns
+    -------
+    dict
+        Retained and peak Python heap bytes and retained resident bytes,
+        with lazy records and with the decoded, tree-holding records.
+    """
+    with tempfile.TemporaryDirectory(prefix="doctify-bench-") as tmp:
+        filepaths = generate_repo(Path(tmp), config)
+        size = sum(filepath.stat().st_size for filepath in filepaths)
+
+        results = {}
+        for name, func in (("records", parse_records), ("decoded", parse_and_decode)):
+            rows, retained, peak = measure(lambda: func(filepaths))
+            results[name] = {
+                "functions": len(rows),
+                "retained_bytes": retained,
+                "peak_bytes": peak,
+                "retained_bytes_per_function": retained / max(len(rows), 1),
+                "retained_rss_bytes": measure_rss(func, filepaths),
+            }
+            del rows
+
+    return {
+        "commit": git_commit(),
+        "config": config.to_dict(),
+        "repo_bytes": size,
+        "memory": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure memory of parsed function records on a synthetic repository."
+    )
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--functions-per-file", type=int, default=20)
+    parser.add_argument("--body-lines", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    config = SyntheticRepoConfig(
+        files=args.files,
+        functions_per_file=args.functions_per_file,
+        body_lines=args.body_lines,
+        seed=args.seed,
+    )
+    results = json.dumps(run_benchmark(config), indent=2)
+    if args.output:
+        Path(args.output).write_text(results)
+    print(results)
+
+
+if __name__ == "__main__":
+    main()
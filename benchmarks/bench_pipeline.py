@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic_repo import SyntheticRepoConfig, generate_repo
+from src import doctify
+from src.backends import BackendRegistry
+from src.treesitter import TreesitterPython, read_source
+
+
+def git_commit() -> "str | None":
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def timed(func, *args, **kwargs) -> tuple:
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_walk(root: Path) -> dict:
+    filepaths, seconds = timed(doctify.list_python_files, root)
+    return {"seconds": seconds, "files": len(filepaths)}
+
+
+def bench_parse(filepaths: list[Path]) -> tuple[dict, list]:
+    parser = TreesitterPython()
+    contents = []
+    start = time.perf_counter()
+    functions = 0
+    for filepath in filepaths:
+        file_bytes = read_source(filepath)
+        nodes = parser.parse(file_bytes)
+        functions += len(nodes)
+        contents.extend(
+            {
+                "filepath": filepath,
+                "method_name": node.name,
+                "original_code": node.method_source_code,
+                "generated_docstring": f"Docstring of {node.name}.",
+            }
+            for node in nodes
+            if not node.has_doc_comment
+        )
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "functions": functions}, contents
+
+
+def bench_write(docstring_contents: list[dict]) -> dict:
+    _, seconds = timed(lambda: list(map(doctify.write_docsstring_to_file, docstring_contents)))
+    return {"seconds": seconds, "docstrings": len(docstring_contents)}
+
+
+def bench_end_to_end(root: Path, backend: str, backend_options: dict) -> dict:
+    doctify.configure_backend(backend, **backend_options)
+    inference = doctify.get_inference()
+    _, seconds = timed(doctify.generate_docstring_for_directory, root)
+    result = {"seconds": seconds, "backend": backend}
+    if backend == "fake":
+        result.update(calls=inference.calls, generated_tokens=inference.generated_tokens)
+    doctify.close_inference()
+    return result
+
+
+def run_benchmark(config: SyntheticRepoConfig, backend: str, backend_options: dict) -> dict:
+    """
+    Time every stage of a doctify run on a synthetic repository.
+
+    Parameters
+    ----------
+    config : SyntheticRepoConfig
+        The repository shape.
+    backend : str
+        The inference backend used for the end-to-end stage.
+    backend_options : dict
+        Keyword arguments for the backend.
+
+    Returns
+    -------
+    dict
+        The benchmark results.
+    """
+    with tempfile.TemporaryDirectory(prefix="doctify-bench-") as tmp:
+        source = Path(tmp) / "source"
+        filepaths = generate_repo(source, config)
+        size = sum(filepath.stat().st_size for filepath in filepaths)
+
+        stages = {"walk": bench_walk(source)}
+        stages["parse"], docstring_contents = bench_parse(filepaths)
+
+        write_root = Path(tmp) / "write"
+        shutil.copytree(source, write_root)
+        for content in docstring_contents:
+            content["filepath"] = write_root / content["filepath"].relative_to(source)
+        stages["write"] = bench_write(docstring_contents)
+
+        e2e_root = Path(tmp) / "end_to_end"
+        shutil.copytree(source, e2e_root)
+        stages["end_to_end"] = bench_end_to_end(e2e_root, backend, backend_options)
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": config.to_dict(),
+        "repo_bytes": size,
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark doctify stages on a synthetic repository."
+    )
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--functions-per-file", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--body-lines", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=BackendRegistry.names(), default="fake")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--seconds-per-token", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    config = SyntheticRepoConfig(
+        files=args.files,
+        functions_per_file=args.functions_per_file,
+        depth=args.depth,
+        body_lines=args.body_lines,
+        seed=args.seed,
+    )
+    backend_options = {}
+    if args.backend == "fake":
+        backend_options = {
+            "latency": args.latency,
+            "seconds_per_token": args.seconds_per_token,
+        }
+    results = json.dumps(run_benchmark(config, args.backend, backend_options), indent=2)
+    if args.output:
+        Path(args.output).write_text(results)
+    print(results)
+
+
+if __name__ == "__main__":
+    main()
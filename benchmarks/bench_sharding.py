@@ -0,0 +1,123 @@
+import argparse
+import json
+import logging
+import os
+import random
+import time
+from pathlib import Path
+
+from benchmarks.bench_pipeline import git_commit
+from benchmarks.synthetic_repo import SyntheticRepoConfig, generate_function
+from src.backends import BackendRegistry, create_backend
+
+
+def synthetic_functions(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    config = SyntheticRepoConfig(documented_ratio=0.0)
+    return [generate_function(rng, f"func_{index}", config, "", False) for index in range(count)]
+
+
+def run_benchmark(
+    backend: str,
+    backend_options: dict,
+    replica_counts: list[int],
+    functions: int,
+    threads_per_replica: "int | None",
+) -> dict:
+    """
+    Measure docstrings per second as the number of replicas grows.
+
+    Parameters
+    ----------
+    backend : str
+        The backend to replicate.
+    backend_options : dict
+        Keyword arguments for the backend.
+    replica_counts : list of int
+        The replica counts to measure.
+    functions : int
+        Functions documented per measurement.
+    threads_per_replica : int, optional
+        Cores per replica, an even split by default.
+
+    Returns
+    -------
+    dict
+        Throughput and speedup over one replica for every replica count.
+    """
+    codes = synthetic_functions(functions)
+    results = []
+    for replicas in replica_counts:
+        sharded = create_backend(
+            "sharded",
+            backend=backend,
+            replicas=replicas,
+            threads_per_replica=threads_per_replica,
+            backend_options=backend_options,
+        )
+        warmup_start = time.perf_counter()
+        sharded.warmup()
+        warmup_seconds = time.perf_counter() - warmup_start
+
+        start = time.perf_counter()
+        sharded.generate_batch(codes)
+        seconds = time.perf_counter() - start
+        sharded.close()
+
+        results.append(
+            {
+                "replicas": replicas,
+                "warmup_seconds": warmup_seconds,
+                "seconds": seconds,
+                "docstrings_per_second": functions / seconds,
+            }
+        )
+
+    baseline = results[0]["docstrings_per_second"]
+    for result in results:
+        result["speedup"] = result["docstrings_per_second"] / baseline
+    return {
+        "commit": git_commit(),
+        "backend": backend,
+        "cpu_count": os.cpu_count(),
+        "functions": functions,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure docstrings/sec scaling with the number of model replicas."
+    )
+    parser.add_argument("--backend", choices=BackendRegistry.names(), default="transformers")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads-per-replica", type=int)
+    parser.add_argument("--functions", type=int, default=64)
+    parser.add_argument(
+        "--fake-latency",
+        type=float,
+        default=0.05,
+        help="Per-call latency of the fake backend (default: %(default)s).",
+    )
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    backend_options = {"latency": args.fake_latency} if args.backend == "fake" else {}
+    results = json.dumps(
+        run_benchmark(
+            args.backend,
+            backend_options,
+            args.replicas,
+            args.functions,
+            args.threads_per_replica,
+        ),
+        indent=2,
+    )
+    if args.output:
+        Path(args.output).write_text(results)
+    print(results)
+
+
+if __name__ == "__main__":
+    main()
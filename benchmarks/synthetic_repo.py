@@ -0,0 +1,164 @@
+import random
+from pathlib import Path
+
+PARAMETER_NAMES = ["value", "items", "path", "config", "limit", "name", "data", "flag"]
+ANNOTATIONS = ["int", "str", "list[str]", "dict", "float", "bool", "Path", None]
+
+
+class SyntheticRepoConfig:
+    def __init__(
+        self,
+        files: int = 50,
+        functions_per_file: int = 20,
+        depth: int = 3,
+        body_lines: int = 12,
+        class_ratio: float = 0.3,
+        documented_ratio: float = 0.2,
+        seed: int = 0,
+    ):
+        """
+        Shape of a generated python repository.
+
+        Parameters
+        ----------
+        files : int, default=50
+            Number of python files.
+        functions_per_file : int, default=20
+            Number of functions in each file.
+        depth : int, default=3
+            Depth of the package tree the files are spread over.
+        body_lines : int, default=12
+            Mean number of statements in a function body, which drives the
+            file size.
+        class_ratio : float, default=0.3
+            Share of functions generated as methods of a class.
+        documented_ratio : float, default=0.2
+            Share of functions that already have a docstring.
+        seed : int, default=0
+            Seed making the repository reproducible.
+        """
+        self.files = files
+        self.functions_per_file = functions_per_file
+        self.depth = depth
+        self.body_lines = body_lines
+        self.class_ratio = class_ratio
+        self.documented_ratio = documented_ratio
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def generate_function(
+    rng: random.Random, name: str, config: SyntheticRepoConfig, indent: str, method: bool
+) -> str:
+    """
+    Generate the source of one function.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random generator.
+    name : str
+        The function name.
+    config : SyntheticRepoConfig
+        The repository shape.
+    indent : str
+        The indentation of the ``def`` line.
+    method : bool
+        Whether to add a ``self`` parameter.
+
+    Returns
+    -------
+    str
+        The function source code.
+    """
+    params = ["self"] if method else []
+    for param in rng.sample(PARAMETER_NAMES, rng.randint(0, 4)):
+        annotation = rng.choice(ANNOTATIONS)
+        params.append(f"{param}: {annotation}" if annotation else param)
+
+    body_indent = indent + "    "
+    lines = [f"{indent}def {name}({', '.join(params)}):"]
+    if rng.random() < config.documented_ratio:
+        lines.append(f'{body_indent}"""Existing docstring of {name}."""')
+
+    result = "result"
+    lines.append(f"{body_indent}{result} = []")
+    for index in range(max(1, int(rng.gauss(config.body_lines, config.body_lines / 3)))):
+        choice = rng.random()
+        if choice < 0.2:
+            lines.append(f"{body_indent}# step {index} of {name}")
+        elif choice < 0.4:
+            lines.append(f"{body_indent}for item_{index} in range({index + 1}):")
+            lines.append(f"{body_indent}    {result}.append(item_{index} * {index})")
+        elif choice < 0.6:
+            lines.append(f"{body_indent}if len({result}) > {index}:")
+            lines.append(f"{body_indent}    {result} = {result}[:{index}]")
+        else:
+            lines.append(f"{body_indent}{result}.append(str({index}) + '{name}')")
+    lines.append(f"{body_indent}return {result}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_module(rng: random.Random, module_index: int, config: SyntheticRepoConfig) -> str:
+    """
+    Generate the source of one module.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random generator.
+    module_index : int
+        Index of the module, used to name its functions.
+    config : SyntheticRepoConfig
+        The repository shape.
+
+    Returns
+    -------
+    str
+        The module source code.
+    """
+    functions, methods = [], []
+    for index in range(config.functions_per_file):
+        name = f"{'_' if rng.random() < 0.2 else ''}func_{module_index}_{index}"
+        if rng.random() < config.class_ratio:
+            methods.append(generate_function(rng, name, config, "    ", True))
+        else:
+            functions.append(generate_function(rng, name, config, "", False))
+
+    parts = ["import os\nfrom pathlib import Path\n"]
+    parts.extend(functions)
+    if methods:
+        parts.append(f"class Module{module_index}:")
+        parts.extend(methods)
+    return "\n\n".join(parts)
+
+
+def generate_repo(root: Path, config: SyntheticRepoConfig) -> list[Path]:
+    """
+    Write a synthetic python repository.
+
+    Parameters
+    ----------
+    root : Path
+        The directory to write the repository into.
+    config : SyntheticRepoConfig
+        The repository shape.
+
+    Returns
+    -------
+    list of Path
+        The generated python files.
+    """
+    rng = random.Random(config.seed)
+    filepaths = []
+    for module_index in range(config.files):
+        package = root.joinpath(
+            *[f"pkg_{rng.randint(0, 3)}" for _ in range(rng.randint(0, config.depth))]
+        )
+        package.mkdir(parents=True, exist_ok=True)
+        filepath = package / f"module_{module_index}.py"
+        filepath.write_text(generate_module(rng, module_index, config), encoding="utf-8")
+        filepaths.append(filepath)
+    return filepaths
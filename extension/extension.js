@@ -73,7 +73,10 @@ function activate(context) {
               languageId: languageId,
               commented: true,
               source: "vscode",
-              context: getText(),
+              // the document is only needed to find the function under the cursor
+              context: highlighted ? null : getText(),
+              uri: highlighted ? null : editor.document.uri.toString(),
+              version: highlighted ? null : editor.document.version,
               width: line
                 ? getWidth(line.firstNonWhitespaceCharacterIndex)
                 : getWidth(selection.start.character),
@@ -26,6 +26,6 @@ setup(
     ],
     entry_points={
         "console_scripts" : 
-        ['doctify=src.__main__:main']
+        ['doctify=src.__main__:main', 'doctify-data=src.dataset:main']
     },
 )
@@ -3,7 +3,199 @@ import sys
 from pathlib import Path
 
 from src import doctify
+from src.backends import BackendRegistry
+from src.adapters import parse_adapters
+from src.backends.http_backend import discover_server
+from src.docstring_cache import DOCSTRING_CACHE_FILE, clear_docstring_cache
 from src.logger import doctify_logger
+from src.profiler import profiler
+from src.shards import HOLDOUT_FRACTION
+from src.walker import DEFAULT_EXCLUDES, DEFAULT_MAX_FILE_SIZE, PythonFileWalker
+
+
+def add_backend_arguments(command_parser: argparse.ArgumentParser):
+    command_parser.add_argument(
+        "--backend",
+        choices=BackendRegistry.names(),
+        default="transformers",
+        help="Inference backend used to generate docstrings.",
+    )
+    command_parser.add_argument(
+        "--backend-url",
+        required=False,
+        help="Base URL of the doctify server used by the http backend.",
+    )
+    command_parser.add_argument(
+        "--replicas",
+        type=int,
+        default=1,
+        help="Run this many copies of a local backend in worker processes pinned to "
+        "separate cores, sharing the model weights copy-on-write.",
+    )
+    command_parser.add_argument(
+        "--threads-per-replica",
+        type=int,
+        required=False,
+        help="Cores and torch threads per replica (default: an even split).",
+    )
+    command_parser.add_argument(
+        "--server",
+        required=False,
+        help="Delegate generation to a warm doctify server at this URL, or 'auto' to "
+        "discover a local one. Falls back to --backend when no server answers.",
+    )
+    command_parser.add_argument(
+        "--prefill-skeleton",
+        action="store_true",
+        help="With the transformers backend, write the numpy sections, parameters, "
+        "annotations and raised exceptions from the signature and only generate "
+        "the descriptions.",
+    )
+    command_parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="With the transformers backend, decode into a static key/value cache with "
+        "a torch.compile'd decode step. Compilation makes loading slower. Not "
+        "combined with --replicas.",
+    )
+    command_parser.add_argument(
+        "--adapter-path",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="With the transformers backend, register a LoRA adapter fine-tuned from the "
+        "doctify model. Repeatable.",
+    )
+    command_parser.add_argument(
+        "--adapter",
+        required=False,
+        help="Generate with this registered adapter (docstring style) instead of the "
+        "base model. Also selects the adapter of a doctify server.",
+    )
+    command_parser.add_argument(
+        "--no-docstring-cache",
+        action="store_true",
+        help="Generate every function, instead of reusing the docstring of a function "
+        "with the same structure from this run.",
+    )
+    command_parser.add_argument(
+        "--persist-docstring-cache",
+        action="store_true",
+        help="Also reuse docstrings from earlier runs, kept in "
+        f"{DOCSTRING_CACHE_FILE} (DOCTIFY_DOCSTRING_CACHE).",
+    )
+    command_parser.add_argument(
+        "--clear-docstring-cache",
+        action="store_true",
+        help="Delete the docstrings kept from earlier runs before generating.",
+    )
+
+
+def add_walker_arguments(command_parser: argparse.ArgumentParser):
+    command_parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        help="Glob of file or directory names to skip, on top of the defaults. Repeatable.",
+    )
+    command_parser.add_argument(
+        "--no-exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Walk into names matched by this default exclude, e.g. build for a real "
+        f"build package. Repeatable. Defaults: {', '.join(DEFAULT_EXCLUDES)}.",
+    )
+    command_parser.add_argument(
+        "--no-default-excludes",
+        action="store_true",
+        help="Only skip the --exclude patterns, none of the defaults.",
+    )
+    command_parser.add_argument(
+        "--no-gitignore",
+        action="store_true",
+        help="Do not prune paths matched by .gitignore files.",
+    )
+    command_parser.add_argument(
+        "--max-file-size",
+        type=int,
+        default=DEFAULT_MAX_FILE_SIZE,
+        help="Skip files larger than this many bytes (default: %(default)s).",
+    )
+
+
+def build_walker(parsed_args: argparse.Namespace) -> PythonFileWalker:
+    defaults = [] if parsed_args.no_default_excludes else DEFAULT_EXCLUDES
+    excludes = [pattern for pattern in defaults if pattern not in parsed_args.no_exclude]
+    return PythonFileWalker(
+        excludes=[*excludes, *parsed_args.exclude],
+        use_gitignore=not parsed_args.no_gitignore,
+        max_file_size=parsed_args.max_file_size,
+    )
+
+
+def configure(parsed_args: argparse.Namespace):
+    """
+    Configure the backend and the walker from the parsed arguments.
+
+    Parameters
+    ----------
+    parsed_args : argparse.Namespace
+        Arguments added by ``add_backend_arguments`` and ``add_walker_arguments``.
+    """
+    backend_name, backend_options = parsed_args.backend, {}
+    if parsed_args.backend_url:
+        backend_options["url"] = parsed_args.backend_url
+
+    if parsed_args.server:
+        server_url = discover_server(parsed_args.server)
+        if server_url:
+            doctify_logger.info(f"Using doctify server at {server_url}")
+            backend_name, backend_options = "http", {"url": server_url}
+        else:
+            doctify_logger.warning(
+                f"No doctify server answered, falling back to the {backend_name} backend"
+            )
+
+    if parsed_args.prefill_skeleton and backend_name == "transformers":
+        backend_options["prefill_skeleton"] = True
+    if parsed_args.compile and backend_name == "transformers":
+        backend_options["compiled"] = True
+    adapters = parse_adapters(parsed_args.adapter_path)
+    # a server checks the adapter itself, a local backend only knows the registered ones
+    if parsed_args.adapter and backend_name != "http" and parsed_args.adapter not in adapters:
+        doctify_logger.error(
+            f"Unknown adapter {parsed_args.adapter}, register it with "
+            f"--adapter-path {parsed_args.adapter}=PATH"
+        )
+        raise SystemExit(1)
+    if adapters and backend_name == "transformers":
+        backend_options["adapters"] = adapters
+    elif adapters and backend_name == "fake":
+        backend_options["adapters"] = sorted(adapters)
+    doctify.adapter = parsed_args.adapter
+    doctify.use_docstring_cache = not parsed_args.no_docstring_cache
+    if parsed_args.persist_docstring_cache:
+        doctify.docstring_cache_file = DOCSTRING_CACHE_FILE
+    if parsed_args.clear_docstring_cache:
+        clear_docstring_cache(DOCSTRING_CACHE_FILE)
+
+    if parsed_args.replicas > 1 and backend_name != "http":
+        if backend_name == "transformers":
+            backend_options = {
+                "model_name": doctify.model_name,
+                "draft_model_name": doctify.draft_model_name,
+                **backend_options,
+            }
+        backend_name, backend_options = "sharded", {
+            "backend": backend_name,
+            "replicas": parsed_args.replicas,
+            "threads_per_replica": parsed_args.threads_per_replica,
+            "backend_options": backend_options,
+        }
+    doctify.configure_backend(backend_name, **backend_options)
+    doctify.walker = build_walker(parsed_args)
+
 
 parser = argparse.ArgumentParser(
         prog="doctify",
@@ -29,8 +221,367 @@ parser.add_argument(
     help="Specify the directory path to generate docstrings for all files.",
 )
 
+add_backend_arguments(parser)
+add_walker_arguments(parser)
+
+parser.add_argument(
+    "--time-budget",
+    type=float,
+    required=False,
+    help="Stop generating once this many seconds of wall-clock time are used.",
+)
+parser.add_argument(
+    "--token-budget",
+    type=int,
+    required=False,
+    help="Stop generating once this many estimated tokens are used.",
+)
+parser.add_argument(
+    "--plan-only",
+    action="store_true",
+    help="Print the ranked functions and their estimated cost without loading the model.",
+)
+
+parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="Record per-stage timings and counts and write a JSON run report.",
+)
+parser.add_argument(
+    "--profile-output",
+    default="doctify-profile.json",
+    help="Path of the JSON run report written by --profile (default: %(default)s).",
+)
+parser.add_argument(
+    "--cprofile",
+    required=False,
+    help="With --profile, also write cProfile stats to this file (e.g. for flameprof).",
+)
+
 parser.add_argument("--version", action="version", version="%(prog)s 0.1.0")
-parsed_args = parser.parse_args()
+
+watch_parser = argparse.ArgumentParser(
+    prog="doctify watch",
+    description="Keep the model loaded and document python files as they change.",
+)
+watch_parser.add_argument("directory", help="The directory to watch.")
+watch_parser.add_argument(
+    "--debounce",
+    type=float,
+    default=1.0,
+    help="Seconds a file must stay unchanged before it is documented (default: %(default)s).",
+)
+watch_parser.add_argument(
+    "--poll-interval",
+    type=float,
+    default=1.0,
+    help="Seconds between scans when inotify is unavailable (default: %(default)s).",
+)
+watch_parser.add_argument(
+    "--initial",
+    action="store_true",
+    help="Document the whole directory once before watching.",
+)
+add_backend_arguments(watch_parser)
+add_walker_arguments(watch_parser)
+
+
+def watch(argv: list[str]):
+    """
+    Entry point for ``doctify watch``.
+
+    Parameters
+    ----------
+    argv : list of str
+        The arguments after the command name.
+    """
+    from src.watch import DocumentWatcher
+
+    parsed_args = watch_parser.parse_args(argv)
+    target_dir = Path(parsed_args.directory)
+    if not target_dir.is_dir():
+        doctify_logger.error("The target directory doesn't exist")
+        raise SystemExit(1)
+
+    configure(parsed_args)
+    watcher = DocumentWatcher(
+        target_dir.absolute(),
+        debounce=parsed_args.debounce,
+        poll_interval=parsed_args.poll_interval,
+    )
+    try:
+        watcher.run(initial=parsed_args.initial)
+    finally:
+        doctify.close_inference()
+
+
+model_parser = argparse.ArgumentParser(
+    prog="doctify model",
+    description="Manage the local model cache.",
+)
+model_subparsers = model_parser.add_subparsers(dest="action", required=True)
+prepare_parser = model_subparsers.add_parser(
+    "prepare",
+    help="Store a ready-to-load checkpoint so later runs start quickly.",
+)
+prepare_parser.add_argument(
+    "--model",
+    default=doctify.model_name,
+    help="The model to prepare (default: %(default)s).",
+)
+prepare_parser.add_argument(
+    "--dtype",
+    choices=["float32", "float16", "bfloat16"],
+    required=False,
+    help="The dtype to store the weights in (default: float16 with CUDA, float32 otherwise).",
+)
+
+
+def model(argv: list[str]):
+    """
+    Entry point for ``doctify model``.
+
+    Parameters
+    ----------
+    argv : list of str
+        The arguments after the command name.
+    """
+    from src.model_cache import prepare_model
+
+    parsed_args = model_parser.parse_args(argv)
+    if parsed_args.action == "prepare":
+        path = prepare_model(parsed_args.model, parsed_args.dtype)
+        print(path)
+
+
+eval_parser = argparse.ArgumentParser(
+    prog="doctify eval",
+    description="Score generated docstrings on a held-out split of scraped functions.",
+)
+eval_parser.add_argument(
+    "data",
+    nargs="+",
+    help="Scraper JSONL files, or directories of them.",
+)
+eval_parser.add_argument(
+    "--configs",
+    required=False,
+    help="JSON file with a list of configurations, each with a name, backend, "
+    "backend_options, batch_size and optional max_new_tokens. Defaults to one "
+    "configuration built from the backend arguments.",
+)
+eval_parser.add_argument(
+    "--batch-size",
+    type=int,
+    default=1,
+    help="Functions generated per batch without --configs (default: %(default)s).",
+)
+eval_parser.add_argument(
+    "--holdout",
+    type=float,
+    default=HOLDOUT_FRACTION,
+    help="Share of the records held out for evaluation; finetune leaves out the records "
+    "held out at the default (default: %(default)s).",
+)
+eval_parser.add_argument(
+    "--limit",
+    type=int,
+    required=False,
+    help="Evaluate at most this many held-out functions.",
+)
+eval_parser.add_argument(
+    "--output",
+    required=False,
+    help="Also write the results as JSON to this file.",
+)
+add_backend_arguments(eval_parser)
+
+
+def evaluate(argv: list[str]):
+    """
+    Entry point for ``doctify eval``.
+
+    Parameters
+    ----------
+    argv : list of str
+        The arguments after the command name.
+    """
+    import json
+
+    from src.evaluate import format_table, run_evaluation
+
+    parsed_args = eval_parser.parse_args(argv)
+    if parsed_args.configs:
+        with open(parsed_args.configs, "r", encoding="utf-8") as file:
+            configs = json.load(file)
+    else:
+        backend_options = {}
+        if parsed_args.backend == "transformers":
+            backend_options = {
+                "model_name": doctify.model_name,
+                "draft_model_name": doctify.draft_model_name,
+                "prefill_skeleton": parsed_args.prefill_skeleton,
+                "compiled": parsed_args.compile,
+                "adapters": parse_adapters(parsed_args.adapter_path),
+            }
+        elif parsed_args.backend_url:
+            backend_options = {"url": parsed_args.backend_url}
+        configs = [
+            {
+                "name": parsed_args.backend,
+                "backend": parsed_args.backend,
+                "backend_options": backend_options,
+                "batch_size": parsed_args.batch_size,
+                "adapter": parsed_args.adapter,
+            }
+        ]
+
+    results = run_evaluation(
+        [Path(path) for path in parsed_args.data],
+        configs,
+        holdout=parsed_args.holdout,
+        limit=parsed_args.limit,
+    )
+    print(format_table(results))
+    if parsed_args.output:
+        with open(parsed_args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+generate_parser = argparse.ArgumentParser(
+    prog="doctify generate",
+    description="Generate docstrings into an edits file without changing any source file.",
+)
+generate_parser.add_argument("target", help="The python file or directory to document.")
+generate_parser.add_argument(
+    "--out",
+    required=True,
+    help="The JSONL edits file, one line per file with its content hash and byte offsets.",
+)
+generate_parser.add_argument(
+    "--no-resume",
+    action="store_true",
+    help="Start over instead of skipping the files already in the edits file.",
+)
+add_backend_arguments(generate_parser)
+add_walker_arguments(generate_parser)
+
+
+def generate(argv: list[str]):
+    """
+    Entry point for ``doctify generate``.
+
+    Parameters
+    ----------
+    argv : list of str
+        The arguments after the command name.
+    """
+    from src.edits import generate_edits
+
+    parsed_args = generate_parser.parse_args(argv)
+    target = Path(parsed_args.target)
+    if not target.exists():
+        doctify_logger.error("The target path doesn't exist")
+        raise SystemExit(1)
+
+    configure(parsed_args)
+    try:
+        generate_edits(target.absolute(), Path(parsed_args.out), resume=not parsed_args.no_resume)
+    finally:
+        doctify.close_inference()
+
+
+apply_parser = argparse.ArgumentParser(
+    prog="doctify apply",
+    description="Insert the docstrings of an edits file, skipping files changed since.",
+)
+apply_parser.add_argument("edits", help="The edits file written by doctify generate.")
+apply_parser.add_argument(
+    "--root",
+    default=".",
+    help="The directory the edits were generated for (default: the current directory).",
+)
+
+
+def apply(argv: list[str]):
+    """
+    Entry point for ``doctify apply``.
+
+    Parameters
+    ----------
+    argv : list of str
+        The arguments after the command name.
+    """
+    from src.edits import apply_edits
+
+    parsed_args = apply_parser.parse_args(argv)
+    counts = apply_edits(Path(parsed_args.edits), Path(parsed_args.root))
+    if counts["stale"] or counts["missing"]:
+        raise SystemExit(1)
+
+
+scan_parser = argparse.ArgumentParser(
+    prog="doctify scan",
+    description="Report docstring coverage and the tokens needed to document the rest, "
+    "without loading a model.",
+)
+scan_parser.add_argument("target", help="The python file or directory to scan.")
+scan_parser.add_argument(
+    "--jobs",
+    type=int,
+    default=None,
+    help="Worker processes parsing files (default: one per core).",
+)
+scan_parser.add_argument(
+    "--output",
+    required=False,
+    help="Write the JSON report (totals, packages and files) here instead of stdout.",
+)
+scan_parser.add_argument(
+    "--summary",
+    action="store_true",
+    help="Print a human readable summary instead of the JSON report.",
+)
+add_walker_arguments(scan_parser)
+
+
+def scan(argv: list[str]):
+    """
+    Entry point for ``doctify scan``.
+
+    Parameters
+    ----------
+    argv : list of str
+        The arguments after the command name.
+    """
+    import json
+
+    from src.scan import format_summary, scan_coverage
+
+    parsed_args = scan_parser.parse_args(argv)
+    target = Path(parsed_args.target)
+    if not target.exists():
+        doctify_logger.error("The target path doesn't exist")
+        raise SystemExit(1)
+
+    report = scan_coverage(target.absolute(), build_walker(parsed_args), jobs=parsed_args.jobs)
+    if parsed_args.output:
+        with open(parsed_args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if parsed_args.summary or parsed_args.output:
+        print(format_summary(report))
+    else:
+        print(json.dumps(report, indent=2))
+
+
+COMMANDS = {
+    "watch": watch,
+    "model": model,
+    "eval": evaluate,
+    "generate": generate,
+    "apply": apply,
+    "scan": scan,
+}
 
 
 def main():
@@ -41,6 +592,20 @@ def main():
         ----------
         None
     """
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
+
+    parsed_args = parser.parse_args()
+    budget = {
+        "time_budget": parsed_args.time_budget,
+        "token_budget": parsed_args.token_budget,
+        "plan_only": parsed_args.plan_only,
+    }
+    configure(parsed_args)
+
+    if parsed_args.profile:
+        profiler.enable(with_cprofile=bool(parsed_args.cprofile))
+
     try:
         if parsed_args.file:
             target_file = Path(parsed_args.file)
@@ -50,7 +615,7 @@ def main():
                 raise SystemExit(1)
             else:
                 doctify_logger.info(f"working on {target_file.absolute()}")
-                doctify.main(filepath=target_file)
+                doctify.main(filepath=target_file, **budget)
 
         elif parsed_args.path:
             target_path = Path(parsed_args.path)
@@ -60,7 +625,7 @@ def main():
                 raise SystemExit(1)
             else:
                 doctify_logger.info(f"working on {target_path.absolute()}")
-                doctify.main(path=target_path.absolute())
+                doctify.main(path=target_path.absolute(), **budget)
 
         elif parsed_args.directory:
             target_dir = Path(parsed_args.directory)
@@ -70,9 +635,14 @@ def main():
                 raise SystemExit(1)
             else:
                 doctify_logger.info(f"working on {target_dir.absolute()}")
-                doctify.main(path=target_dir.absolute())
+                doctify.main(path=target_dir.absolute(), **budget)
         else:
             doctify_logger.error("Please specify at least one argument or -h for help.")
             raise SystemExit(1)
     finally:
-        doctify.inference.close_llm()
+        doctify.close_inference()
+        if parsed_args.profile:
+            profiler.write_report(parsed_args.profile_output, parsed_args.cprofile)
+            doctify_logger.info(
+                f"Run report written to {parsed_args.profile_output}\n{profiler.summary()}"
+            )
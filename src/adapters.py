@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+
+from src.logger import doctify_logger
+
+
+def parse_adapters(specs: "list[str] | str | None") -> dict[str, str]:
+    """
+    Parse ``name=path`` adapter registrations.
+
+    Parameters
+    ----------
+    specs : list of str or str, optional
+        Registrations, or one comma separated string of them as read from
+        an environment variable.
+
+    Returns
+    -------
+    dict of str to str
+        The path or hub name of every adapter, by adapter name.
+    """
+    if isinstance(specs, str):
+        specs = specs.split(",")
+    adapters = {}
+    for spec in specs or []:
+        if not spec.strip():
+            continue
+        name, separator, path = spec.partition("=")
+        if not separator or not name.strip() or not path.strip():
+            raise ValueError(f"Invalid adapter {spec!r}, expected name=path")
+        adapters[name.strip()] = path.strip()
+    return adapters
+
+
+class AdapterPool:
+    def __init__(self, model, adapters: dict[str, str], max_loaded: int = 4):
+        """
+        Serve several LoRA adapters on top of one loaded base model.
+
+        Adapters are injected into the base model's layers the first time a
+        request asks for them and the least recently used one is deleted
+        once more than ``max_loaded`` are resident, so memory stays at one
+        base model plus a few small low-rank matrices however many styles
+        are registered. Requests without an adapter run with the adapters
+        disabled.
+
+        Parameters
+        ----------
+        model : PreTrainedModel
+            The loaded base model.
+        adapters : dict of str to str
+            The path or hub name of every adapter, by adapter name.
+        max_loaded : int, default=4
+            Adapters kept resident at the same time.
+        """
+        self.base_model = model
+        self.adapters = dict(adapters)
+        self.max_loaded = max(max_loaded, 1)
+        self.peft_model = None
+        self.loaded: OrderedDict[str, None] = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+        # the active adapter is state of the shared model
+        self.lock = threading.RLock()
+
+    def names(self) -> list[str]:
+        return sorted(self.adapters)
+
+    def _load(self, name: str):
+        if name in self.loaded:
+            self.loaded.move_to_end(name)
+            return
+        if name not in self.adapters:
+            raise ValueError(f"Unknown adapter {name}, registered: {', '.join(self.names())}")
+
+        start = time.perf_counter()
+        if self.peft_model is None:
+            from peft import PeftModel
+
+            self.peft_model = PeftModel.from_pretrained(
+                self.base_model, self.adapters[name], adapter_name=name
+            )
+            self.peft_model.eval()
+        else:
+            self.peft_model.load_adapter(self.adapters[name], adapter_name=name)
+        self.loaded[name] = None
+        self.loads += 1
+        doctify_logger.info(
+            "Loaded adapter %s from %s in %.2fs",
+            name,
+            self.adapters[name],
+            time.perf_counter() - start,
+        )
+
+        # the new adapter is activated before the oldest one goes, so peft
+        # never deletes its active adapter
+        self.peft_model.set_adapter(name)
+        while len(self.loaded) > self.max_loaded:
+            evicted, _ = self.loaded.popitem(last=False)
+            self.peft_model.delete_adapter(evicted)
+            self.evictions += 1
+            doctify_logger.info("Evicted adapter %s", evicted)
+
+    @contextmanager
+    def activate(self, name: "str | None") -> Iterator[None]:
+        """
+        Run the base model with one adapter, or none, for the block.
+
+        The adapter layers are injected into the base model itself, so the
+        block keeps calling the base model's ``generate``.
+
+        Parameters
+        ----------
+        name : str, optional
+            The adapter to use. None runs the plain base model.
+
+        Raises
+        ------
+        ValueError
+            When the adapter is not registered.
+        """
+        with self.lock:
+            if name is None:
+                if self.peft_model is None:
+                    yield
+                else:
+                    with self.peft_model.disable_adapter():
+                        yield
+                return
+
+            self._load(name)
+            self.peft_model.set_adapter(name)
+            yield
+
+    def stats(self) -> dict:
+        return {
+            "registered": self.names(),
+            "loaded": list(self.loaded),
+            "max_loaded": self.max_loaded,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,6 @@
+from .backend import (BackendCapabilities, BackendRegistry, InferenceBackend,
+                      create_backend)
+from .fake_backend import FakeBackend
+from .http_backend import HttpBackend
+from .sharded_backend import ShardedBackend
+from .transformers_backend import TransformersBackend
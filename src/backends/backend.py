@@ -0,0 +1,109 @@
+from typing import Protocol, runtime_checkable
+
+
+class BackendCapabilities:
+    def __init__(
+        self,
+        batching: bool = False,
+        max_batch_size: int = 1,
+        token_counts: bool = False,
+        local: bool = True,
+        concurrency: int = 1,
+        adapters: "list[str] | None" = None,
+    ):
+        """
+        What an inference backend supports.
+
+        Parameters
+        ----------
+        batching : bool, default=False
+            Whether ``generate_batch`` runs the inputs together rather than
+            one after another.
+        max_batch_size : int, default=1
+            The largest batch worth sending in one call.
+        token_counts : bool, default=False
+            Whether the backend counts the tokens it generates.
+        local : bool, default=True
+            Whether the model runs in this process.
+        concurrency : int, default=1
+            Calls worth keeping in flight at the same time.
+        adapters : list of str, optional
+            Names of the fine-tuned adapters a request may pick with
+            ``adapter``.
+        """
+        self.batching = batching
+        self.max_batch_size = max_batch_size
+        self.token_counts = token_counts
+        self.local = local
+        self.concurrency = concurrency
+        self.adapters = adapters or []
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+@runtime_checkable
+class InferenceBackend(Protocol):
+    name: str
+    capabilities: BackendCapabilities
+
+    def generate(
+        self,
+        code: str,
+        language: str = "python",
+        max_new_tokens: "int | None" = None,
+        adapter: "str | None" = None,
+    ) -> str:
+        """
+        Generate the docstring of one function, with the base model or a
+        named adapter.
+        """
+        ...
+
+    def generate_batch(
+        self,
+        codes: list[str],
+        language: str = "python",
+        max_new_tokens: "list[int | None] | None" = None,
+        adapter: "str | None" = None,
+    ) -> list[str]:
+        """
+        Generate the docstrings of several functions, in input order.
+        """
+        ...
+
+    def warmup(self):
+        """
+        Prepare the backend so the first request is not slower than the rest.
+        """
+        ...
+
+    def close(self):
+        """
+        Release the resources held by the backend.
+        """
+        ...
+
+
+class BackendRegistry:
+    _registry = {}
+
+    @classmethod
+    def register_backend(cls, name: str, backend_class):
+        cls._registry[name] = backend_class
+
+    @classmethod
+    def names(cls) -> list[str]:
+        return sorted(cls._registry)
+
+    @classmethod
+    def create_backend(cls, name: str, **kwargs) -> InferenceBackend:
+        backend_class = cls._registry.get(name)
+        if backend_class:
+            return backend_class(**kwargs)
+        else:
+            raise ValueError(f"Invalid inference backend {name}")
+
+
+def create_backend(name: str, **kwargs) -> InferenceBackend:
+    return BackendRegistry.create_backend(name, **kwargs)
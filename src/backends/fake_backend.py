@@ -0,0 +1,102 @@
+import hashlib
+import time
+
+from src.backends.backend import BackendCapabilities, BackendRegistry
+from src.cancellation import is_cancelled
+
+CANCELLATION_CHECK_INTERVAL = 0.01
+
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        seconds_per_token: float = 0.0,
+        adapters: "list[str] | None" = None,
+    ):
+        """
+        Deterministic backend that needs no model, for tests and benchmarks.
+
+        Parameters
+        ----------
+        latency : float, default=0.0
+            Seconds slept for every call, simulating prefill.
+        seconds_per_token : float, default=0.0
+            Seconds slept for every generated token, simulating decoding.
+        adapters : list of str, optional
+            Adapter names to advertise. Every adapter gets its own output.
+        """
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.calls = 0
+        self.generated_tokens = 0
+        self.capabilities = BackendCapabilities(
+            batching=True, max_batch_size=64, token_counts=True, adapters=adapters
+        )
+
+    def _docstring(
+        self, code: str, max_new_tokens: "int | None", adapter: "str | None"
+    ) -> tuple[str, int]:
+        # every adapter writes in its own deterministic style
+        digest = hashlib.sha1(((adapter or "") + code).encode()).hexdigest()
+        docstring = f"Summary of {digest[:12]}.\n\nReturns\n-------\nobject\n    Result {digest[12:20]}."
+        tokens = len(docstring.split())
+        if max_new_tokens is not None:
+            tokens = min(tokens, max_new_tokens)
+        return docstring, tokens
+
+    def generate(
+        self,
+        code: str,
+        language: str = "python",
+        max_new_tokens: "int | None" = None,
+        adapter: "str | None" = None,
+    ) -> str:
+        return self.generate_batch([code], language, [max_new_tokens], adapter)[0]
+
+    def generate_batch(
+        self,
+        codes: list[str],
+        language: str = "python",
+        max_new_tokens: "list[int | None] | None" = None,
+        adapter: "str | None" = None,
+    ) -> list[str]:
+        max_new_tokens = max_new_tokens or [None] * len(codes)
+        results = [
+            self._docstring(code, budget, adapter) for code, budget in zip(codes, max_new_tokens)
+        ]
+        tokens = max((tokens for _, tokens in results), default=0)
+
+        self.calls += 1
+        self.generated_tokens += sum(tokens for _, tokens in results)
+        if self.latency or self.seconds_per_token:
+            # a batch decodes in lockstep, so it costs as much as its longest member
+            self._sleep(self.latency + tokens * self.seconds_per_token)
+        return [docstring for docstring, _ in results]
+
+    def _sleep(self, seconds: float):
+        # wake up like a decode step would, to stop early when cancelled
+        end = time.monotonic() + seconds
+        while not is_cancelled():
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, CANCELLATION_CHECK_INTERVAL))
+
+    def warmup(self):
+        pass
+
+    def usage_stats(self) -> dict:
+        return {"calls": self.calls, "generated_tokens": self.generated_tokens}
+
+    def merge_usage_stats(self, stats: dict):
+        self.calls += stats["calls"]
+        self.generated_tokens += stats["generated_tokens"]
+
+    def close(self):
+        pass
+
+
+BackendRegistry.register_backend(FakeBackend.name, FakeBackend)
@@ -0,0 +1,188 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.backends.backend import BackendCapabilities, BackendRegistry
+
+DEFAULT_URL = os.environ.get("DOCTIFY_BACKEND_URL", "http://localhost:5000")
+DISCOVERY_FILE = Path(
+    os.environ.get("DOCTIFY_DISCOVERY_FILE", Path.home() / ".cache" / "doctify" / "server.json")
+)
+
+
+def write_discovery_file(url: str, backend: str):
+    """
+    Advertise a running server to local clients.
+
+    Parameters
+    ----------
+    url : str
+        Base URL the server answers on.
+    backend : str
+        Name of the backend the server runs.
+    """
+    DISCOVERY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(DISCOVERY_FILE, "w", encoding="utf-8") as file:
+        json.dump({"url": url, "backend": backend, "pid": os.getpid()}, file)
+
+
+def server_is_alive(url: str, timeout: float = 0.3) -> bool:
+    try:
+        return requests.get(f"{url.rstrip('/')}/health", timeout=timeout).ok
+    except requests.RequestException:
+        return False
+
+
+def discover_server(url: "str | None" = None) -> "str | None":
+    """
+    Find a warm doctify server that answers.
+
+    Parameters
+    ----------
+    url : str, optional
+        URL to try. ``None`` or ``"auto"`` tries the URL advertised in the
+        local discovery file, then ``$DOCTIFY_BACKEND_URL`` or localhost.
+
+    Returns
+    -------
+    str or None
+        The URL of the first server that answers its health check.
+    """
+    if url and url != "auto":
+        candidates = [url]
+    else:
+        candidates = []
+        try:
+            with open(DISCOVERY_FILE, "r", encoding="utf-8") as file:
+                candidates.append(json.load(file)["url"])
+        except (OSError, ValueError, KeyError):
+            pass
+        candidates.append(DEFAULT_URL)
+
+    return next((candidate for candidate in candidates if server_is_alive(candidate)), None)
+
+
+class HttpBackend:
+    name = "http"
+
+    def __init__(
+        self,
+        url: str = DEFAULT_URL,
+        timeout: float = 120.0,
+        batch_size: int = 8,
+        max_in_flight: int = 4,
+        max_retries: int = 3,
+    ):
+        """
+        Remote backend calling a running ``backend_api`` server.
+
+        Parameters
+        ----------
+        url : str, default=$DOCTIFY_BACKEND_URL or http://localhost:5000
+            Base URL of the server.
+        timeout : float, default=120.0
+            Seconds to wait for each response.
+        batch_size : int, default=8
+            Functions sent in one ``/generate_docs_batch`` request.
+        max_in_flight : int, default=4
+            Requests pipelined to the server at the same time.
+        max_retries : int, default=3
+            Times a request rejected with 429 is retried after the server's
+            ``Retry-After``.
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.capabilities = BackendCapabilities(
+            batching=True,
+            max_batch_size=batch_size,
+            local=False,
+            concurrency=max_in_flight,
+        )
+
+    def _post(self, path: str, payload: dict) -> dict:
+        payload = {**payload, "timeout": self.timeout}
+        for attempt in range(self.max_retries + 1):
+            response = self.session.post(f"{self.url}{path}", json=payload, timeout=self.timeout)
+            if response.status_code != 429 or attempt == self.max_retries:
+                break
+            time.sleep(float(response.headers.get("Retry-After", 1)))
+        response.raise_for_status()
+        return response.json()
+
+    def generate(
+        self,
+        code: str,
+        language: str = "python",
+        max_new_tokens: "int | None" = None,
+        adapter: "str | None" = None,
+    ) -> str:
+        return self._post(
+            "/generate_docs",
+            {
+                "languageId": language,
+                "source": "doctify",
+                "code": code,
+                "max_new_tokens": max_new_tokens,
+                "adapter": adapter,
+            },
+        )["docstring"]
+
+    def _post_batch(
+        self,
+        codes: list[str],
+        language: str,
+        max_new_tokens: list["int | None"],
+        adapter: "str | None",
+    ) -> list[str]:
+        return self._post(
+            "/generate_docs_batch",
+            {
+                "languageId": language,
+                "source": "doctify",
+                "adapter": adapter,
+                "items": [
+                    {"code": code, "max_new_tokens": budget}
+                    for code, budget in zip(codes, max_new_tokens)
+                ],
+            },
+        )["docstrings"]
+
+    def generate_batch(
+        self,
+        codes: list[str],
+        language: str = "python",
+        max_new_tokens: "list[int | None] | None" = None,
+        adapter: "str | None" = None,
+    ) -> list[str]:
+        max_new_tokens = max_new_tokens or [None] * len(codes)
+        chunks = [
+            (codes[start : start + self.batch_size], max_new_tokens[start : start + self.batch_size])
+            for start in range(0, len(codes), self.batch_size)
+        ]
+        futures = [
+            self.executor.submit(self._post_batch, chunk, language, budgets, adapter)
+            for chunk, budgets in chunks
+        ]
+        return [docstring for future in futures for docstring in future.result()]
+
+    def warmup(self):
+        self.session.get(f"{self.url}/health", timeout=self.timeout)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+BackendRegistry.register_backend(HttpBackend.name, HttpBackend)
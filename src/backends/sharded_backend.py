@@ -0,0 +1,304 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+from src.backends.backend import (BackendCapabilities, BackendRegistry,
+                                  create_backend)
+from src.logger import doctify_logger
+
+# seconds between checks that the replicas are still alive
+LIVENESS_INTERVAL = 1.0
+# seconds a caller waits for one generation before giving up
+DEFAULT_RESULT_TIMEOUT = 600.0
+IDLE = -1
+
+
+def split_cores(replicas: int, threads_per_replica: "int | None" = None) -> list[list[int]]:
+    """
+    Split the cores this process may run on between replicas.
+
+    Parameters
+    ----------
+    replicas : int
+        The number of replicas.
+    threads_per_replica : int, optional
+        Cores given to each replica. Defaults to an even split.
+
+    Returns
+    -------
+    list of list of int
+        The cores of each replica.
+    """
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+    if not cores:
+        cores = list(range(os.cpu_count() or 1))
+    per_replica = threads_per_replica or max(len(cores) // replicas, 1)
+    return [
+        [cores[(index * per_replica + offset) % len(cores)] for offset in range(per_replica)]
+        for index in range(replicas)
+    ]
+
+
+def replica_worker(backend, cores: list[int], tasks, results, current, stats):
+    """
+    Serve generation tasks from a queue until a ``None`` sentinel arrives.
+
+    A task without code warms the backend up instead, outside its token
+    statistics.
+
+    Parameters
+    ----------
+    backend : InferenceBackend
+        The backend inherited from the parent at fork time.
+    cores : list of int
+        The cores this replica is pinned to.
+    tasks : multiprocessing.Queue
+        Queue of ``(task_id, code, language, max_new_tokens, adapter)``.
+    results : multiprocessing.Queue
+        Queue receiving ``(task_id, docstring, error)``.
+    current : multiprocessing.Value
+        The id of the task being generated, ``IDLE`` between tasks, so the
+        parent can fail it if this replica dies.
+    stats : multiprocessing.Queue
+        Queue receiving the backend's ``usage_stats`` at the sentinel, so
+        the parent reports them once for all replicas.
+    """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(len(cores))
+
+    for task in iter(tasks.get, None):
+        task_id, code, language, max_new_tokens, adapter = task
+        current.value = task_id
+        try:
+            if code is None:
+                docstring = backend.warmup()
+            else:
+                docstring = backend.generate(code, language, max_new_tokens, adapter)
+            results.put((task_id, docstring, None))
+        except Exception as err:
+            results.put((task_id, None, repr(err)))
+        current.value = IDLE
+    usage_stats = getattr(backend, "usage_stats", None)
+    stats.put(usage_stats() if usage_stats is not None else None)
+
+
+class ShardedBackend:
+    name = "sharded"
+
+    def __init__(
+        self,
+        backend: str = "transformers",
+        replicas: int = 2,
+        threads_per_replica: "int | None" = None,
+        backend_options: "dict | None" = None,
+        timeout: "float | None" = DEFAULT_RESULT_TIMEOUT,
+    ):
+        """
+        Run several replicas of a local backend in worker processes.
+
+        The backend is created once in this process and the workers are
+        forked from it, so the model weights are shared copy-on-write
+        instead of being loaded once per replica. Each worker is pinned to
+        its own subset of cores with a matching torch thread count, and
+        pulls functions from a shared queue, so a busy replica never holds
+        up the others.
+
+        Parameters
+        ----------
+        backend : str, default=transformers
+            The registered name of the backend to replicate.
+        replicas : int, default=2
+            The number of worker processes.
+        threads_per_replica : int, optional
+            Cores and torch threads per replica. Defaults to an even split
+            of the available cores.
+        backend_options : dict, optional
+            Keyword arguments for the replicated backend.
+        timeout : float, optional, default=600
+            Seconds to wait for a generation before raising ``TimeoutError``.
+            None waits forever. A replica that dies, e.g. killed for running
+            out of memory, fails its task right away instead.
+        """
+        backend_options = dict(backend_options or {})
+        if backend_options.pop("compiled", False):
+            # compiling runs the model, starting torch's thread pools, which
+            # do not survive the fork
+            doctify_logger.warning(
+                "Compiled decoding does not combine with replicas, decoding eagerly"
+            )
+        context = multiprocessing.get_context("fork")
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.stats = context.Queue()
+        self.task_ids = itertools.count()
+        self.pending: dict[int, Future] = {}
+        self.lock = threading.Lock()
+        self.timeout = timeout
+
+        # the model must be loaded, but not run, before forking: torch's
+        # thread pools do not survive a fork once they have been started
+        self.inner = create_backend(backend, **backend_options)
+        self.workers = []
+        self.current = []
+        for cores in split_cores(replicas, threads_per_replica):
+            current = context.Value("q", IDLE, lock=False)
+            worker = context.Process(
+                target=replica_worker,
+                args=(self.inner, cores, self.tasks, self.results, current, self.stats),
+                daemon=True,
+            )
+            worker.start()
+            self.workers.append(worker)
+            self.current.append(current)
+        self.dead: set[int] = set()
+        self.closing = False
+        doctify_logger.info(
+            f"Started {replicas} {backend} replicas with {len(cores)} threads each"
+        )
+
+        self.collector = threading.Thread(target=self._collect_results, daemon=True)
+        self.collector.start()
+        self.capabilities = BackendCapabilities(
+            batching=True,
+            max_batch_size=replicas,
+            token_counts=False,
+            local=True,
+            concurrency=replicas,
+            adapters=self.inner.capabilities.adapters,
+        )
+
+    def _collect_results(self):
+        last_check = time.monotonic()
+        while True:
+            try:
+                message = self.results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                message = ()
+            if time.monotonic() - last_check >= LIVENESS_INTERVAL:
+                self._check_replicas()
+                last_check = time.monotonic()
+            if message is None:
+                return
+            if not message:
+                continue
+            task_id, docstring, error = message
+            with self.lock:
+                future = self.pending.pop(task_id, None)
+            if future is None:
+                # already failed when its replica was found dead
+                continue
+            if error is None:
+                future.set_result(docstring)
+            else:
+                future.set_exception(RuntimeError(error))
+
+    def _fail(self, task_ids: list[int], error: Exception):
+        with self.lock:
+            futures = [self.pending.pop(task_id, None) for task_id in task_ids]
+        for future in futures:
+            if future is not None:
+                future.set_exception(error)
+
+    def _check_replicas(self):
+        if self.closing:
+            return
+        for index, worker in enumerate(self.workers):
+            if index in self.dead or worker.is_alive():
+                continue
+            self.dead.add(index)
+            message = f"replica {index} died with exit code {worker.exitcode}"
+            doctify_logger.error(message)
+            task_id = self.current[index].value
+            if task_id != IDLE:
+                self._fail([task_id], RuntimeError(message))
+        if len(self.dead) == len(self.workers):
+            with self.lock:
+                task_ids = list(self.pending)
+            self._fail(task_ids, RuntimeError("all replicas died"))
+
+    def _submit(
+        self,
+        code: "str | None",
+        language: str,
+        max_new_tokens: "int | None",
+        adapter: "str | None",
+    ) -> Future:
+        if len(self.dead) == len(self.workers):
+            raise RuntimeError("all replicas died")
+        future = Future()
+        task_id = next(self.task_ids)
+        with self.lock:
+            self.pending[task_id] = future
+        self.tasks.put((task_id, code, language, max_new_tokens, adapter))
+        return future
+
+    def generate(
+        self,
+        code: str,
+        language: str = "python",
+        max_new_tokens: "int | None" = None,
+        adapter: "str | None" = None,
+    ) -> str:
+        return self._submit(code, language, max_new_tokens, adapter).result(self.timeout)
+
+    def generate_batch(
+        self,
+        codes: list[str],
+        language: str = "python",
+        max_new_tokens: "list[int | None] | None" = None,
+        adapter: "str | None" = None,
+    ) -> list[str]:
+        max_new_tokens = max_new_tokens or [None] * len(codes)
+        futures = [
+            self._submit(code, language, budget, adapter)
+            for code, budget in zip(codes, max_new_tokens)
+        ]
+        if self.timeout is None:
+            return [future.result() for future in futures]
+        deadline = time.monotonic() + self.timeout
+        return [future.result(max(deadline - time.monotonic(), 0)) for future in futures]
+
+    def warmup(self):
+        futures = [self._submit(None, "python", None, None) for _ in self.workers]
+        for future in futures:
+            future.result(self.timeout)
+
+    def close(self):
+        self.closing = True
+        for _ in self.workers:
+            self.tasks.put(None)
+        # drained before joining, a worker only exits once its stats are sent
+        merge = getattr(self.inner, "merge_usage_stats", None)
+        received = 0
+        while received < len(self.workers):
+            try:
+                stats = self.stats.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                # a replica killed while waiting for a task holds the queue's
+                # lock, the others may never get their sentinel
+                if any(worker.exitcode for worker in self.workers):
+                    doctify_logger.warning("A replica died, its usage stats are not reported")
+                    break
+                if not any(worker.is_alive() for worker in self.workers):
+                    break
+                continue
+            received += 1
+            if stats is not None and merge is not None:
+                merge(stats)
+        for worker in self.workers:
+            worker.join(LIVENESS_INTERVAL)
+            if worker.is_alive():
+                worker.terminate()
+        self.results.put(None)
+        self.collector.join()
+        self.inner.close()
+
+
+BackendRegistry.register_backend(ShardedBackend.name, ShardedBackend)
@@ -0,0 +1,102 @@
+from src.backends.backend import BackendCapabilities, BackendRegistry
+
+
+class TransformersBackend:
+    name = "transformers"
+
+    def __init__(
+        self,
+        model_name: str = "manijhriya/phi2-doctify",
+        draft_model_name: "str | None" = None,
+        prefill_skeleton: bool = False,
+        compiled: bool = False,
+        adapters: "dict[str, str] | None" = None,
+        max_loaded_adapters: int = 4,
+    ):
+        """
+        Local backend running the fine-tuned model with transformers.
+
+        Parameters
+        ----------
+        model_name : str, default=manijhriya/phi2-doctify
+            The name of the model to load.
+        draft_model_name : str, optional
+            The name of a draft model for assisted generation.
+        prefill_skeleton : bool, default=False
+            Prefill the numpy docstring layout from the parsed signature and
+            only generate the descriptions.
+        compiled : bool, default=False
+            Decode with a static key/value cache and a compiled decode step.
+        adapters : dict of str to str, optional
+            LoRA adapters fine-tuned from ``model_name``, by name, served on
+            top of the one loaded base model.
+        max_loaded_adapters : int, default=4
+            Adapters kept resident before the least recently used is evicted.
+        """
+        # torch is only imported once this backend is actually selected
+        from src.inference import Inference
+
+        self.inference = Inference(
+            model_name,
+            draft_model_name,
+            prefill_skeleton,
+            compiled,
+            adapters,
+            max_loaded_adapters,
+        )
+        self.capabilities = BackendCapabilities(
+            batching=True, max_batch_size=8, token_counts=True, adapters=sorted(adapters or {})
+        )
+
+    @property
+    def generated_tokens(self) -> int:
+        return self.inference.generated_tokens
+
+    def generate(
+        self,
+        code: str,
+        language: str = "python",
+        max_new_tokens: "int | None" = None,
+        adapter: "str | None" = None,
+    ) -> str:
+        return self.inference.generate_docstring(
+            code, language=language, max_new_tokens=max_new_tokens, adapter=adapter
+        )
+
+    def generate_batch(
+        self,
+        codes: list[str],
+        language: str = "python",
+        max_new_tokens: "list[int | None] | None" = None,
+        adapter: "str | None" = None,
+    ) -> list[str]:
+        # one padded batch per max_batch_size functions, so a large file
+        # doesn't pad hundreds of prompts to its longest one
+        size = self.capabilities.max_batch_size
+        max_new_tokens = max_new_tokens or [None] * len(codes)
+        docstrings = []
+        for start in range(0, len(codes), size):
+            docstrings.extend(
+                self.inference.generate_docstrings(
+                    codes[start : start + size],
+                    language=language,
+                    max_new_tokens=max_new_tokens[start : start + size],
+                    adapter=adapter,
+                )
+            )
+        return docstrings
+
+    def warmup(self):
+        self.inference.warmup()
+
+    def usage_stats(self) -> dict:
+        return self.inference.usage_stats()
+
+    def merge_usage_stats(self, stats: dict):
+        self.inference.merge_usage_stats(stats)
+
+    def close(self):
+        self.inference.close_llm()
+
+
+BackendRegistry.register_backend(TransformersBackend.name, TransformersBackend)
@@ -0,0 +1,174 @@
+import re
+from collections import Counter
+
+RE_SIGNATURE = re.compile(r"def\s+\w+\s*\((.*?)\)\s*(->[^:]*)?:", re.DOTALL)
+
+BUDGET_BUCKETS = (64, 96, 128, 192, 256, 320, 400)
+
+
+def parameter_names(code: str) -> list[str]:
+    """
+    List the parameters in the signature of a function.
+
+    Parameters
+    ----------
+    code : str
+        The source code of the function.
+
+    Returns
+    -------
+    list of str
+        The parameter names without ``*`` or ``**`` prefixes, ignoring
+        ``self``, ``cls`` and the bare ``*`` and ``/`` separators.
+    """
+    match = RE_SIGNATURE.search(code)
+    if not match:
+        return []
+
+    params, depth, current = [], 0, ""
+    for char in match.group(1):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        if char == "," and depth == 0:
+            params.append(current)
+            current = ""
+        else:
+            current += char
+    params.append(current)
+
+    names = [param.split(":")[0].split("=")[0].strip() for param in params]
+    return [
+        name.lstrip("*")
+        for name in names
+        if name and name not in ("self", "cls", "*", "/")
+    ]
+
+
+def count_parameters(code: str) -> int:
+    """
+    Count the parameters in the signature of a function.
+
+    Parameters
+    ----------
+    code : str
+        The source code of the function.
+
+    Returns
+    -------
+    int
+        The number of parameters, ignoring ``self``, ``cls`` and the bare
+        ``*`` and ``/`` separators.
+    """
+    return len(parameter_names(code))
+
+
+class TokenBudget:
+    def __init__(
+        self,
+        base_tokens: int = 48,
+        tokens_per_parameter: int = 24,
+        tokens_per_line: int = 2,
+        min_tokens: int = 64,
+        max_tokens: int = 400,
+    ):
+        """
+        Derive a generation budget from the size of a function.
+
+        Parameters
+        ----------
+        base_tokens : int, default=48
+            Tokens for the summary line and the return section.
+        tokens_per_parameter : int, default=24
+            Tokens for each documented parameter.
+        tokens_per_line : int, default=2
+            Tokens for each non-blank line of the function body.
+        min_tokens : int, default=64
+            Lower bound of the budget.
+        max_tokens : int, default=400
+            Upper bound of the budget.
+        """
+        self.base_tokens = base_tokens
+        self.tokens_per_parameter = tokens_per_parameter
+        self.tokens_per_line = tokens_per_line
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.usage = Counter()
+
+    def estimate(self, code: str) -> int:
+        """
+        Estimate the number of new tokens needed to document a function.
+
+        Parameters
+        ----------
+        code : str
+            The source code of the function.
+
+        Returns
+        -------
+        int
+            The token budget.
+        """
+        body_lines = len([line for line in code.splitlines()[1:] if line.strip()])
+        return self.estimate_counts(count_parameters(code), body_lines)
+
+    def estimate_counts(self, parameters: int, body_lines: int) -> int:
+        """
+        Estimate the budget from already counted parameters and body lines.
+
+        Parameters
+        ----------
+        parameters : int
+            The number of documented parameters.
+        body_lines : int
+            The number of non-blank lines of the function body.
+
+        Returns
+        -------
+        int
+            The token budget.
+        """
+        budget = (
+            self.base_tokens
+            + self.tokens_per_parameter * parameters
+            + self.tokens_per_line * body_lines
+        )
+        return min(max(budget, self.min_tokens), self.max_tokens)
+
+    def record(self, budget: int, used_tokens: int):
+        """
+        Record the tokens actually used against a budget.
+
+        Parameters
+        ----------
+        budget : int
+            The budget the generation ran with.
+        used_tokens : int
+            The number of new tokens generated.
+        """
+        bucket = next((b for b in BUDGET_BUCKETS if budget <= b), BUDGET_BUCKETS[-1])
+        self.usage[(bucket, used_tokens >= budget)] += 1
+        self.usage[(bucket, "used")] += used_tokens
+        self.usage[(bucket, "budget")] += budget
+
+    def histogram(self) -> str:
+        """
+        Format the recorded budgets versus tokens used.
+
+        Returns
+        -------
+        str
+            One line per budget bucket with the number of generations, the
+            mean budget, the mean tokens used and how many hit the budget.
+        """
+        lines = ["budget<=  count  mean budget  mean used  exhausted"]
+        for bucket in BUDGET_BUCKETS:
+            count = self.usage[(bucket, True)] + self.usage[(bucket, False)]
+            if not count:
+                continue
+            lines.append(
+                f"{bucket:>8}  {count:>5}  {self.usage[(bucket, 'budget')] / count:>11.1f}"
+                f"  {self.usage[(bucket, 'used')] / count:>9.1f}  {self.usage[(bucket, True)]:>9}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,80 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+_current_token = contextvars.ContextVar("doctify_cancellation", default=None)
+
+
+class CancellationToken:
+    def __init__(self, deadline: "float | None" = None):
+        """
+        Signal that the caller no longer wants the result of a generation.
+
+        Local backends check the token of the current context at every
+        decode step and stop early once it is cancelled or expired.
+
+        Parameters
+        ----------
+        deadline : float, optional
+            ``time.monotonic()`` value after which the token counts as
+            cancelled.
+        """
+        self.deadline = deadline
+        self.event = threading.Event()
+        # set once a generation actually stopped early because of this token
+        self.interrupted = False
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set() or self.expired
+
+    def remaining(self) -> "float | None":
+        """
+        Seconds left until the deadline, None without one.
+        """
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken) -> Iterator[CancellationToken]:
+    """
+    Make a token the one checked by generations in the current context.
+
+    Parameters
+    ----------
+    token : CancellationToken
+        The token of the request being served.
+
+    Yields
+    ------
+    CancellationToken
+        The same token.
+    """
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def current_token() -> "CancellationToken | None":
+    return _current_token.get()
+
+
+def is_cancelled() -> bool:
+    token = _current_token.get()
+    if token is None or not token.cancelled:
+        return False
+    token.interrupted = True
+    return True
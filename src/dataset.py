@@ -0,0 +1,330 @@
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.logger import doctify_logger
+from src.planner import CHARS_PER_TOKEN
+from src.reducer import MAX_SEQ_LENGTH
+from src.shards import dataset_shards, shard_path
+from src.walker import GENERATED_PATTERN
+
+PERCENTILES = (0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+TOKEN_BINS = (0, 64, 128, 256, 512, MAX_SEQ_LENGTH, 1024, 2048, float("inf"))
+# ``__clean_code__`` strips the quotes but keeps string prefixes like ``r`` and
+# leaves an empty literal behind when the docstring text differs from the node
+RE_QUOTE_ARTIFACT_DOCSTRING = r"^[rRuUbB]{1,2}\s"
+RE_QUOTE_ARTIFACT_CODE = r'""""""|\'\'\'\'\'\''
+
+DEFAULT_RULES = {
+    "min_docstring_chars": 20,
+    "min_docstring_words": 3,
+    "min_code_lines": 2,
+    "max_code_tokens": 2048,
+    "max_non_ascii_ratio": 0.1,
+    "drop_generated": True,
+    "drop_quote_artifacts": True,
+    "drop_duplicates": True,
+}
+
+
+def read_jsonl(path: Path) -> pd.DataFrame:
+    """
+    Read a JSONL shard into a columnar frame, with Arrow when available.
+    """
+    try:
+        return pd.read_json(path, lines=True, engine="pyarrow", dtype_backend="pyarrow")
+    except (ImportError, ValueError, TypeError):
+        return pd.read_json(path, lines=True, dtype=False)
+
+
+def load_frame(paths: list[Path]) -> pd.DataFrame:
+    """
+    Load scraper shards into one frame, applying their tombstones.
+
+    A tombstone retracts the records of its file that come before it, so a
+    record survives when it sits after the last tombstone of its file.
+
+    Parameters
+    ----------
+    paths : list of Path
+        Scraper JSONL files, or directories of shards.
+
+    Returns
+    -------
+    pd.DataFrame
+        The live records with ``filaname``, ``method_name``, ``code`` and
+        ``docstring`` columns.
+    """
+    shards = []
+    for path in paths:
+        shards.extend(dataset_shards(path) if path.is_dir() else [path])
+
+    frames = []
+    for index, shard in enumerate(shards):
+        frame = read_jsonl(shard)
+        frame["_position"] = index * 2**32 + pd.RangeIndex(len(frame))
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["filaname", "method_name", "code", "docstring"])
+    frame = pd.concat(frames, ignore_index=True)
+
+    if "tombstone" in frame.columns:
+        is_tombstone = frame["tombstone"].fillna(False).astype(bool)
+        last_tombstone = frame[is_tombstone].groupby("filaname")["_position"].max()
+        frame = frame[~is_tombstone]
+        retracted = frame["_position"] < frame["filaname"].map(last_tombstone).fillna(-1)
+        frame = frame[~retracted].drop(columns=["tombstone"])
+
+    frame = frame.drop(columns=["_position"]).reset_index(drop=True)
+    frame["code"] = frame["code"].fillna("").astype(str)
+    frame["docstring"] = frame["docstring"].fillna("").astype(str)
+    return frame
+
+
+def add_metrics(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the length columns used by the statistics and the filter rules.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        The records.
+
+    Returns
+    -------
+    pd.DataFrame
+        The records with ``code_chars``, ``code_lines``, ``code_tokens``,
+        ``docstring_chars``, ``docstring_words``, ``docstring_tokens`` and
+        ``docstring_non_ascii_ratio`` columns.
+    """
+    code, docstring = frame["code"].str, frame["docstring"].str
+    frame["code_chars"] = code.len()
+    frame["code_lines"] = code.count("\n") + 1
+    frame["code_tokens"] = (frame["code_chars"] / CHARS_PER_TOKEN).astype(int) + 1
+    frame["docstring_chars"] = docstring.strip().str.len()
+    frame["docstring_words"] = docstring.count(r"\S+")
+    frame["docstring_tokens"] = (frame["docstring_chars"] / CHARS_PER_TOKEN).astype(int) + 1
+    non_ascii = docstring.count(r"[^\x00-\x7f]")
+    frame["docstring_non_ascii_ratio"] = non_ascii / frame["docstring_chars"].clip(lower=1)
+    return frame
+
+
+def distribution(series: pd.Series) -> dict:
+    # None instead of NaN for empty input, NaN is not valid JSON
+    series = series.dropna()
+    if series.empty:
+        return dict.fromkeys(["mean", "min", "max", *(f"p{round(q * 100)}" for q in PERCENTILES)])
+    quantiles = series.quantile(list(PERCENTILES))
+    return {
+        "mean": float(series.mean()),
+        "min": float(series.min()),
+        "max": float(series.max()),
+        **{f"p{round(q * 100)}": float(value) for q, value in quantiles.items()},
+    }
+
+
+def token_histogram(series: pd.Series) -> dict:
+    counts = pd.cut(series, bins=list(TOKEN_BINS), right=True).value_counts(sort=False)
+    return {str(interval): int(count) for interval, count in counts.items()}
+
+
+def compute_stats(frame: pd.DataFrame) -> dict:
+    """
+    Summarize the length and token distributions of the records.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        The records with the ``add_metrics`` columns.
+
+    Returns
+    -------
+    dict
+        Row and file counts, the distribution of every length column and
+        token histograms of code and docstrings.
+    """
+    columns = [
+        "code_chars",
+        "code_lines",
+        "code_tokens",
+        "docstring_chars",
+        "docstring_words",
+        "docstring_tokens",
+    ]
+    return {
+        "rows": int(len(frame)),
+        "files": int(frame["filaname"].nunique()) if "filaname" in frame else None,
+        "distributions": {column: distribution(frame[column]) for column in columns},
+        "code_token_histogram": token_histogram(frame["code_tokens"]),
+        "docstring_token_histogram": token_histogram(frame["docstring_tokens"]),
+        "over_max_seq_length": int((frame["code_tokens"] > MAX_SEQ_LENGTH).sum()),
+    }
+
+
+def rule_masks(frame: pd.DataFrame, rules: dict) -> dict[str, pd.Series]:
+    """
+    Evaluate every enabled filter rule as a boolean column.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        The records with the ``add_metrics`` columns.
+    rules : dict
+        Rule settings, see ``DEFAULT_RULES``. A rule set to None or False is
+        disabled.
+
+    Returns
+    -------
+    dict of str to pd.Series
+        For each enabled rule, True where a record is dropped.
+    """
+    masks = {}
+    if rules.get("min_docstring_chars") is not None:
+        masks["short_docstring"] = frame["docstring_chars"] < rules["min_docstring_chars"]
+    if rules.get("min_docstring_words") is not None:
+        masks["few_docstring_words"] = frame["docstring_words"] < rules["min_docstring_words"]
+    if rules.get("min_code_lines") is not None:
+        masks["short_code"] = frame["code_lines"] < rules["min_code_lines"]
+    if rules.get("max_code_tokens") is not None:
+        masks["long_code"] = frame["code_tokens"] > rules["max_code_tokens"]
+    if rules.get("max_non_ascii_ratio") is not None:
+        masks["non_english"] = (
+            frame["docstring_non_ascii_ratio"] > rules["max_non_ascii_ratio"]
+        )
+    if rules.get("drop_generated"):
+        masks["generated"] = frame["code"].str.contains(
+            GENERATED_PATTERN, flags=re.MULTILINE, regex=True
+        )
+    if rules.get("drop_quote_artifacts"):
+        masks["quote_artifacts"] = frame["docstring"].str.contains(
+            RE_QUOTE_ARTIFACT_DOCSTRING, regex=True
+        ) | frame["code"].str.contains(RE_QUOTE_ARTIFACT_CODE, regex=True)
+    if rules.get("drop_duplicates"):
+        masks["duplicate"] = frame.duplicated(subset=["code", "docstring"])
+    return {name: mask.fillna(False).astype(bool) for name, mask in masks.items()}
+
+
+def filter_frame(frame: pd.DataFrame, rules: dict) -> tuple[pd.DataFrame, dict]:
+    """
+    Drop the records matched by any filter rule.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        The records with the ``add_metrics`` columns.
+    rules : dict
+        Rule settings, see ``DEFAULT_RULES``.
+
+    Returns
+    -------
+    tuple of (pd.DataFrame, dict)
+        The kept records and the number of records each rule matched.
+    """
+    masks = rule_masks(frame, rules)
+    dropped = pd.Series(False, index=frame.index)
+    for mask in masks.values():
+        dropped |= mask
+    counts = {name: int(mask.sum()) for name, mask in masks.items()}
+    counts["dropped"] = int(dropped.sum())
+    return frame[~dropped], counts
+
+
+def write_shards(frame: pd.DataFrame, out_dir: Path, shard_size: int) -> list[Path]:
+    """
+    Write the records as JSONL shards in the scraper's record layout.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        The records.
+    out_dir : Path
+        The output directory.
+    shard_size : int
+        Records per shard.
+
+    Returns
+    -------
+    list of Path
+        The written shards, in order.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    columns = [column for column in ("filaname", "method_name", "code", "docstring") if column in frame]
+    paths = []
+    for index, start in enumerate(range(0, len(frame), shard_size)):
+        path = shard_path(out_dir, "filtered", index)
+        frame[columns].iloc[start : start + shard_size].to_json(
+            path, orient="records", lines=True, force_ascii=False
+        )
+        paths.append(path)
+    return paths
+
+
+parser = argparse.ArgumentParser(
+    prog="doctify-data",
+    description="Profile and filter scraped code/docstring pairs.",
+)
+subparsers = parser.add_subparsers(dest="action", required=True)
+stats_parser = subparsers.add_parser("stats", help="Print length and token distributions.")
+filter_parser = subparsers.add_parser(
+    "filter", help="Write the records passing the filter rules to new shards."
+)
+for command_parser in (stats_parser, filter_parser):
+    command_parser.add_argument(
+        "data", nargs="+", type=Path, help="Scraper JSONL files, or directories of shards."
+    )
+    command_parser.add_argument("--output", help="Also write the JSON summary to this file.")
+
+filter_parser.add_argument("--out", type=Path, required=True, help="Directory of the filtered shards.")
+filter_parser.add_argument(
+    "--rules",
+    type=Path,
+    required=False,
+    help="JSON file overriding the default rules: "
+    + ", ".join(f"{name}={value}" for name, value in DEFAULT_RULES.items())
+    + ". Set a rule to null or false to disable it.",
+)
+filter_parser.add_argument("--shard-size", type=int, default=100_000)
+
+
+def main():
+    """
+    Entry point for ``doctify-data``.
+    """
+    parsed_args = parser.parse_args()
+
+    start = time.perf_counter()
+    frame = add_metrics(load_frame(parsed_args.data))
+    summary = {"input": compute_stats(frame)}
+
+    if parsed_args.action == "filter":
+        rules = dict(DEFAULT_RULES)
+        if parsed_args.rules:
+            with open(parsed_args.rules, "r", encoding="utf-8") as file:
+                rules.update(json.load(file))
+        kept, counts = filter_frame(frame, rules)
+        shards = write_shards(kept, parsed_args.out, parsed_args.shard_size)
+        summary.update(
+            {
+                "rules": rules,
+                "dropped": counts,
+                "output": compute_stats(kept),
+                "shards": [str(shard) for shard in shards],
+            }
+        )
+        with open(parsed_args.out / "summary.json", "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+
+    summary["seconds"] = time.perf_counter() - start
+    doctify_logger.info(f"Processed {len(frame)} records in {summary['seconds']:.2f}s")
+    text = json.dumps(summary, indent=2)
+    if parsed_args.output:
+        Path(parsed_args.output).write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
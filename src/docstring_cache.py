@@ -0,0 +1,263 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable
+
+from src.logger import doctify_logger
+from src.treesitter import FunctionFingerprint, TreesitterPython
+
+DOCSTRING_CACHE_FILE = Path(
+    os.environ.get(
+        "DOCTIFY_DOCSTRING_CACHE", Path.home() / ".cache" / "doctify" / "docstrings.jsonl"
+    )
+)
+# entries kept in the file across all namespaces, the oldest are dropped beyond
+DOCSTRING_CACHE_MAX_ENTRIES = int(os.environ.get("DOCTIFY_DOCSTRING_CACHE_MAX_ENTRIES", 100_000))
+
+
+def clear_docstring_cache(path: Path = DOCSTRING_CACHE_FILE):
+    """
+    Delete the docstrings kept across runs.
+
+    Parameters
+    ----------
+    path : Path, default=DOCSTRING_CACHE_FILE
+        The cache file.
+    """
+    path.unlink(missing_ok=True)
+    doctify_logger.info(f"Cleared the docstring cache {path}")
+
+
+def substitute_parameters(docstring: str, source: list[str], target: list[str]) -> str:
+    """
+    Rename the parameters a docstring mentions to those of another function.
+
+    Parameters
+    ----------
+    docstring : str
+        The docstring written for a function with the ``source`` parameters.
+    source : list of str
+        The parameter names the docstring was written for.
+    target : list of str
+        The parameter names of the function reusing it, in the same order.
+
+    Returns
+    -------
+    str
+        The docstring with every parameter name replaced as a whole word.
+        Single letter names are only replaced in the entries of a parameter
+        list, since they are also ordinary words like ``a``.
+    """
+    mapping = {old: new for old, new in zip(source, target) if old != new}
+    if not mapping:
+        return docstring
+
+    names = "|".join(re.escape(name) for name in mapping)
+    entry = re.compile(rf"^(\s*\**)({names})(\s*:)")
+    words = "|".join(re.escape(name) for name in mapping if len(name) > 1)
+    word = re.compile(rf"\b({words})\b") if words else None
+
+    def rename(line: str) -> str:
+        # one pass per line, so swapped names are not renamed twice
+        head = ""
+        match = entry.match(line)
+        if match:
+            head = match.group(1) + mapping[match.group(2)] + match.group(3)
+            line = line[match.end() :]
+        if word is not None:
+            line = word.sub(lambda found: mapping[found.group(1)], line)
+        return head + line
+
+    return "".join(rename(line) for line in docstring.splitlines(keepends=True))
+
+
+def cache_key(fingerprint: FunctionFingerprint, max_new_tokens: "int | None") -> str:
+    # a docstring generated under an explicit budget may be truncated
+    if max_new_tokens is None:
+        return fingerprint.digest
+    return f"{fingerprint.digest}@{max_new_tokens}"
+
+
+class DocstringCache:
+    def __init__(
+        self,
+        namespace: str,
+        path: "Path | None" = DOCSTRING_CACHE_FILE,
+        max_entries: int = DOCSTRING_CACHE_MAX_ENTRIES,
+    ):
+        """
+        Share one generation between functions with the same structure.
+
+        Functions are keyed by their ``FunctionFingerprint``, so functions of
+        the same name that differ only in parameter or local names, comments
+        or whitespace are generated once per run, and, with a ``path``, once
+        across runs. A reused docstring gets
+        the parameter names of the function it is reused for.
+
+        Parameters
+        ----------
+        namespace : str
+            What else the docstring depends on, e.g. the backend, model and
+            adapter. Entries of other namespaces in the file are ignored.
+        path : Path, optional
+            JSONL file the docstrings are kept in across runs. Only kept in
+            memory when None.
+        max_entries : int, default=DOCSTRING_CACHE_MAX_ENTRIES
+            Entries of all namespaces kept in the file. Loading a larger file
+            rewrites it with only the most recent ones.
+        """
+        self.namespace = namespace
+        self.path = path
+        self.max_entries = max_entries
+        self.parser = TreesitterPython()
+        self.entries: "dict[str, tuple[list[str], str]] | None" = None
+        self.in_flight: dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        self.entries = {}
+        if self.path is None or not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            lines = file.readlines()
+        if len(lines) > self.max_entries:
+            lines = lines[-self.max_entries :]
+            self._compact(lines)
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("namespace") == self.namespace:
+                self.entries[record["fingerprint"]] = (
+                    record["parameters"],
+                    record["docstring"],
+                )
+        doctify_logger.info(f"Loaded {len(self.entries)} cached docstrings from {self.path}")
+
+    def _compact(self, lines: list[str]):
+        # rewrite next to the file and swap it in, so a crash never loses it
+        partial = self.path.with_suffix(".partial")
+        with open(partial, "w", encoding="utf-8") as file:
+            file.writelines(lines)
+        os.replace(partial, self.path)
+        doctify_logger.info(f"Kept the {len(lines)} most recent entries of {self.path}")
+
+    def _store(self, key: str, fingerprint: FunctionFingerprint, docstring: str):
+        self.entries[key] = (fingerprint.parameters, docstring)
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        record = {
+            "namespace": self.namespace,
+            "fingerprint": key,
+            "parameters": fingerprint.parameters,
+            "docstring": docstring,
+        }
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+
+    def _reuse(self, key: str, fingerprint: FunctionFingerprint) -> "str | None":
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        parameters, docstring = entry
+        return substitute_parameters(docstring, parameters, fingerprint.parameters)
+
+    def generate(
+        self,
+        codes: list[str],
+        generate_batch: Callable[[list[str]], list[str]],
+        max_new_tokens: "int | None" = None,
+    ) -> list[str]:
+        """
+        Generate docstrings, reusing those of functions with the same fingerprint.
+
+        Parameters
+        ----------
+        codes : list of str
+            The source code of the functions.
+        generate_batch : callable
+            Generates the docstrings of the functions that are not cached,
+            only one per fingerprint.
+        max_new_tokens : int, optional
+            The token budget ``generate_batch`` generates with. Docstrings cut
+            short by a budget are only reused under the same budget, never by
+            runs with the backend's own estimate.
+
+        Returns
+        -------
+        list of str
+            The docstrings, in input order.
+        """
+        fingerprints = [self.parser.fingerprint(code) for code in codes]
+        keys = [
+            None if fingerprint is None else cache_key(fingerprint, max_new_tokens)
+            for fingerprint in fingerprints
+        ]
+        docstrings: list["str | None"] = [None] * len(codes)
+        owned, waiting, misses = {}, {}, []
+        with self.lock:
+            if self.entries is None:
+                self._load()
+            for index, (fingerprint, key) in enumerate(zip(fingerprints, keys)):
+                if fingerprint is None:
+                    misses.append(index)
+                    continue
+                docstrings[index] = self._reuse(key, fingerprint)
+                if docstrings[index] is not None:
+                    self.hits += 1
+                elif key in owned:
+                    self.hits += 1
+                elif key in self.in_flight:
+                    # another thread is generating the same structure
+                    waiting[index] = self.in_flight[key]
+                    self.hits += 1
+                else:
+                    owned[key] = self.in_flight[key] = Future()
+                    misses.append(index)
+            self.misses += len(misses)
+
+        try:
+            generated = generate_batch([codes[index] for index in misses]) if misses else []
+            if len(generated) != len(misses):
+                raise RuntimeError(
+                    f"Generated {len(generated)} docstrings for {len(misses)} functions"
+                )
+        except BaseException as err:
+            with self.lock:
+                for key, future in owned.items():
+                    del self.in_flight[key]
+                    future.set_exception(err)
+            raise
+
+        with self.lock:
+            for index, docstring in zip(misses, generated):
+                docstrings[index] = docstring
+                fingerprint, key = fingerprints[index], keys[index]
+                if fingerprint is not None:
+                    # a failed (None) generation is never stored, nor reused later
+                    if docstring is not None:
+                        self._store(key, fingerprint, docstring)
+                    del self.in_flight[key]
+                    owned[key].set_result(None)
+
+        for index, future in waiting.items():
+            future.result()
+        with self.lock:
+            for index, docstring in enumerate(docstrings):
+                if docstring is None:
+                    docstrings[index] = self._reuse(keys[index], fingerprints[index])
+        return docstrings
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        return (
+            f"Docstring cache: {self.hits}/{total} functions reused a generation "
+            f"({self.hits / total if total else 0.0:.1%})"
+        )
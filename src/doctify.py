@@ -1,20 +1,218 @@
+import hashlib
+import json
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator
 
+from src.backends import InferenceBackend, create_backend
 from src.constants import Language
-from src.inference import Inference
+from src.docstring_cache import DocstringCache
 from src.logger import doctify_logger
-from src.treesitter import Treesitter, TreesitterMethodNode
+from src.planner import BudgetedRun, FunctionTask, RunPlan
+from src.profiler import profiler
+from src.treesitter import Treesitter, TreesitterMethodNode, read_source
+from src.walker import PythonFileWalker
 
 model_name = "manijhriya/phi2-doctify"
-inference = Inference(model_name)
+draft_model_name = os.environ.get("DOCTIFY_DRAFT_MODEL")
+backend_name = "transformers"
+backend_options = {"model_name": model_name, "draft_model_name": draft_model_name}
+# the fine-tuned adapter (docstring style) generations use, the base model when None
+adapter: "str | None" = None
+inference: "InferenceBackend | None" = None
+# reuse generations across structurally identical functions within a run, and
+# across runs through this file when set (opt-in, see --persist-docstring-cache)
+docstring_cache_file: "Path | None" = None
+use_docstring_cache = True
+docstring_cache: "DocstringCache | None" = None
+walker = PythonFileWalker()
 
 RE_FUNCTION_DEF = re.compile(r"((\n|.)*?:\n)")
 RE_FUNCTION_INDENTATION = re.compile(r"^(\s*)")
 
 
+def configure_backend(name: str, **options):
+    """
+    Select the inference backend used for the next generation.
+
+    Parameters
+    ----------
+    name : str
+        The registered name of the backend.
+    **options
+        Keyword arguments for the backend. The transformers backend defaults
+        to the doctify model.
+    """
+    global backend_name, backend_options, docstring_cache
+    close_inference()
+    docstring_cache = None
+    backend_name = name
+    if name == "transformers":
+        options = {"model_name": model_name, "draft_model_name": draft_model_name, **options}
+    backend_options = options
+
+
+def get_inference() -> InferenceBackend:
+    """
+    Create the inference backend on first use.
+
+    The transformers backend imports torch and loads the model, so it is
+    deferred until a docstring actually has to be generated.
+
+    Returns
+    -------
+    InferenceBackend
+        The shared inference backend.
+    """
+    global inference
+    if inference is None:
+        inference = create_backend(backend_name, **backend_options)
+    return inference
+
+
+def get_docstring_cache() -> "DocstringCache | None":
+    """
+    Create the docstring cache of the configured backend on first use.
+
+    Returns
+    -------
+    DocstringCache or None
+        The cache, None when it is disabled.
+    """
+    global docstring_cache
+    if docstring_cache is None and use_docstring_cache:
+        # docstrings of another model, adapter or backend option are not reused
+        key = json.dumps([backend_name, backend_options, adapter], sort_keys=True, default=str)
+        namespace = hashlib.sha1(key.encode()).hexdigest()
+        docstring_cache = DocstringCache(namespace, docstring_cache_file)
+    return docstring_cache
+
+
+def generate_with_profile(
+    code: str, filepath: Path, max_new_tokens: "int | None" = None
+) -> str:
+    """
+    Generate a docstring, recording the generate stage and its token count.
+
+    Parameters
+    ----------
+    code : str
+        The source code of the function.
+    filepath : Path
+        The file containing the function.
+    max_new_tokens : int, optional
+        The maximum number of generated tokens.
+
+    Returns
+    -------
+    str
+        The generated docstring.
+    """
+    backend = get_inference()
+    cache = get_docstring_cache()
+    with profiler.stage("generate", filepath) as stats:
+        tokens_before = getattr(backend, "generated_tokens", 0)
+        if cache is None:
+            docstring = backend.generate(code, max_new_tokens=max_new_tokens, adapter=adapter)
+        else:
+            docstring = cache.generate(
+                [code],
+                lambda codes: [
+                    backend.generate(codes[0], max_new_tokens=max_new_tokens, adapter=adapter)
+                ],
+                max_new_tokens=max_new_tokens,
+            )[0]
+        stats.tokens = getattr(backend, "generated_tokens", 0) - tokens_before
+    return docstring
+
+
+def generate_batch_with_profile(codes: list[str], filepath: Path) -> list[str]:
+    """
+    Generate the docstrings of several functions of a file in one call.
+
+    Parameters
+    ----------
+    codes : list of str
+        The source code of the functions.
+    filepath : Path
+        The file containing the functions.
+
+    Returns
+    -------
+    list of str
+        The generated docstrings, in input order.
+    """
+    backend = get_inference()
+    cache = get_docstring_cache()
+    with profiler.stage("generate", filepath) as stats:
+        tokens_before = getattr(backend, "generated_tokens", 0)
+        if cache is None:
+            docstrings = backend.generate_batch(codes, adapter=adapter)
+        else:
+            docstrings = cache.generate(
+                codes, lambda misses: backend.generate_batch(misses, adapter=adapter)
+            )
+        stats.count = len(codes)
+        stats.tokens = getattr(backend, "generated_tokens", 0) - tokens_before
+    return docstrings
+
+
+def generate_for_nodes(
+    nodes: list[TreesitterMethodNode], filepath: Path
+) -> "list[str | None]":
+    """
+    Generate the docstrings of a file's functions, batched when possible.
+
+    When the batch fails, the functions are retried one at a time, so a
+    single failing function doesn't cost the docstrings of the others.
+
+    Parameters
+    ----------
+    nodes : list of TreesitterMethodNode
+        The undocumented functions of the file.
+    filepath : Path
+        The file containing the functions.
+
+    Returns
+    -------
+    list of str or None
+        The generated docstrings, in input order, None for the functions
+        that failed.
+    """
+    try:
+        return generate_batch_with_profile([node.method_source_code for node in nodes], filepath)
+    except Exception as err:
+        doctify_logger.error(
+            f"{filepath} -> Error while generating docstrings, retrying one by one... \t Error : {err}"
+        )
+
+    docstrings = []
+    for node in nodes:
+        try:
+            docstrings.append(generate_with_profile(node.method_source_code, filepath))
+        except Exception as err:
+            doctify_logger.error(
+                f"{filepath} -> {node.name} -> Error while generating docstring skipping... \t Error : {err}"
+            )
+            docstrings.append(None)
+    return docstrings
+
+
+def close_inference():
+    """
+    Release the inference backend if it was created.
+    """
+    global inference
+    if docstring_cache is not None and docstring_cache.hits + docstring_cache.misses:
+        doctify_logger.info(docstring_cache.report())
+    if inference is not None:
+        inference.close()
+        inference = None
+
+
 def get_updated_code(docstring_content: Dict[str, str]) -> str:
     """
     Update the docstring with the docstring content.
@@ -63,11 +261,14 @@ def write_docsstring_to_file(docstring_content: Dict[str, str]):
         Dictionary containing the filepath, method_name and the docstring content.
     """
     doctify_logger.info(
-        f"{docstring_content['filepath']} -> {docstring_content['method_name']} Writing docstring..."
+        "%s -> %s Writing docstring...",
+        docstring_content["filepath"],
+        docstring_content["method_name"],
     )
     try:
-        with open(docstring_content["filepath"], "r", encoding="utf-8") as file:
-            file_content = file.read()
+        with profiler.stage("read", docstring_content["filepath"]):
+            with open(docstring_content["filepath"], "r", encoding="utf-8") as file:
+                file_content = file.read()
 
     except Exception as err:
         doctify_logger.error(
@@ -86,8 +287,9 @@ def write_docsstring_to_file(docstring_content: Dict[str, str]):
         )
 
         try:
-            with open(docstring_content["filepath"], "w", encoding="utf-8") as file:
-                file.write(modified_content)
+            with profiler.stage("write", docstring_content["filepath"]):
+                with open(docstring_content["filepath"], "w", encoding="utf-8") as file:
+                    file.write(modified_content)
 
         except Exception as err:
             doctify_logger.error(
@@ -96,56 +298,85 @@ def write_docsstring_to_file(docstring_content: Dict[str, str]):
             return
 
 
-def generate_docstring_for_file(filepath: Path):
+def find_undocumented_functions(
+    filepath: Path,
+) -> "tuple[bytes, list[TreesitterMethodNode]] | None":
     """
-    Generate docstring for all files in the directory.
+    Read and parse a file and collect its functions without a docstring.
 
     Parameters
     ----------
     filepath : Path
-        Path to the directory containing the files to be processed.
-    """
-    docstring_contents = []
+        The python file.
 
+    Returns
+    -------
+    tuple of (bytes, list of TreesitterMethodNode) or None
+        The file content and the undocumented functions, or None if the
+        file cannot be read or parsed, or is generated code.
+    """
     try:
-        with open(filepath, "r") as file_content:
-            file_bytes = file_content.read().encode()
+        with profiler.stage("read", filepath):
+            file_bytes = read_source(filepath)
 
     except Exception as err:
         doctify_logger.error(
             f"{filepath} -> Error while reading file skipping... \t Error : {err}"
         )
-        return
+        return None
+
+    if walker.skips_source(file_bytes):
+        doctify_logger.info("%s -> generated code, skipping...", filepath)
+        return None
 
     treesitter_parser = Treesitter.create_treesitter(Language.PYTHON)
 
     try:
-        treesitterNodes: list[TreesitterMethodNode] = treesitter_parser.parse(
-            file_bytes
-        )
+        with profiler.stage("parse", filepath):
+            treesitterNodes: list[TreesitterMethodNode] = treesitter_parser.parse(
+                file_bytes
+            )
     except Exception as err:
         doctify_logger.error(
             f"{filepath} -> Error while Parsing this file skipping... \t Error : {err}"
         )
-        return
+        return None
 
+    undocumented_nodes = []
     for node in treesitterNodes:
-        if node.doc_comment:
-            doctify_logger.warning(
-                f"{filepath} -> {node.name} -> already has docstring skipping... "
+        if node.has_doc_comment:
+            doctify_logger.info(
+                "%s -> %s -> already has docstring skipping... ", filepath, node.name
             )
             continue
 
-        doctify_logger.info(f"{filepath} -> {node.name} -> Generating docstring...")
+        doctify_logger.info("%s -> %s -> Generating docstring...", filepath, node.name)
+        undocumented_nodes.append(node)
+    return file_bytes, undocumented_nodes
 
-        try:
-            docstring = inference.generate_docstring(node.method_source_code)
-        except Exception as err:
-            doctify_logger.error(
-                f"{filepath} -> {node.name} -> Error while generating docstring skipping... \t Error : {err}"
-            )
-            return ""
 
+def generate_docstring_for_file(filepath: Path):
+    """
+    Generate docstring for all files in the directory.
+
+    Parameters
+    ----------
+    filepath : Path
+        Path to the directory containing the files to be processed.
+    """
+    docstring_contents = []
+
+    found = find_undocumented_functions(filepath)
+    if found is None:
+        return
+    _, undocumented_nodes = found
+    if not undocumented_nodes:
+        return
+
+    docstrings = generate_for_nodes(undocumented_nodes, filepath)
+    for node, docstring in zip(undocumented_nodes, docstrings):
+        if docstring is None:
+            continue
         docstring_contents.append(
             {
                 "filepath": filepath,
@@ -158,6 +389,46 @@ def generate_docstring_for_file(filepath: Path):
     list(map(write_docsstring_to_file, docstring_contents))
 
 
+def iter_python_files(start_dir: Path) -> Iterator[Path]:
+    """
+    Stream the .py files below a directory, skipping ignored paths.
+
+    Parameters
+    ----------
+    start_dir : Path
+        The directory to start the recursion.
+
+    Yields
+    ------
+    Path
+        The python files.
+    """
+    filepaths = walker.walk(start_dir)
+    while True:
+        with profiler.stage("walk"):
+            filepath = next(filepaths, None)
+        if filepath is None:
+            return
+        yield filepath
+
+
+def list_python_files(start_dir: Path) -> list[Path]:
+    """
+    List all .py files below a directory, skipping ignored paths.
+
+    Parameters
+    ----------
+    start_dir : Path
+        The directory to start the recursion.
+
+    Returns
+    -------
+    list of Path
+        The python files.
+    """
+    return list(iter_python_files(start_dir))
+
+
 def generate_docstring_for_directory(start_dir: Path):
     """
     Generate docstring for all.py files in a directory.
@@ -171,23 +442,86 @@ def generate_docstring_for_directory(start_dir: Path):
         raise ValueError("start directory is not a Path object.")
 
     doctify_logger.info(f"Working on {str(start_dir.cwd())}")
-    complete_filenames = []
-    for dirpath, dirnames, filenames in os.walk(start_dir):
-        complete_filenames.extend(
-            list(
-                map(
-                    lambda x: (
-                        Path(dirpath) / x if os.path.splitext(x)[-1] == ".py" else None
-                    ),
-                    filenames,
-                )
-            )
-        )
+    concurrency = get_inference().capabilities.concurrency
+    documented = 0
 
-    filenames = list(set(complete_filenames))
-    doctify_logger.info(f"{len(filenames)} Files needs to be documented..")
-    for filename in filenames:
-        generate_docstring_for_file(filename)
+    if concurrency <= 1:
+        for filename in iter_python_files(start_dir):
+            generate_docstring_for_file(filename)
+            documented += 1
+    else:
+        # remote backends: keep a bounded number of files in flight so the
+        # server always has the next request queued
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            in_flight = []
+            for filename in iter_python_files(start_dir):
+                if len(in_flight) >= 2 * concurrency:
+                    in_flight.pop(0).result()
+                in_flight.append(executor.submit(generate_docstring_for_file, filename))
+                documented += 1
+            for future in in_flight:
+                future.result()
+
+    doctify_logger.info(f"{documented} Files documented..")
+
+
+def generate_docstring_for_task(task: FunctionTask):
+    """
+    Generate and write the docstring of one planned function.
+
+    Parameters
+    ----------
+    task : FunctionTask
+        The planned function.
+    """
+    doctify_logger.info("%s -> %s -> Generating docstring...", task.filepath, task.name)
+    docstring = generate_with_profile(
+        task.source_code, task.filepath, max_new_tokens=task.output_tokens
+    )
+    write_docsstring_to_file(
+        {
+            "filepath": task.filepath,
+            "method_name": task.name,
+            "original_code": task.source_code,
+            "generated_docstring": docstring,
+        }
+    )
+
+
+def generate_docstring_with_budget(
+    filepaths: list[Path],
+    time_budget: "float | None" = None,
+    token_budget: "int | None" = None,
+    plan_only: bool = False,
+):
+    """
+    Rank the undocumented functions and document them within budget.
+
+    Parameters
+    ----------
+    filepaths : list of Path
+        The python files to document.
+    time_budget : float, optional
+        Wall-clock seconds available for generation.
+    token_budget : int, optional
+        Estimated tokens available for generation.
+    plan_only : bool, default=False
+        Only print the plan, without loading the model.
+    """
+    # the time budget covers planning and the model load as well
+    start = time.perf_counter()
+    plan = RunPlan.build(filepaths, walker=walker)
+    if plan_only:
+        print(plan.report())
+        return
+
+    # loaded before the run, so its load time isn't taken for generation speed
+    get_inference()
+    budgeted_run = BudgetedRun(
+        plan, time_budget=time_budget, token_budget=token_budget, start=start
+    )
+    budgeted_run.run(generate_docstring_for_task)
+    doctify_logger.info(budgeted_run.report())
 
 
 def main(*args, **kwargs):
@@ -200,12 +534,35 @@ def main(*args, **kwargs):
         Path to the file to generate docstrings for.
     path : str, optional
         Path to the directory to generate docstrings for.
+    time_budget : float, optional
+        Wall-clock seconds available for generation.
+    token_budget : int, optional
+        Estimated tokens available for generation.
+    plan_only : bool, optional
+        Only print the estimated plan.
     """
+    budget = {
+        "time_budget": kwargs.get("time_budget"),
+        "token_budget": kwargs.get("token_budget"),
+        "plan_only": kwargs.get("plan_only", False),
+    }
+    budgeted = (
+        budget["time_budget"] is not None
+        or budget["token_budget"] is not None
+        or budget["plan_only"]
+    )
+
     if filepath := kwargs.get("filepath"):
-        generate_docstring_for_file(filepath)
+        if budgeted:
+            generate_docstring_with_budget([filepath], **budget)
+        else:
+            generate_docstring_for_file(filepath)
 
     elif path := kwargs.get("path"):
-        generate_docstring_for_directory(path)
+        if budgeted:
+            generate_docstring_with_budget(list_python_files(path), **budget)
+        else:
+            generate_docstring_for_directory(path)
 
     else:
         doctify_logger.error("Nothing to work with exiting..")
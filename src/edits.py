@@ -0,0 +1,245 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from src import doctify
+from src.logger import doctify_logger
+from src.profiler import profiler
+from src.treesitter import TreesitterMethodNode, read_source
+
+
+def content_hash(file_bytes: bytes) -> str:
+    return hashlib.sha1(file_bytes).hexdigest()
+
+
+def docstring_insertion(node: TreesitterMethodNode, docstring: str) -> tuple[int, str]:
+    """
+    Locate where a docstring goes and format it like ``get_updated_code``.
+
+    Parameters
+    ----------
+    node : TreesitterMethodNode
+        The undocumented function.
+    docstring : str
+        The generated docstring.
+
+    Returns
+    -------
+    tuple of (int, str)
+        The byte offset in the file right after the signature line and the
+        indented, quoted docstring to insert there.
+    """
+    code = node.method_source_code
+    function_def = doctify.RE_FUNCTION_DEF.findall(code)[0][0]
+    function_body = code[len(function_def) :]
+    indentation = " " * len(doctify.RE_FUNCTION_INDENTATION.findall(function_body)[0])
+    text = f'{indentation}"""\n{indentation}{docstring}\n{indentation}"""\n'
+    return node.start_byte + len(function_def.encode()), text
+
+
+def read_edits(edits_path: Path) -> Iterator[dict]:
+    """
+    Read the file records of an edits file, ignoring a torn last line.
+
+    Parameters
+    ----------
+    edits_path : Path
+        The JSONL file written by ``generate_edits``.
+
+    Yields
+    ------
+    dict
+        One record per file with ``path``, ``sha1`` and ``edits``.
+    """
+    with open(edits_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                doctify_logger.warning(f"{edits_path} -> skipping an incomplete record")
+
+
+def truncate_partial_line(edits_path: Path):
+    """
+    Drop the unfinished last line a crashed generation may have left.
+    """
+    with open(edits_path, "rb+") as file:
+        content = file.read()
+        if content and not content.endswith(b"\n"):
+            file.truncate(content.rfind(b"\n") + 1)
+
+
+def file_edits(filepath: Path, base: Path) -> "dict | None":
+    """
+    Generate the docstring edits of one file without touching it.
+
+    Parameters
+    ----------
+    filepath : Path
+        The python file.
+    base : Path
+        The directory paths in the edits file are relative to.
+
+    Returns
+    -------
+    dict or None
+        The record of the file, or None when it has nothing to document.
+    """
+    found = doctify.find_undocumented_functions(filepath)
+    if found is None or not found[1]:
+        return None
+    file_bytes, nodes = found
+
+    docstrings = doctify.generate_for_nodes(nodes, filepath)
+    edits = []
+    for node, docstring in zip(nodes, docstrings):
+        if docstring is None:
+            continue
+        try:
+            insert_byte, text = docstring_insertion(node, docstring)
+        except IndexError:
+            doctify_logger.error(f"{filepath} -> {node.name} -> no signature line, skipping...")
+            continue
+        edits.append(
+            {
+                "method_name": node.name,
+                "start_byte": node.start_byte,
+                "end_byte": node.end_byte,
+                "insert_byte": insert_byte,
+                "docstring": docstring,
+                "text": text,
+            }
+        )
+    return {
+        "path": filepath.relative_to(base).as_posix(),
+        "sha1": content_hash(file_bytes),
+        "edits": edits,
+    }
+
+
+def generate_edits(target: Path, edits_path: Path, resume: bool = True) -> int:
+    """
+    Stream the docstring edits of a file or directory to a JSONL file.
+
+    Every line holds all edits of one file, so a crash loses at most the
+    file being written. Files already in the edits file with an unchanged
+    content hash are skipped when resuming.
+
+    Parameters
+    ----------
+    target : Path
+        The python file or directory to document.
+    edits_path : Path
+        The edits file.
+    resume : bool, default=True
+        Append to an existing edits file instead of starting over.
+
+    Returns
+    -------
+    int
+        The number of files with edits written in this run.
+    """
+    base = target.parent if target.is_file() else target
+    filepaths = iter([target]) if target.is_file() else doctify.iter_python_files(target)
+
+    done = {}
+    if resume and edits_path.exists():
+        truncate_partial_line(edits_path)
+        done = {record["path"]: record["sha1"] for record in read_edits(edits_path)}
+        doctify_logger.info(f"Resuming {edits_path} with {len(done)} files already generated")
+
+    def pending() -> Iterator[Path]:
+        for filepath in filepaths:
+            path = filepath.relative_to(base).as_posix()
+            if path in done and done[path] == content_hash(read_source(filepath)):
+                continue
+            yield filepath
+
+    written = 0
+    concurrency = doctify.get_inference().capabilities.concurrency
+    with open(edits_path, "a" if resume else "w", encoding="utf-8") as file:
+
+        def write(record: "dict | None"):
+            nonlocal written
+            if record is None or not record["edits"]:
+                return
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            written += 1
+
+        if concurrency <= 1:
+            for filepath in pending():
+                write(file_edits(filepath, base))
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                in_flight = []
+                for filepath in pending():
+                    if len(in_flight) >= 2 * concurrency:
+                        write(in_flight.pop(0).result())
+                    in_flight.append(executor.submit(file_edits, filepath, base))
+                for future in in_flight:
+                    write(future.result())
+
+    doctify_logger.info(f"{written} files with edits written to {edits_path}")
+    return written
+
+
+def apply_edits(edits_path: Path, root: Path) -> dict[str, int]:
+    """
+    Apply an edits file, reading and writing every file once.
+
+    A file is only changed if its content hash still matches the one the
+    edits were generated from.
+
+    Parameters
+    ----------
+    edits_path : Path
+        The edits file written by ``generate_edits``.
+    root : Path
+        The directory the paths in the edits file are relative to.
+
+    Returns
+    -------
+    dict of str to int
+        Counts of ``applied`` files, ``docstrings`` inserted, ``stale`` files
+        whose content changed and ``missing`` files.
+    """
+    # a file generated twice, e.g. after a resume, keeps its latest record
+    records = {record["path"]: record for record in read_edits(edits_path)}
+    counts = {"applied": 0, "docstrings": 0, "stale": 0, "missing": 0}
+
+    for path, record in records.items():
+        filepath = root / path
+        try:
+            with profiler.stage("read", filepath):
+                file_bytes = read_source(filepath)
+        except OSError:
+            doctify_logger.warning(f"{filepath} -> missing, skipping its edits")
+            counts["missing"] += 1
+            continue
+
+        if content_hash(file_bytes) != record["sha1"]:
+            doctify_logger.warning(f"{filepath} -> changed since generation, skipping its edits")
+            counts["stale"] += 1
+            continue
+
+        chunks, position = [], 0
+        for edit in sorted(record["edits"], key=lambda edit: edit["insert_byte"]):
+            chunks.append(file_bytes[position : edit["insert_byte"]])
+            chunks.append(edit["text"].encode())
+            position = edit["insert_byte"]
+        chunks.append(file_bytes[position:])
+
+        with profiler.stage("write", filepath):
+            with open(filepath, "wb") as file:
+                file.write(b"".join(chunks))
+        counts["applied"] += 1
+        counts["docstrings"] += len(record["edits"])
+
+    doctify_logger.info(
+        f"Applied {counts['docstrings']} docstrings to {counts['applied']} files, "
+        f"{counts['stale']} stale and {counts['missing']} missing files skipped"
+    )
+    return counts
@@ -0,0 +1,292 @@
+import math
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+from src.backends import create_backend
+from src.budget import parameter_names
+from src.logger import doctify_logger
+from src.shards import HOLDOUT_FRACTION, dataset_shards, in_holdout, read_shards
+
+RE_WORD = re.compile(r"\w+|[^\w\s]")
+RE_RETURN_VALUE = re.compile(r"^\s*(return|yield)\s+\S", re.MULTILINE)
+NUMPY_SECTIONS = ("Parameters", "Returns", "Yields", "Raises")
+
+
+def load_records(paths: list[Path]) -> list[dict]:
+    """
+    Read the code/docstring records written by ``Scarper``.
+
+    Parameters
+    ----------
+    paths : list of Path
+        JSONL files, or directories whose ``*.jsonl`` files are read.
+
+    Returns
+    -------
+    list of dict
+        The records with a code and a docstring, in file order.
+    """
+    shards = []
+    for path in paths:
+        shards.extend(dataset_shards(path) if path.is_dir() else [path])
+    return [
+        record
+        for record in read_shards(shards)
+        if record.get("code") and record.get("docstring")
+    ]
+
+
+def tokenize(text: str) -> list[str]:
+    return RE_WORD.findall(text.lower())
+
+
+def rouge_l(candidate: list[str], reference: list[str]) -> float:
+    """
+    ROUGE-L F1 between two token lists, from their longest common subsequence.
+    """
+    if not candidate or not reference:
+        return 0.0
+    previous = [0] * (len(reference) + 1)
+    for token in candidate:
+        current = [0]
+        for index, ref_token in enumerate(reference):
+            current.append(
+                previous[index] + 1
+                if token == ref_token
+                else max(previous[index + 1], current[index])
+            )
+        previous = current
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(candidate), lcs / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+
+def bleu(candidate: list[str], reference: list[str], max_order: int = 4) -> float:
+    """
+    Sentence BLEU with add-one smoothing of the higher order precisions.
+    """
+    if not candidate or not reference:
+        return 0.0
+    log_precision = 0.0
+    for order in range(1, max_order + 1):
+        candidate_ngrams = Counter(
+            tuple(candidate[i : i + order]) for i in range(len(candidate) - order + 1)
+        )
+        reference_ngrams = Counter(
+            tuple(reference[i : i + order]) for i in range(len(reference) - order + 1)
+        )
+        matches = sum((candidate_ngrams & reference_ngrams).values())
+        total = sum(candidate_ngrams.values())
+        if order > 1:
+            matches, total = matches + 1, total + 1
+        if not matches or not total:
+            return 0.0
+        log_precision += math.log(matches / total) / max_order
+    brevity = min(0.0, 1 - len(reference) / len(candidate))
+    return math.exp(log_precision + brevity)
+
+
+def structure_checks(code: str, docstring: str) -> dict[str, float]:
+    """
+    Check a generated docstring against the numpy docstring layout.
+
+    Parameters
+    ----------
+    code : str
+        The documented function.
+    docstring : str
+        The generated docstring.
+
+    Returns
+    -------
+    dict of str to float
+        ``summary``: the docstring starts with a one line summary.
+        ``sections``: every section header is underlined with dashes.
+        ``parameters``: share of the signature's parameters documented
+        under a Parameters section (1.0 for functions without any).
+        ``returns``: a Returns or Yields section is present exactly when the
+        function returns or yields a value.
+    """
+    lines = [line.strip() for line in docstring.strip().splitlines()]
+    summary = bool(lines) and bool(lines[0]) and lines[0] not in NUMPY_SECTIONS
+    headers = [index for index, line in enumerate(lines) if line in NUMPY_SECTIONS]
+    sections = all(
+        index + 1 < len(lines) and set(lines[index + 1]) == {"-"} for index in headers
+    )
+
+    names = parameter_names(code)
+    if names:
+        documented = set()
+        if "Parameters" in lines:
+            documented = {
+                line.split(":")[0].strip().lstrip("*")
+                for line in lines[lines.index("Parameters") + 1 :]
+            }
+        parameters = len([name for name in names if name in documented]) / len(names)
+    else:
+        parameters = float("Parameters" not in lines)
+
+    has_returns = "Returns" in lines or "Yields" in lines
+    returns = has_returns == bool(RE_RETURN_VALUE.search(code))
+    return {
+        "summary": float(summary),
+        "sections": float(sections),
+        "parameters": parameters,
+        "returns": float(returns),
+    }
+
+
+def score(code: str, reference: str, generated: str) -> dict[str, float]:
+    candidate_tokens, reference_tokens = tokenize(generated), tokenize(reference)
+    return {
+        "rouge_l": rouge_l(candidate_tokens, reference_tokens),
+        "bleu": bleu(candidate_tokens, reference_tokens),
+        **structure_checks(code, generated),
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def evaluate_configuration(config: dict, records: list[dict]) -> dict:
+    """
+    Generate docstrings for the held-out records with one configuration.
+
+    Parameters
+    ----------
+    config : dict
+        ``name``, ``backend``, ``backend_options``, ``batch_size``, an
+        optional fixed ``max_new_tokens`` and an optional ``adapter``.
+    records : list of dict
+        The held-out records.
+
+    Returns
+    -------
+    dict
+        Throughput, latency percentiles of the batches and mean scores.
+    """
+    backend = create_backend(
+        config.get("backend", "transformers"), **config.get("backend_options", {})
+    )
+    batch_size = config.get("batch_size", 1)
+    max_new_tokens = config.get("max_new_tokens")
+    try:
+        warmup_start = time.perf_counter()
+        backend.warmup()
+        warmup_seconds = time.perf_counter() - warmup_start
+
+        latencies, scores = [], []
+        start = time.perf_counter()
+        for index in range(0, len(records), batch_size):
+            batch = records[index : index + batch_size]
+            codes = [record["code"] for record in batch]
+            batch_start = time.perf_counter()
+            docstrings = backend.generate_batch(
+                codes,
+                max_new_tokens=[max_new_tokens] * len(codes),
+                adapter=config.get("adapter"),
+            )
+            latencies.append(time.perf_counter() - batch_start)
+            scores.extend(
+                score(record["code"], record["docstring"], docstring)
+                for record, docstring in zip(batch, docstrings)
+            )
+        seconds = time.perf_counter() - start
+        generated_tokens = getattr(backend, "generated_tokens", None)
+    finally:
+        backend.close()
+
+    result = {
+        "name": config["name"],
+        "functions": len(records),
+        "batch_size": batch_size,
+        "warmup_seconds": warmup_seconds,
+        "seconds": seconds,
+        "functions_per_second": len(records) / seconds if seconds else 0.0,
+        "tokens_per_second": generated_tokens / seconds if generated_tokens and seconds else None,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p90": percentile(latencies, 90),
+        "latency_p99": percentile(latencies, 99),
+    }
+    for metric in ("rouge_l", "bleu", "summary", "sections", "parameters", "returns"):
+        result[metric] = sum(s[metric] for s in scores) / len(scores) if scores else 0.0
+    return result
+
+
+def format_table(results: list[dict]) -> str:
+    """
+    Format the results of several configurations as an aligned table.
+
+    Parameters
+    ----------
+    results : list of dict
+        The results of ``evaluate_configuration``.
+
+    Returns
+    -------
+    str
+        One line per configuration.
+    """
+    width = max([len("config"), *(len(result["name"]) for result in results)])
+    lines = [
+        f"{'config':<{width}}  batch     fn/s      tok/s   p50 s   p90 s   p99 s"
+        "  rougeL   bleu  summary  sections  params  returns"
+    ]
+    for result in results:
+        tokens = result["tokens_per_second"]
+        lines.append(
+            f"{result['name']:<{width}}  {result['batch_size']:>5}"
+            f"  {result['functions_per_second']:>7.2f}"
+            f"  {tokens if tokens is not None else float('nan'):>9.1f}"
+            f"  {result['latency_p50']:>6.2f}  {result['latency_p90']:>6.2f}"
+            f"  {result['latency_p99']:>6.2f}"
+            f"  {result['rouge_l']:>6.3f}  {result['bleu']:>5.3f}"
+            f"  {result['summary']:>7.2f}  {result['sections']:>8.2f}"
+            f"  {result['parameters']:>6.2f}  {result['returns']:>7.2f}"
+        )
+    return "\n".join(lines)
+
+
+def run_evaluation(
+    paths: list[Path],
+    configs: list[dict],
+    holdout: float = HOLDOUT_FRACTION,
+    limit: "int | None" = None,
+) -> list[dict]:
+    """
+    Evaluate every configuration on the same held-out records.
+
+    Parameters
+    ----------
+    paths : list of Path
+        The ``Scarper`` JSONL files or directories.
+    configs : list of dict
+        The configurations, see ``evaluate_configuration``.
+    holdout : float, default=HOLDOUT_FRACTION
+        Share of the records held out for evaluation. ``finetune`` trains
+        without the records held out at the default fraction.
+    limit : int, optional
+        Evaluate at most this many held-out records.
+
+    Returns
+    -------
+    list of dict
+        The result of each configuration, in order.
+    """
+    records = [record for record in load_records(paths) if in_holdout(record, holdout)]
+    records = records[:limit] if limit else records
+    doctify_logger.info(f"Evaluating {len(configs)} configurations on {len(records)} functions")
+
+    results = []
+    for config in configs:
+        doctify_logger.info(f"Evaluating {config['name']}")
+        results.append(evaluate_configuration(config, records))
+    return results
@@ -1,8 +1,8 @@
 # Imports
 import os
 from pathlib import Path
+from typing import Dict
 
-import jsonlines
 import pandas as pd
 import torch
 from datasets import load_dataset
@@ -13,6 +13,8 @@ from transformers import (AutoModelForCausalLM, AutoTokenizer,
 from trl import SFTTrainer
 
 from src.logger import doctify_logger
+from src.reducer import MAX_SEQ_LENGTH
+from src.shards import HOLDOUT_FRACTION, dataset_shards, in_holdout, read_shards
 
 torch.cuda.empty_cache()
 
@@ -34,7 +36,7 @@ def format_row(row: Dict[str, str]) -> str:
     return f'<|beginoftext|> {row["code"]} <|separateoftext|> {row["docstring"]} <|endoftext|>'
 
 
-def load_all_data_files(file_path: Path) -> pd.DataFrame:
+def load_all_data_files(file_path: Path, holdout: float = HOLDOUT_FRACTION) -> list[dict]:
     """
     Load all data files from a directory.
 
@@ -42,17 +44,19 @@ def load_all_data_files(file_path: Path) -> pd.DataFrame:
     ----------
     file_path : Path
         Directory containing data files.
+    holdout : float, default=HOLDOUT_FRACTION
+        Share of the records held out for ``doctify eval``, left out here.
 
     Returns
     -------
-    pd.DataFrame
-        Dataframe containing all data.
+    list of dict
+        The records used for training.
     """
-    data = []
-    for file in os.listdir(file_path):
-        with jsonlines.open(f"{file_path}/{file}", "r") as reader:
-            data.extend(list(reader))
-    return data
+    return [
+        record
+        for record in read_shards(dataset_shards(file_path))
+        if not in_holdout(record, holdout)
+    ]
 
 
 def build_training_data(processed_data: Path, output_dir: Path) -> None:
@@ -220,7 +224,7 @@ def build_and_load_trainer(
         train_dataset=training_dataset,
         peft_config=peft_config,
         dataset_text_field="Text",
-        max_seq_length=690,
+        max_seq_length=MAX_SEQ_LENGTH,
         tokenizer=tokenizer,
         args=training_arguments,
     )
@@ -1,15 +1,243 @@
+import contextlib
+import time
+
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import (AutoConfig, AutoModelForCausalLM, AutoTokenizer,
+                          StoppingCriteria, StoppingCriteriaList)
+from transformers.models.auto.modeling_auto import MODEL_FOR_CAUSAL_LM_MAPPING
 
+from src.budget import TokenBudget
+from src.cancellation import is_cancelled
 from src.logger import doctify_logger
+from src.model_cache import find_prepared_model
 from src.prompts import default_prompt
+from src.reducer import MAX_SEQ_LENGTH, MIN_INPUT_TOKENS, InputReducer
+from src.skeleton import Slot, body_indentation, docstring_skeleton, fill_skeleton
+from src.treesitter import TreesitterPython
+
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+DTYPE = torch.float16 if DEVICE == "cuda" else torch.float32
+DTYPE_NAME = str(DTYPE).split(".")[-1]
+
+torch.set_default_device(DEVICE)
+if DEVICE == "cuda":
+    torch.cuda.empty_cache()
+
+WARMUP_CODE = "def warmup(value):\n    return value\n"
+COMPILE_WARMUP_RUNS = 2
+COMPILE_WARMUP_TOKENS = 8
+
+
+class AssistedGenerationStats:
+    def __init__(self):
+        """
+        Counters for assisted (speculative) generation.
+
+        Every verification step runs the target model once and yields the
+        accepted draft tokens plus one token of its own, so the number of
+        accepted draft tokens is the generated tokens minus the target forwards.
+        """
+        self.calls = 0
+        self.generated_tokens = 0
+        self.target_forwards = 0
+        self.draft_forwards = 0
+
+    @property
+    def accepted_tokens(self) -> int:
+        return max(self.generated_tokens - self.target_forwards, 0)
+
+    @property
+    def acceptance_rate(self) -> float:
+        if not self.draft_forwards:
+            return 0.0
+        return self.accepted_tokens / self.draft_forwards
+
+    @property
+    def tokens_per_step(self) -> float:
+        if not self.target_forwards:
+            return 0.0
+        return self.generated_tokens / self.target_forwards
+
+
+class EndOfTextCriteria(StoppingCriteria):
+    def __init__(self, eos_token_id: int):
+        """
+        Stop as soon as the end-of-text token is generated.
+
+        Parameters
+        ----------
+        eos_token_id : int
+            The id of the ``<|endoftext|>`` token.
+        """
+        self.eos_token_id = eos_token_id
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        return input_ids[:, -1] == self.eos_token_id
+
+
+class RepeatedNgramCriteria(StoppingCriteria):
+    def __init__(self, prompt_length: int, ngram_size: int = 8, max_repeats: int = 3):
+        """
+        Stop runaway generations that keep repeating themselves.
+
+        Each row of a batch is checked on its own, so one runaway sequence
+        is finished without holding up or stopping the others.
+
+        Parameters
+        ----------
+        prompt_length : int
+            The number of (padded) prompt tokens, which are not checked.
+        ngram_size : int, default=8
+            The length of the n-gram to look for.
+        max_repeats : int, default=3
+            Stop once the latest n-gram occurred this many times in the
+            generated tokens.
+        """
+        self.prompt_length = prompt_length
+        self.ngram_size = ngram_size
+        self.max_repeats = max_repeats
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        generated = input_ids[:, self.prompt_length :]
+        if generated.shape[-1] < self.ngram_size * self.max_repeats:
+            return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+        # (batch, windows, ngram_size): every n-gram of every row
+        ngrams = generated.unfold(1, self.ngram_size, 1)
+        repeats = (ngrams == ngrams[:, -1:, :]).all(dim=-1).sum(dim=-1)
+        return repeats >= self.max_repeats
+
+
+def compile_unsupported(model_path: str) -> "str | None":
+    """
+    Tell why compiled decoding can't be used with a model, before loading it.
+
+    Parameters
+    ----------
+    model_path : str
+        The model name or local checkpoint.
+
+    Returns
+    -------
+    str or None
+        Why the model class of the installed transformers lacks SDPA
+        attention or a static key/value cache, None when it has both.
+    """
+    try:
+        model_class = MODEL_FOR_CAUSAL_LM_MAPPING[type(AutoConfig.from_pretrained(model_path))]
+    except (KeyError, OSError, ValueError) as err:
+        return f"cannot resolve the model class of {model_path} ({err!r})"
+    if not getattr(model_class, "_supports_sdpa", False):
+        return f"{model_class.__name__} has no SDPA attention"
+    if not (
+        getattr(model_class, "_supports_static_cache", False)
+        or getattr(model_class, "_can_compile_fullgraph", False)
+    ):
+        return f"{model_class.__name__} has no static cache support"
+    return None
+
+
+def trim_to_first_stop(
+    output_ids: torch.LongTensor, prompt_length: int, criteria: list[StoppingCriteria]
+) -> torch.LongTensor:
+    """
+    Cut a generated sequence at the token that stops greedy decoding.
+
+    Assisted decoding accepts several draft tokens per step and only checks
+    the stopping criteria after the whole accepted chunk, so it can run past
+    the token where greedy decoding, checking after every token, stopped.
+
+    Parameters
+    ----------
+    output_ids : torch.LongTensor
+        The prompt and generated tokens of one sequence, ``(1, length)``.
+    prompt_length : int
+        The number of prompt tokens.
+    criteria : list of StoppingCriteria
+        The deterministic criteria both decoding paths stop on.
+
+    Returns
+    -------
+    torch.LongTensor
+        The shortest prefix a criterion stops on, or ``output_ids``.
+    """
+    for end in range(prompt_length + 1, output_ids.shape[-1]):
+        prefix = output_ids[:, :end]
+        if any(bool(criterion(prefix, None).any()) for criterion in criteria):
+            return prefix
+    return output_ids
+
 
-torch.set_default_device("cuda")
-torch.cuda.empty_cache()
+class CancelledCriteria(StoppingCriteria):
+    """
+    Stop at the next decode step once the request's cancellation token fires.
+    """
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> bool:
+        return is_cancelled()
+
+
+class LineEndCriteria(StoppingCriteria):
+    def __init__(self, prompt_length: int, tokenizer, eos_token_id: int):
+        """
+        Stop once a skeleton slot is finished by a newline or end of text.
+
+        Parameters
+        ----------
+        prompt_length : int
+            The number of tokens before the slot.
+        tokenizer : PreTrainedTokenizer
+            The tokenizer used to decode the last token.
+        eos_token_id : int
+            The id of the ``<|endoftext|>`` token.
+        """
+        self.prompt_length = prompt_length
+        self.tokenizer = tokenizer
+        self.eos_token_id = eos_token_id
+
+    def ends_slot(self, token: torch.LongTensor) -> bool:
+        if token[0] == self.eos_token_id:
+            return True
+        return "\n" in self.tokenizer.decode(token)
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> bool:
+        return input_ids.shape[-1] > self.prompt_length and self.ends_slot(input_ids[0, -1:])
+
+
+def crop_cache(cache, length: int):
+    """
+    Cut a key/value cache back to its first ``length`` positions.
+
+    Parameters
+    ----------
+    cache : tuple or transformers.Cache
+        The ``past_key_values`` returned by ``generate``.
+    length : int
+        The number of positions to keep.
+
+    Returns
+    -------
+    tuple or transformers.Cache
+        The cropped cache.
+    """
+    if hasattr(cache, "crop"):
+        cache.crop(length)
+        return cache
+    if hasattr(cache, "to_legacy_cache"):
+        cache = cache.to_legacy_cache()
+    return tuple(tuple(tensor[:, :, :length] for tensor in layer) for layer in cache)
 
 
 class Inference:
-    def __init__(self, model_name: str):
+    def __init__(
+        self,
+        model_name: str,
+        draft_model_name: "str | None" = None,
+        prefill_skeleton: bool = False,
+        compiled: bool = False,
+        adapters: "dict[str, str] | None" = None,
+        max_loaded_adapters: int = 4,
+    ):
         """
         Initialize the model.
 
@@ -17,17 +245,239 @@ class Inference:
         ----------
         model_name : str
             The name of the model to load.
+        draft_model_name : str, optional
+            The name of a small draft model sharing the tokenizer of
+            ``model_name``. When given, generation uses assisted decoding
+            with the same stopping criteria, and the output is cut where
+            greedy decoding would have stopped, so it matches greedy output.
+        prefill_skeleton : bool, default=False
+            Write the numpy sections, parameter names, annotations, defaults
+            and raised exceptions from the parsed signature into the output,
+            and let the model only generate the summary, descriptions and
+            missing types.
+        compiled : bool, default=False
+            Decode into a preallocated static key/value cache with a compiled
+            forward pass and SDPA attention, under ``torch.inference_mode``.
+            Pays a one-off compilation at load time for faster decode steps.
+        adapters : dict of str to str, optional
+            LoRA adapters fine-tuned from ``model_name``, by name. They are
+            loaded on top of the one base model the first time a request asks
+            for them.
+        max_loaded_adapters : int, default=4
+            Adapters kept resident before the least recently used is evicted.
         """
         self.model_name = model_name
+        self.draft_model_name = draft_model_name
+        self.prefill_skeleton = prefill_skeleton
+        self.signature_parser = TreesitterPython()
         doctify_logger.info(f"Loading Tokenizer and Model for {self.model_name}")
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
 
+        # a checkpoint from `doctify model prepare` is already in DTYPE and is
+        # memory-mapped from local safetensors
+        prepared_path = find_prepared_model(self.model_name, DTYPE_NAME)
+        model_path = prepared_path or self.model_name
+        if compiled:
+            reason = compile_unsupported(model_path)
+            if reason is not None:
+                doctify_logger.warning(
+                    f"{reason} in this transformers version, decoding eagerly"
+                )
+                compiled = False
+
+        start = time.perf_counter()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
         self.model = AutoModelForCausalLM.from_pretrained(
-            self.model_name,
-            torch_dtype=torch.float16,
-            device_map={"": 0},
+            model_path,
+            torch_dtype=DTYPE,
+            device_map={"": DEVICE},
+            low_cpu_mem_usage=True,
+            **({"attn_implementation": "sdpa"} if compiled else {}),
+        )
+        doctify_logger.info(
+            f"Loaded {self.model_name} from {'prepared cache ' if prepared_path else ''}"
+            f"{model_path} in {time.perf_counter() - start:.2f}s"
+        )
+
+        self.eos_token_id = self.tokenizer.convert_tokens_to_ids("<|endoftext|>")
+        self.token_budget = TokenBudget()
+        self.generated_tokens = 0
+        self.reducer = InputReducer(self.count_tokens)
+        self.prompt_tokens = self.count_tokens(default_prompt.format(code=""))
+
+        self.draft_model = None
+        self.assisted_stats = AssistedGenerationStats()
+        if self.draft_model_name:
+            self.load_draft_model(self.draft_model_name)
+
+        self.adapter_pool = None
+        if adapters:
+            from src.adapters import AdapterPool
+
+            self.adapter_pool = AdapterPool(self.model, adapters, max_loaded_adapters)
+
+        self.static_cache = None
+        self.static_cache_length = 0
+        self.compile_seconds = 0.0
+        if compiled:
+            self.compile_decoding()
+
+    def load_draft_model(self, draft_model_name: str):
+        """
+        Load the draft model used for assisted generation.
+
+        Parameters
+        ----------
+        draft_model_name : str
+            The name of the draft model to load.
+        """
+        doctify_logger.info(f"Loading draft model {draft_model_name}")
+        self.draft_model = AutoModelForCausalLM.from_pretrained(
+            draft_model_name,
+            torch_dtype=DTYPE,
+            device_map={"": DEVICE},
+        )
+
+        def count_target_forward(*_):
+            self.assisted_stats.target_forwards += 1
+
+        def count_draft_forward(*_):
+            self.assisted_stats.draft_forwards += 1
+
+        self.model.register_forward_hook(count_target_forward)
+        self.draft_model.register_forward_hook(count_draft_forward)
+
+    def compile_decoding(self):
+        """
+        Switch generation to a static key/value cache and a compiled decode step.
+
+        The cache is allocated once for the longest sequence a reduced input
+        plus the largest token budget can make, so decode steps always see
+        the same shapes and the compiled graph is reused. Prompts of varying
+        length are prefilled eagerly, only the one-token decode step runs
+        the compiled forward. The warmup pays the compilation up front.
+        Only called when ``compile_unsupported`` found the model class
+        supports SDPA attention and a static cache.
+        """
+        if self.draft_model is not None or self.prefill_skeleton or self.adapter_pool:
+            doctify_logger.warning(
+                "Compiled decoding does not combine with assisted, skeleton or adapter "
+                "generation, decoding eagerly"
+            )
+            return
+
+        from transformers import StaticCache
+
+        self.static_cache_length = max(
+            MAX_SEQ_LENGTH, self.prompt_tokens + MIN_INPUT_TOKENS + self.token_budget.max_tokens
+        )
+        with torch.inference_mode():
+            self.static_cache = StaticCache(
+                config=self.model.config,
+                max_batch_size=1,
+                max_cache_len=self.static_cache_length,
+                device=DEVICE,
+                dtype=DTYPE,
+            )
+
+        eager_forward = self.model.forward
+        compiled_forward = torch.compile(
+            eager_forward,
+            mode="reduce-overhead" if DEVICE == "cuda" else None,
+            fullgraph=True,
+            dynamic=False,
         )
 
+        def forward(*args, **kwargs):
+            input_ids = kwargs.get("input_ids", args[0] if args else None)
+            if input_ids is not None and input_ids.shape[-1] == 1:
+                return compiled_forward(*args, **kwargs)
+            return eager_forward(*args, **kwargs)
+
+        self.model.forward = forward
+
+        start = time.perf_counter()
+        self.warmup(COMPILE_WARMUP_TOKENS, runs=COMPILE_WARMUP_RUNS)
+        self.compile_seconds = time.perf_counter() - start
+        doctify_logger.info(
+            f"Compiled decoding with a {self.static_cache_length} token static cache, "
+            f"warmup took {self.compile_seconds:.2f}s"
+        )
+
+    def warmup(self, max_new_tokens: int = 1, runs: int = 1):
+        """
+        Run short generations so the first request is not slower than the rest.
+
+        Calls ``model.generate`` directly, so the warmup shows up neither in
+        the token budget statistics nor in ``generated_tokens``.
+
+        Parameters
+        ----------
+        max_new_tokens : int, default=1
+            Tokens generated per run, always all of them.
+        runs : int, default=1
+            The number of generations.
+        """
+        inputs = self.tokenizer(
+            default_prompt.format(code=WARMUP_CODE),
+            return_tensors="pt",
+            return_attention_mask=False,
+        )
+        with torch.inference_mode():
+            for _ in range(runs):
+                generate_kwargs = {}
+                if self.static_cache is not None:
+                    self.static_cache.reset()
+                    generate_kwargs = {"past_key_values": self.static_cache}
+                self.model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    min_new_tokens=max_new_tokens,
+                    eos_token_id=self.eos_token_id,
+                    **generate_kwargs,
+                )
+
+    def use_adapter(self, adapter: "str | None"):
+        """
+        Context in which the model generates with one LoRA adapter, or none.
+
+        Parameters
+        ----------
+        adapter : str, optional
+            The registered adapter name. None uses the base model.
+
+        Raises
+        ------
+        ValueError
+            When the adapter is not registered.
+        """
+        if self.adapter_pool is not None:
+            return self.adapter_pool.activate(adapter)
+        if adapter is not None:
+            raise ValueError(f"Unknown adapter {adapter}, no adapters are registered")
+        return contextlib.nullcontext()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def reduce_input(self, code: str, max_new_tokens: int) -> str:
+        """
+        Fit a function into the sequence length the model was fine-tuned on.
+
+        Parameters
+        ----------
+        code : str
+            The source code of the function.
+        max_new_tokens : int
+            The tokens reserved for the docstring.
+
+        Returns
+        -------
+        str
+            The code, reduced by ``InputReducer`` when it is too long.
+        """
+        max_input_tokens = MAX_SEQ_LENGTH - self.prompt_tokens - max_new_tokens
+        return self.reducer.reduce(code, max(max_input_tokens, MIN_INPUT_TOKENS))
+
     def post_process_text(self, output_text: str) -> str:
         """
         Post process the text output from the model.
@@ -49,7 +499,11 @@ class Inference:
         )
 
     def generate_docstring(
-        self, code: str, language: str = "python", max_new_tokens: int = 400
+        self,
+        code: str,
+        language: str = "python",
+        max_new_tokens: "int | None" = None,
+        adapter: "str | None" = None,
     ) -> str:
         """
         Generate a docstring from a code snippet.
@@ -60,8 +514,11 @@ class Inference:
             The code snippet to generate a docstring from.
         language : str, default=python
             The language to generate the docstring in.
-        max_length : int, default=400
-            The maximum length of the generated docstring.
+        max_new_tokens : int, optional
+            The maximum number of new tokens. Derived from the parameter count
+            and body length of ``code`` when not given.
+        adapter : str, optional
+            The LoRA adapter to generate with, the base model by default.
 
         Returns
         -------
@@ -79,25 +536,283 @@ class Inference:
         >>>    return x + 1
         >>>
         """
-        prompt = default_prompt.format(code=code)
+        if max_new_tokens is None:
+            max_new_tokens = self.token_budget.estimate(code)
+        if self.prefill_skeleton:
+            with self.use_adapter(adapter):
+                docstring = self.generate_from_skeleton(code, max_new_tokens)
+            if docstring is not None:
+                return docstring
+
+        prompt = default_prompt.format(code=self.reduce_input(code, max_new_tokens))
         inputs = self.tokenizer(
             prompt, return_tensors="pt", return_attention_mask=False
         )
+        prompt_length = inputs["input_ids"].shape[-1]
+        stop_criteria = [EndOfTextCriteria(self.eos_token_id), RepeatedNgramCriteria(prompt_length)]
+        stopping_criteria = StoppingCriteriaList([*stop_criteria, CancelledCriteria()])
+
+        generate_kwargs = {}
+        if self.draft_model is not None:
+            generate_kwargs = {"do_sample": False, "assistant_model": self.draft_model}
+        # inputs the reducer could not shrink enough decode eagerly
+        use_static_cache = (
+            self.static_cache is not None
+            and prompt_length + max_new_tokens <= self.static_cache_length
+        )
 
-        outputs = self.model.generate(**inputs, max_new_tokens=max_new_tokens)
+        with self.use_adapter(adapter), torch.inference_mode(use_static_cache):
+            if use_static_cache:
+                self.static_cache.reset()
+                generate_kwargs = {"past_key_values": self.static_cache}
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                stopping_criteria=stopping_criteria,
+                eos_token_id=self.eos_token_id,
+                **generate_kwargs,
+            )
+        if "assistant_model" in generate_kwargs:
+            outputs = trim_to_first_stop(outputs, prompt_length, stop_criteria)
+
+        used_tokens = outputs.shape[-1] - prompt_length
+        self.token_budget.record(max_new_tokens, used_tokens)
+        self.generated_tokens += used_tokens
+
+        if self.draft_model is not None:
+            self.assisted_stats.calls += 1
+            self.assisted_stats.generated_tokens += used_tokens
+            doctify_logger.debug(
+                "Assisted generation acceptance rate %.2f, %.2f tokens per step",
+                self.assisted_stats.acceptance_rate,
+                self.assisted_stats.tokens_per_step,
+            )
 
         return self.post_process_text(self.tokenizer.batch_decode(outputs)[0])
 
+    def generate_docstrings(
+        self,
+        codes: list[str],
+        language: str = "python",
+        max_new_tokens: "list[int | None] | None" = None,
+        adapter: "str | None" = None,
+    ) -> list[str]:
+        """
+        Generate the docstrings of several code snippets in one padded batch.
+
+        Rows finished by end of text or a repeated n-gram are padded while
+        the others keep decoding. Callers keep batches small, see
+        ``TransformersBackend.generate_batch``.
+
+        Parameters
+        ----------
+        codes : list of str
+            The code snippets to generate docstrings from.
+        language : str, default=python
+            The language to generate the docstrings in.
+        max_new_tokens : list of int, optional
+            The token budget of each snippet. The batch decodes up to the
+            largest budget and each output is cut to its own budget.
+        adapter : str, optional
+            The LoRA adapter the whole batch is generated with.
+
+        Returns
+        -------
+        list of str
+            The generated docstrings, in input order.
+        """
+        max_new_tokens = [
+            budget if budget is not None else self.token_budget.estimate(code)
+            for code, budget in zip(codes, max_new_tokens or [None] * len(codes))
+        ]
+        # assisted, skeleton and static cache generation only support a batch size of one
+        if (
+            len(codes) == 1
+            or self.draft_model is not None
+            or self.prefill_skeleton
+            or self.static_cache is not None
+        ):
+            return [
+                self.generate_docstring(code, language, budget, adapter)
+                for code, budget in zip(codes, max_new_tokens)
+            ]
+
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = "<|endoftext|>"
+        self.tokenizer.padding_side = "left"
+        inputs = self.tokenizer(
+            [
+                default_prompt.format(code=self.reduce_input(code, budget))
+                for code, budget in zip(codes, max_new_tokens)
+            ],
+            return_tensors="pt",
+            padding=True,
+        )
+        stopping_criteria = StoppingCriteriaList(
+            [RepeatedNgramCriteria(inputs["input_ids"].shape[-1]), CancelledCriteria()]
+        )
+        with self.use_adapter(adapter):
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=max(max_new_tokens),
+                stopping_criteria=stopping_criteria,
+                eos_token_id=self.eos_token_id,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+
+        docstrings = []
+        generated = outputs[:, inputs["input_ids"].shape[-1] :]
+        for tokens, budget in zip(generated, max_new_tokens):
+            tokens = tokens[:budget]
+            used_tokens = int((tokens != self.tokenizer.pad_token_id).sum())
+            self.token_budget.record(budget, used_tokens)
+            self.generated_tokens += used_tokens
+            docstrings.append(
+                self.post_process_text(
+                    self.tokenizer.decode(tokens).replace(self.tokenizer.pad_token, "")
+                )
+            )
+        return docstrings
+
+    def generate_from_skeleton(self, code: str, max_new_tokens: int) -> "str | None":
+        """
+        Generate only the parts of a docstring the signature does not tell.
+
+        The skeleton text is appended to the sequence and the model continues
+        it slot by slot, each slot ending at a newline. The key/value cache is
+        carried between slots, so only the new skeleton text is prefilled.
+
+        Parameters
+        ----------
+        code : str
+            The source code of the function.
+        max_new_tokens : int
+            The most tokens generated over all slots.
+
+        Returns
+        -------
+        str or None
+            The docstring, or None when the code has no parsable signature.
+        """
+        signature = self.signature_parser.parse_signature(code)
+        if signature is None:
+            return None
+
+        prompt = default_prompt.format(code=self.reduce_input(code, max_new_tokens))
+        state = {
+            "input_ids": self.tokenizer(prompt, return_tensors="pt")["input_ids"],
+            "cache": None,
+            "text": "",
+            "used_tokens": 0,
+        }
+
+        def generate_slot(docstring: str, slot: Slot) -> str:
+            input_ids = state["input_ids"]
+            skeleton_text = docstring[len(state["text"]) :]
+            if skeleton_text:
+                skeleton_ids = self.tokenizer(
+                    skeleton_text, add_special_tokens=False, return_tensors="pt"
+                )["input_ids"]
+                input_ids = torch.cat([input_ids, skeleton_ids], dim=-1)
+            max_tokens = min(slot.max_tokens, max_new_tokens - state["used_tokens"])
+            if max_tokens <= 0 or is_cancelled():
+                state["input_ids"], state["text"] = input_ids, docstring
+                return ""
+
+            line_end = LineEndCriteria(input_ids.shape[-1], self.tokenizer, self.eos_token_id)
+            outputs = self.model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=state["cache"],
+                max_new_tokens=max_tokens,
+                stopping_criteria=StoppingCriteriaList([line_end, CancelledCriteria()]),
+                eos_token_id=self.eos_token_id,
+                pad_token_id=self.eos_token_id,
+                return_dict_in_generate=True,
+            )
+            generated = outputs.sequences[0, input_ids.shape[-1] :]
+            state["used_tokens"] += generated.shape[-1]
+            # the newline or end of text closing the slot comes from the skeleton
+            if generated.shape[-1] and line_end.ends_slot(generated[-1:]):
+                generated = generated[:-1]
+
+            state["input_ids"] = torch.cat([input_ids, generated.unsqueeze(0)], dim=-1)
+            cached_length = state["input_ids"].shape[-1] - 1
+            state["cache"] = crop_cache(outputs.past_key_values, cached_length)
+            text = self.tokenizer.decode(generated).strip()
+            state["text"] = docstring + text
+            return text
+
+        docstring = fill_skeleton(
+            docstring_skeleton(signature, body_indentation(code)), generate_slot
+        )
+        self.token_budget.record(max_new_tokens, state["used_tokens"])
+        self.generated_tokens += state["used_tokens"]
+        return docstring
+
+    def log_assisted_stats(self):
+        """
+        Log the acceptance statistics of assisted generation.
+        """
+        stats = self.assisted_stats
+        if not stats.calls:
+            return
+        doctify_logger.info(
+            f"Assisted generation: {stats.calls} calls, {stats.generated_tokens} tokens, "
+            f"{stats.accepted_tokens}/{stats.draft_forwards} draft tokens accepted "
+            f"({stats.acceptance_rate:.1%}), {stats.tokens_per_step:.2f} tokens per target step"
+        )
+
+    def usage_stats(self) -> dict:
+        """
+        The counters ``close_llm`` reports, to merge those of model replicas.
+        """
+        return {
+            "generated_tokens": self.generated_tokens,
+            "token_budget": self.token_budget.usage,
+            "reduced_inputs": self.reducer.reduced_inputs,
+            "saved_tokens": self.reducer.saved_tokens,
+            "assisted": vars(self.assisted_stats),
+            "adapter_loads": self.adapter_pool.loads if self.adapter_pool else 0,
+            "adapter_evictions": self.adapter_pool.evictions if self.adapter_pool else 0,
+        }
+
+    def merge_usage_stats(self, stats: dict):
+        """
+        Add the counters of another replica, as returned by ``usage_stats``.
+        """
+        self.generated_tokens += stats["generated_tokens"]
+        self.token_budget.usage.update(stats["token_budget"])
+        self.reducer.reduced_inputs += stats["reduced_inputs"]
+        self.reducer.saved_tokens += stats["saved_tokens"]
+        for name, value in stats["assisted"].items():
+            setattr(self.assisted_stats, name, getattr(self.assisted_stats, name) + value)
+        if self.adapter_pool is not None:
+            self.adapter_pool.loads += stats["adapter_loads"]
+            self.adapter_pool.evictions += stats["adapter_evictions"]
+
     def close_llm(self):
         """
         Close the model and tokenizer.
 
         This is called automatically when the object is deleted.
         """
+        self.log_assisted_stats()
+        if self.adapter_pool is not None:
+            doctify_logger.info(f"Adapters: {self.adapter_pool.stats()}")
+        doctify_logger.info(f"Token budget usage:\n{self.token_budget.histogram()}")
+        if self.reducer.reduced_inputs:
+            doctify_logger.info(
+                f"Input reduction saved {self.reducer.saved_tokens} prompt tokens "
+                f"over {self.reducer.reduced_inputs} long functions"
+            )
         del self.model
+        del self.draft_model
+        del self.static_cache
         del self.tokenizer
 
-        torch.cuda.empty_cache()
+        if DEVICE == "cuda":
+            torch.cuda.empty_cache()
 
 
 if __name__ == "__main__":
@@ -112,7 +827,7 @@ if __name__ == "__main__":
         return source_code, docstring #re.sub('\s+', ' ', source_code)"""
 
     inference = Inference(model_name)
-    docstring = inference.generate_docstring(code, max_new_tokens=400)
+    docstring = inference.generate_docstring(code)
 
 
     print(docstring)
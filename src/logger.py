@@ -1,5 +1,59 @@
 import logging
 import sys
+import time
+from collections import OrderedDict
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(
+        self, max_per_interval: int = 20, interval: float = 1.0, max_messages: int = 1024
+    ):
+        """
+        Drop bursts of the same log message below WARNING.
+
+        Records are grouped by their unformatted message, so messages must be
+        logged with lazy ``%s`` arguments rather than f-strings to be limited.
+        Only the most recently logged messages are tracked, so f-string
+        messages cannot grow the filter without bound.
+
+        Parameters
+        ----------
+        max_per_interval : int, default=20
+            Records of one message let through per interval.
+        interval : float, default=1.0
+            Length of the interval in seconds.
+        max_messages : int, default=1024
+            Distinct messages tracked, the least recently logged are dropped.
+        """
+        super().__init__()
+        self.max_per_interval = max_per_interval
+        self.interval = interval
+        self.max_messages = max_messages
+        self.windows: OrderedDict[str, tuple[float, int, int]] = OrderedDict()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = record.msg
+        now = time.monotonic()
+        started, count, suppressed = self.windows.pop(key, (now, 0, 0))
+        if len(self.windows) >= self.max_messages:
+            self.windows.popitem(last=False)
+        if now - started >= self.interval:
+            if suppressed:
+                record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+            started, count, suppressed = now, 0, 0
+
+        if count >= self.max_per_interval:
+            self.windows[key] = (started, count, suppressed + 1)
+            return False
+
+        self.windows[key] = (started, count + 1, suppressed)
+        return True
+
 
 logging.basicConfig(stream=sys.stdout, level=logging.INFO)
 doctify_logger = logging.getLogger()
+for handler in doctify_logger.handlers:
+    handler.addFilter(RateLimitFilter())
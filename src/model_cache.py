@@ -0,0 +1,97 @@
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from src.logger import doctify_logger
+
+CACHE_DIR = Path(
+    os.environ.get("DOCTIFY_CACHE_DIR", Path.home() / ".cache" / "doctify" / "models")
+)
+MANIFEST_NAME = "doctify_cache.json"
+
+
+def prepared_model_path(model_name: str, dtype: str) -> Path:
+    """
+    Location of the prepared checkpoint of a model.
+
+    Parameters
+    ----------
+    model_name : str
+        The hub name or path of the model.
+    dtype : str
+        The torch dtype name, e.g. ``float16``.
+
+    Returns
+    -------
+    Path
+        The cache directory of the checkpoint.
+    """
+    return CACHE_DIR / f"{re.sub(r'[^A-Za-z0-9_.-]+', '--', model_name)}-{dtype}"
+
+
+def find_prepared_model(model_name: str, dtype: str) -> "Path | None":
+    """
+    Return the prepared checkpoint of a model if ``doctify model prepare`` ran.
+
+    Parameters
+    ----------
+    model_name : str
+        The hub name or path of the model.
+    dtype : str
+        The torch dtype name.
+
+    Returns
+    -------
+    Path or None
+        The checkpoint directory, or None if it is missing or incomplete.
+    """
+    path = prepared_model_path(model_name, dtype)
+    return path if (path / MANIFEST_NAME).exists() else None
+
+
+def prepare_model(model_name: str, dtype: "str | None" = None) -> Path:
+    """
+    Convert a model once into a ready-to-load local checkpoint.
+
+    The weights are saved in the target dtype as safetensors, which
+    ``from_pretrained`` memory-maps, and the tokenizer is saved alongside so
+    later loads need neither network access nor a dtype conversion.
+
+    Parameters
+    ----------
+    model_name : str
+        The hub name or path of the model.
+    dtype : str, optional
+        The torch dtype name the weights are stored in. Defaults to the
+        dtype ``Inference`` loads on this machine: float16 with CUDA,
+        float32 otherwise.
+
+    Returns
+    -------
+    Path
+        The checkpoint directory.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    dtype = dtype or ("float16" if torch.cuda.is_available() else "float32")
+    path = prepared_model_path(model_name, dtype)
+    doctify_logger.info(f"Preparing {model_name} as {dtype} in {path}")
+
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name, torch_dtype=getattr(torch, dtype), low_cpu_mem_usage=True
+    )
+
+    path.mkdir(parents=True, exist_ok=True)
+    model.save_pretrained(path, safe_serialization=True)
+    tokenizer.save_pretrained(path)
+    # the manifest is written last, so an interrupted prepare is never used
+    with open(path / MANIFEST_NAME, "w", encoding="utf-8") as manifest:
+        json.dump({"model_name": model_name, "dtype": dtype, "created": time.time()}, manifest)
+
+    doctify_logger.info(f"Prepared {model_name} in {time.perf_counter() - start:.1f}s")
+    return path
@@ -0,0 +1,303 @@
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Iterable
+
+import tree_sitter
+
+from src.budget import TokenBudget
+from src.constants import Language
+from src.logger import doctify_logger
+from src.profiler import profiler
+from src.prompts import default_prompt
+from src.treesitter import Treesitter, read_source
+from src.walker import PythonFileWalker
+
+CHARS_PER_TOKEN = 3.5
+DEFAULT_SECONDS_PER_TOKEN = 0.05
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without loading a tokenizer.
+
+    Parameters
+    ----------
+    text : str
+        The text to estimate.
+
+    Returns
+    -------
+    int
+        The estimated number of tokens.
+    """
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def is_public(name: str) -> bool:
+    return not name.startswith("_") or (name.startswith("__") and name.endswith("__"))
+
+
+def count_calls(node: tree_sitter.Node, counter: Counter):
+    """
+    Count the names called anywhere below a node.
+
+    Parameters
+    ----------
+    node : tree_sitter.Node
+        The node to search.
+    counter : Counter
+        Counter updated with the called function or method names.
+    """
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.type == "call":
+            function = current.child_by_field_name("function")
+            if function is not None and function.type == "attribute":
+                function = function.child_by_field_name("attribute")
+            if function is not None and function.type == "identifier":
+                counter[function.text.decode()] += 1
+        stack.extend(current.children)
+
+
+class FunctionTask:
+    __slots__ = (
+        "filepath",
+        "name",
+        "source_code",
+        "input_tokens",
+        "output_tokens",
+        "call_count",
+    )
+
+    def __init__(self, filepath: Path, name: str, source_code: str, output_tokens: int):
+        """
+        A function waiting for a docstring, with its estimated cost.
+
+        Parameters
+        ----------
+        filepath : Path
+            The file containing the function.
+        name : str
+            The name of the function.
+        source_code : str
+            The source code of the function.
+        output_tokens : int
+            The predicted number of generated tokens.
+        """
+        self.filepath = filepath
+        self.name = name
+        self.source_code = source_code
+        self.input_tokens = estimate_tokens(default_prompt.format(code=source_code))
+        self.output_tokens = output_tokens
+        self.call_count = 0
+
+    @property
+    def is_public(self) -> bool:
+        return is_public(self.name)
+
+    @property
+    def cost(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def priority(self) -> tuple:
+        """
+        Sort key ranking public functions first, then the most called and the
+        longest ones.
+        """
+        return (not self.is_public, -self.call_count, -len(self.source_code))
+
+
+class RunPlan:
+    def __init__(self, tasks: list[FunctionTask]):
+        """
+        Functions to document, ranked by value.
+
+        Parameters
+        ----------
+        tasks : list of FunctionTask
+            The functions to document.
+        """
+        self.tasks = sorted(tasks, key=FunctionTask.priority)
+
+    @classmethod
+    def build(
+        cls, filepaths: Iterable[Path], walker: "PythonFileWalker | None" = None
+    ) -> "RunPlan":
+        """
+        Parse files and plan the undocumented functions, without any model.
+
+        Parameters
+        ----------
+        filepaths : iterable of Path
+            The python files to plan.
+        walker : PythonFileWalker, optional
+            Skips the files it considers generated code.
+
+        Returns
+        -------
+        RunPlan
+            The ranked plan.
+        """
+        treesitter_parser = Treesitter.create_treesitter(Language.PYTHON)
+        token_budget = TokenBudget()
+        calls = Counter()
+        tasks = []
+
+        for filepath in filepaths:
+            try:
+                with profiler.stage("read", filepath):
+                    file_bytes = read_source(filepath)
+                if walker is not None and walker.skips_source(file_bytes):
+                    continue
+                with profiler.stage("parse", filepath):
+                    tree = treesitter_parser.parser.parse(file_bytes)
+                    nodes = treesitter_parser.methods_from_tree(tree, file_bytes)
+            except Exception as err:
+                doctify_logger.error(
+                    f"{filepath} -> Error while planning this file skipping... \t Error : {err}"
+                )
+                continue
+
+            count_calls(tree.root_node, calls)
+            for node in nodes:
+                if node.has_doc_comment or node.name_start < 0:
+                    continue
+                tasks.append(
+                    FunctionTask(
+                        filepath,
+                        node.name,
+                        node.method_source_code,
+                        token_budget.estimate(node.method_source_code),
+                    )
+                )
+
+        for task in tasks:
+            task.call_count = calls[task.name]
+        return cls(tasks)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(task.cost for task in self.tasks)
+
+    def report(self, seconds_per_token: float = DEFAULT_SECONDS_PER_TOKEN) -> str:
+        """
+        Format the plan as a table.
+
+        Parameters
+        ----------
+        seconds_per_token : float, default=0.05
+            The assumed generation speed used for the time estimate.
+
+        Returns
+        -------
+        str
+            The ranked functions with their estimated cost.
+        """
+        lines = [
+            f"{len(self.tasks)} functions to document, ~{self.total_tokens} tokens, "
+            f"~{self.total_tokens * seconds_per_token:.0f}s at {seconds_per_token}s/token",
+            "rank  public  calls  input  output  function",
+        ]
+        for rank, task in enumerate(self.tasks, 1):
+            lines.append(
+                f"{rank:>4}  {'yes' if task.is_public else 'no':>6}  {task.call_count:>5}"
+                f"  {task.input_tokens:>5}  {task.output_tokens:>6}  {task.filepath} -> {task.name}"
+            )
+        return "\n".join(lines)
+
+
+class BudgetedRun:
+    def __init__(
+        self,
+        plan: RunPlan,
+        time_budget: "float | None" = None,
+        token_budget: "int | None" = None,
+        start: "float | None" = None,
+    ):
+        """
+        Execute a plan within a wall-clock and token budget.
+
+        Parameters
+        ----------
+        plan : RunPlan
+            The ranked functions to document.
+        time_budget : float, optional
+            Wall-clock seconds available for the whole run, counted from
+            ``start``.
+        token_budget : int, optional
+            Estimated tokens (input plus output) available for generation.
+        start : float, optional
+            The ``time.perf_counter()`` the run started at, e.g. before the
+            plan was built and the model loaded. Defaults to now.
+        """
+        self.plan = plan
+        self.time_budget = time_budget
+        self.token_budget = token_budget
+        self.start = time.perf_counter() if start is None else start
+        self.covered: list[FunctionTask] = []
+        self.skipped: list[tuple[FunctionTask, str]] = []
+
+    def run(self, process: Callable[[FunctionTask], None]):
+        """
+        Process the planned functions in rank order until a budget runs out.
+
+        The time per token starts at ``DEFAULT_SECONDS_PER_TOKEN`` and is
+        measured on the generations as the run progresses, so a function is
+        only started when its predicted duration still fits in the time left.
+
+        Parameters
+        ----------
+        process : callable
+            Called with each function that fits the budgets.
+        """
+        generation_start = time.perf_counter()
+        spent_tokens = 0
+        seconds_per_token = DEFAULT_SECONDS_PER_TOKEN
+
+        for index, task in enumerate(self.plan.tasks):
+            if self.token_budget is not None and spent_tokens + task.cost > self.token_budget:
+                self.skipped.append((task, "token budget"))
+                continue
+
+            elapsed = time.perf_counter() - self.start
+            if self.time_budget is not None:
+                if elapsed + task.cost * seconds_per_token > self.time_budget:
+                    self.skipped.extend(
+                        (remaining, "time budget") for remaining in self.plan.tasks[index:]
+                    )
+                    break
+
+            try:
+                process(task)
+            except Exception as err:
+                doctify_logger.error(
+                    f"{task.filepath} -> {task.name} -> Error while generating docstring skipping... \t Error : {err}"
+                )
+                self.skipped.append((task, "error"))
+                continue
+
+            spent_tokens += task.cost
+            self.covered.append(task)
+            seconds_per_token = (time.perf_counter() - generation_start) / spent_tokens
+
+        self.elapsed = time.perf_counter() - self.start
+        self.spent_tokens = spent_tokens
+
+    def report(self) -> str:
+        """
+        Summarize what was and wasn't covered.
+
+        Returns
+        -------
+        str
+            The coverage report.
+        """
+        lines = [
+            f"Documented {len(self.covered)}/{len(self.plan.tasks)} functions in "
+            f"{self.elapsed:.1f}s using ~{self.spent_tokens} tokens"
+        ]
+        for task, reason in self.skipped:
+            lines.append(f"  not covered ({reason}): {task.filepath} -> {task.name}")
+        return "\n".join(lines)
@@ -0,0 +1,142 @@
+import cProfile
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+STAGES = ("walk", "read", "parse", "generate", "write")
+
+
+class StageStats:
+    __slots__ = ("seconds", "count", "tokens")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.count = 0
+        self.tokens = 0
+
+    def to_dict(self) -> dict:
+        return {"seconds": round(self.seconds, 6), "count": self.count, "tokens": self.tokens}
+
+
+DISABLED_STAGE = nullcontext(StageStats())
+
+
+class RunProfiler:
+    def __init__(self):
+        """
+        Wall time and counts of every stage of a run, per file and in aggregate.
+
+        A profiler is disabled until ``enable`` is called, in which case
+        ``stage`` returns a shared no-op context and costs next to nothing.
+        """
+        self.enabled = False
+        self.cprofile: "cProfile.Profile | None" = None
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.aggregate = defaultdict(StageStats)
+        self.files = defaultdict(lambda: defaultdict(StageStats))
+
+    def enable(self, with_cprofile: bool = False):
+        """
+        Start recording.
+
+        Parameters
+        ----------
+        with_cprofile : bool, default=False
+            Also run the cProfile profiler for the whole run.
+        """
+        self.enabled = True
+        self.reset()
+        if with_cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stage(self, name: str, filepath: "Path | str | None" = None):
+        """
+        Time a stage.
+
+        Parameters
+        ----------
+        name : str
+            The stage, one of walk, read, parse, generate or write.
+        filepath : Path or str, optional
+            The file the stage worked on.
+
+        Returns
+        -------
+        context manager
+            Yields the per-call stats, so callers can add token counts.
+        """
+        if not self.enabled:
+            return DISABLED_STAGE
+        return self._timed_stage(name, filepath)
+
+    @contextmanager
+    def _timed_stage(self, name: str, filepath: "Path | str | None"):
+        stats = StageStats()
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds = time.perf_counter() - start
+            stats.count = stats.count or 1
+            targets = [self.aggregate[name]]
+            if filepath is not None:
+                targets.append(self.files[str(filepath)][name])
+            for target in targets:
+                target.seconds += stats.seconds
+                target.count += stats.count
+                target.tokens += stats.tokens
+
+    def report(self) -> dict:
+        """
+        Build the run report.
+
+        Returns
+        -------
+        dict
+            Total wall time, aggregate stage stats and per-file stage stats.
+        """
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "stages": {name: stats.to_dict() for name, stats in self.aggregate.items()},
+            "files": {
+                filepath: {name: stats.to_dict() for name, stats in stages.items()}
+                for filepath, stages in self.files.items()
+            },
+        }
+
+    def summary(self) -> str:
+        lines = ["stage      count   seconds   tokens"]
+        for name in STAGES:
+            if name in self.aggregate:
+                stats = self.aggregate[name]
+                lines.append(f"{name:<9} {stats.count:>6} {stats.seconds:>9.3f} {stats.tokens:>8}")
+        return "\n".join(lines)
+
+    def write_report(self, report_path: Path, cprofile_path: "Path | None" = None):
+        """
+        Write the JSON run report and the cProfile dump.
+
+        Parameters
+        ----------
+        report_path : Path
+            Where to write the JSON report.
+        cprofile_path : Path, optional
+            Where to write the cProfile stats, readable by ``pstats``,
+            ``snakeviz`` or ``flameprof`` for a flame graph.
+        """
+        with open(report_path, "w", encoding="utf-8") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            if cprofile_path:
+                self.cprofile.dump_stats(cprofile_path)
+
+
+profiler = RunProfiler()
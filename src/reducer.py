@@ -0,0 +1,303 @@
+from typing import Callable
+
+import tree_sitter
+
+from src.constants import Language
+from src.logger import doctify_logger
+from src.planner import estimate_tokens
+from src.treesitter import Treesitter
+from src.treesitter.treesitter_py import NESTED_SCOPES
+
+MAX_SEQ_LENGTH = 690
+MIN_INPUT_TOKENS = 128
+RETURN_NODES = ("return_statement", "yield", "raise_statement")
+
+
+def contains_return(node: tree_sitter.Node) -> bool:
+    """
+    Check if a statement returns, yields or raises in the function's own scope.
+
+    Parameters
+    ----------
+    node : tree_sitter.Node
+        A statement of the function body.
+
+    Returns
+    -------
+    bool
+        True if the statement holds a return, yield or raise outside of
+        nested functions and classes.
+    """
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.type in RETURN_NODES:
+            return True
+        stack.extend(child for child in current.children if child.type not in NESTED_SCOPES)
+    return False
+
+
+def indented_blocks(source: bytes, node: tree_sitter.Node) -> list[tree_sitter.Node]:
+    """
+    The indented blocks of a compound statement, including its clauses'.
+
+    Parameters
+    ----------
+    source : bytes
+        The source the node was parsed from.
+    node : tree_sitter.Node
+        A statement.
+
+    Returns
+    -------
+    list of tree_sitter.Node
+        The blocks starting on a line of their own, in source order. Blocks
+        on the line of their header, like ``else: pass``, are left out.
+    """
+    blocks, stack = [], list(reversed(node.children))
+    while stack:
+        child = stack.pop()
+        if child.type == "block":
+            line_start = source.rfind(b"\n", 0, child.start_byte) + 1
+            if not source[line_start : child.start_byte].strip():
+                blocks.append(child)
+        elif child.type not in NESTED_SCOPES:
+            stack.extend(reversed(child.children))
+    return blocks
+
+
+def line_span(source: bytes, node: tree_sitter.Node) -> tuple[int, int]:
+    """
+    Widen a node to the full lines it spans, including the newline.
+    """
+    start = source.rfind(b"\n", 0, node.start_byte) + 1
+    end = source.find(b"\n", node.end_byte)
+    return start, len(source) if end == -1 else end + 1
+
+
+class InputReducer:
+    def __init__(self, count_tokens: Callable[[str], int] = estimate_tokens):
+        """
+        Shrink long functions to a token limit before they are prompted.
+
+        Comments and blank lines are stripped first. If the function is still
+        too long, the middle of its body is elided at statement boundaries,
+        keeping the signature, the leading statements and every statement
+        that returns, yields or raises. A kept compound statement that is too
+        long on its own, like a ``with`` or ``try`` wrapping the whole body,
+        is elided the same way inside each of its blocks.
+
+        Parameters
+        ----------
+        count_tokens : callable, default=estimate_tokens
+            Counts the tokens of a text, e.g. with the model's tokenizer.
+        """
+        self.count_tokens = count_tokens
+        self.parser = Treesitter.create_treesitter(Language.PYTHON).parser
+        self.reduced_inputs = 0
+        self.saved_tokens = 0
+
+    def reduce(self, code: str, max_tokens: int) -> str:
+        """
+        Reduce a function to at most ``max_tokens`` tokens where possible.
+
+        Parameters
+        ----------
+        code : str
+            The source code of the function.
+        max_tokens : int
+            The token limit of the reduced code.
+
+        Returns
+        -------
+        str
+            The code unchanged if it fits, the reduced code otherwise. The
+            signature and the return-relevant statements are never dropped,
+            so the result can still exceed the limit.
+        """
+        original_tokens = self.count_tokens(code)
+        if original_tokens <= max_tokens:
+            return code
+
+        reduced = self.strip_comments(code)
+        if self.count_tokens(reduced) > max_tokens:
+            reduced = self.elide_body(reduced, max_tokens)
+
+        reduced_tokens = self.count_tokens(reduced)
+        self.reduced_inputs += 1
+        self.saved_tokens += original_tokens - reduced_tokens
+        doctify_logger.info(
+            "Reduced a %d token function to %d tokens (limit %d)",
+            original_tokens,
+            reduced_tokens,
+            max_tokens,
+        )
+        return reduced
+
+    def strip_comments(self, code: str) -> str:
+        """
+        Remove the comments and blank lines of a function.
+        """
+        source = code.encode()
+        tree = self.parser.parse(source)
+        comments, stack = [], [tree.root_node]
+        while stack:
+            node = stack.pop()
+            if node.type == "comment":
+                comments.append((node.start_byte, node.end_byte))
+            else:
+                stack.extend(node.children)
+
+        chunks, position = [], 0
+        for start, end in sorted(comments):
+            chunks.append(source[position:start])
+            position = end
+        chunks.append(source[position:])
+        lines = b"".join(chunks).decode().splitlines()
+        return "\n".join(line.rstrip() for line in lines if line.strip())
+
+    def elide_body(self, code: str, max_tokens: int) -> str:
+        """
+        Drop body statements from the middle until the function fits.
+
+        Parameters
+        ----------
+        code : str
+            The function, without comments.
+        max_tokens : int
+            The token limit.
+
+        Returns
+        -------
+        str
+            The signature, the kept statements in order and a ``...`` line
+            for every run of dropped statements.
+        """
+        source = code.encode()
+        root = self.parser.parse(source).root_node
+        function = next(
+            (node for node in root.named_children if node.type == "function_definition"), None
+        )
+        body = function.child_by_field_name("body") if function is not None else None
+        if body is None or body.start_point[0] == function.start_point[0]:
+            return code
+
+        signature = source[: line_span(source, body.named_children[0])[0]].decode()
+        block = self.elide_block(source, body, max_tokens - self.count_tokens(signature))
+        return (signature + block).rstrip("\n")
+
+    def elide_block(self, source: bytes, block: tree_sitter.Node, max_tokens: int) -> str:
+        """
+        Drop statements from the middle of a block until it fits.
+
+        Parameters
+        ----------
+        source : bytes
+            The function the block was parsed from.
+        block : tree_sitter.Node
+            The block, starting on a line of its own.
+        max_tokens : int
+            The token limit of the block.
+
+        Returns
+        -------
+        str
+            The full lines of the kept statements and a ``...`` line for every
+            run of dropped statements. Kept statements that don't fit on
+            their own are reduced with ``elide_statement``, longest first.
+        """
+        # statements sharing a line, like ``a = 1; b = 2``, are kept or dropped together
+        statements, nodes, keep = [], [], []
+        for node in block.named_children:
+            start, end = line_span(source, node)
+            if statements and start < statements[-1][1]:
+                statements[-1] = (statements[-1][0], max(end, statements[-1][1]))
+                nodes[-1].append(node)
+                keep[-1] = keep[-1] or contains_return(node)
+            else:
+                statements.append((start, end))
+                nodes.append([node])
+                keep.append(contains_return(node))
+        keep[-1] = True
+
+        texts = [source[start:end].decode() for start, end in statements]
+        costs = [self.count_tokens(text) for text in texts]
+
+        indent = texts[0][: len(texts[0]) - len(texts[0].lstrip())]
+        elision_cost = self.count_tokens(f"{indent}...\n")
+        remaining = max_tokens - elision_cost
+        remaining -= sum(cost for cost, kept in zip(costs, keep) if kept)
+        kept_indices = [index for index, kept in enumerate(keep) if kept]
+        for index in sorted(kept_indices, key=costs.__getitem__, reverse=True):
+            if remaining >= 0:
+                break
+            if len(nodes[index]) > 1:
+                continue
+            texts[index] = self.elide_statement(
+                source, nodes[index][0], statements[index], costs[index] + remaining
+            )
+            cost = self.count_tokens(texts[index])
+            remaining += costs[index] - cost
+            costs[index] = cost
+
+        for index, cost in enumerate(costs):
+            if keep[index]:
+                continue
+            if cost > remaining:
+                break
+            keep[index] = True
+            remaining -= cost
+
+        parts, elided = [], False
+        for text, kept in zip(texts, keep):
+            if kept:
+                parts.append(text if text.endswith("\n") else text + "\n")
+                elided = False
+            elif not elided:
+                parts.append(f"{indent}...\n")
+                elided = True
+        return "".join(parts)
+
+    def elide_statement(
+        self, source: bytes, node: tree_sitter.Node, span: tuple[int, int], max_tokens: int
+    ) -> str:
+        """
+        Reduce a compound statement by eliding inside each of its blocks.
+
+        Parameters
+        ----------
+        source : bytes
+            The function the statement was parsed from.
+        node : tree_sitter.Node
+            The statement.
+        span : tuple of (int, int)
+            The full lines of the statement.
+        max_tokens : int
+            The token limit of the statement.
+
+        Returns
+        -------
+        str
+            The header lines, like ``with ...:``, ``except ...:`` or
+            ``else:``, kept as they are and every block elided in proportion
+            to its share of the statement. The statement unchanged if it has
+            no indented block.
+        """
+        blocks = indented_blocks(source, node)
+        if not blocks:
+            return source[span[0] : span[1]].decode()
+
+        spans = [line_span(source, block) for block in blocks]
+        headers, position = [], span[0]
+        for start, end in spans:
+            headers.append(source[position:start].decode())
+            position = end
+        headers.append(source[position : span[1]].decode())
+
+        costs = [self.count_tokens(source[start:end].decode()) for start, end in spans]
+        available = max_tokens - sum(self.count_tokens(header) for header in headers)
+        parts = [headers[0]]
+        for block, cost, header in zip(blocks, costs, headers[1:]):
+            parts.append(self.elide_block(source, block, available * cost // sum(costs)))
+            parts.append(header)
+        return "".join(parts)
@@ -0,0 +1,192 @@
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from src.budget import TokenBudget
+from src.planner import CHARS_PER_TOKEN, is_public
+from src.prompts import default_prompt
+from src.treesitter import TreesitterMethodNode, TreesitterPython, read_source
+from src.walker import PythonFileWalker, is_generated
+
+COUNTS = ("functions", "documented", "undocumented", "undocumented_public")
+TOKENS = ("input_tokens", "output_tokens")
+SCAN_CHUNK_SIZE = 32
+PROMPT_CHARS = len(default_prompt.format(code=""))
+# the parameter list following a function name, like ``RE_SIGNATURE`` on bytes
+RE_PARAMETERS = re.compile(rb"\s*\((.*?)\)\s*(?:->[^:]*)?:", re.DOTALL)
+IMPLICIT_PARAMETERS = (b"", b"self", b"cls", b"/")
+
+_parser: "TreesitterPython | None" = None
+_token_budget = TokenBudget()
+
+
+def count_parameters(file_bytes: bytes, node: TreesitterMethodNode) -> int:
+    match = RE_PARAMETERS.match(file_bytes, node.name_end)
+    if match is None:
+        return 0
+    names = (
+        parameter.split(b":")[0].split(b"=")[0].strip().lstrip(b"*")
+        for parameter in match.group(1).split(b",")
+    )
+    return sum(name not in IMPLICIT_PARAMETERS for name in names)
+
+
+def scan_file(filepath: Path, skip_generated: bool = True) -> "dict | None":
+    """
+    Count the documented and undocumented functions of a file.
+
+    Token estimates come from byte spans and line counts instead of the
+    decoded source, approximating ``estimate_tokens`` of the prompt and
+    ``TokenBudget.estimate`` without building either string.
+
+    Parameters
+    ----------
+    filepath : Path
+        The python file.
+    skip_generated : bool, default=True
+        Skip the file when it carries a generated-code marker.
+
+    Returns
+    -------
+    dict or None
+        The counts, the names of the undocumented public functions and the
+        estimated prompt and docstring tokens of documenting the rest, or
+        the error when the file cannot be read, parsed or decoded. None for
+        generated code.
+    """
+    global _parser
+    if _parser is None:
+        _parser = TreesitterPython()
+
+    result = {"path": str(filepath), **dict.fromkeys(COUNTS + TOKENS, 0), "missing": []}
+    try:
+        file_bytes = read_source(filepath)
+        if skip_generated and is_generated(file_bytes):
+            return None
+        for node in _parser.parse(file_bytes):
+            if node.name_start < 0:
+                continue
+            result["functions"] += 1
+            if node.has_doc_comment:
+                result["documented"] += 1
+                continue
+            result["undocumented"] += 1
+            code_bytes = node.end_byte - node.start_byte
+            result["input_tokens"] += int((PROMPT_CHARS + code_bytes) / CHARS_PER_TOKEN) + 1
+            result["output_tokens"] += _token_budget.estimate_counts(
+                count_parameters(file_bytes, node),
+                file_bytes.count(b"\n", node.start_byte, node.end_byte),
+            )
+            name = node.name
+            if is_public(name):
+                result["undocumented_public"] += 1
+                result["missing"].append(name)
+    except Exception as err:
+        # e.g. a Latin-1 file, whose names don't decode as UTF-8
+        result = {"path": str(filepath), **dict.fromkeys(COUNTS + TOKENS, 0), "missing": []}
+        result["error"] = repr(err)
+    return result
+
+
+def coverage(counts: dict) -> float:
+    return counts["documented"] / counts["functions"] if counts["functions"] else 1.0
+
+
+def scan_coverage(target: Path, walker: PythonFileWalker, jobs: "int | None" = None) -> dict:
+    """
+    Report the docstring coverage of a file or directory without any model.
+
+    Files are parsed in a pool of worker processes, in chunks, so a large
+    repository is scanned at tree-sitter speed on every core.
+
+    Parameters
+    ----------
+    target : Path
+        The python file or directory to scan.
+    walker : PythonFileWalker
+        The walker listing the python files of a directory.
+    jobs : int, optional
+        Worker processes, one per core by default. 1 scans in this process.
+
+    Returns
+    -------
+    dict
+        Totals, per-package (directory) rollups and per-file results, each
+        with counts, coverage and estimated tokens.
+    """
+    start = time.perf_counter()
+    root = target if target.is_dir() else target.parent
+    filepaths = list(walker.walk(target)) if target.is_dir() else [target]
+
+    scan = partial(scan_file, skip_generated=walker.skip_generated)
+    if jobs is None:
+        jobs = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    if jobs == 1 or len(filepaths) < SCAN_CHUNK_SIZE:
+        files = [scan(filepath) for filepath in filepaths]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            files = list(executor.map(scan, filepaths, chunksize=SCAN_CHUNK_SIZE))
+    files = [result for result in files if result is not None]
+
+    totals = dict.fromkeys(COUNTS + TOKENS + ("files", "errors"), 0)
+    packages = defaultdict(lambda: dict.fromkeys(COUNTS + TOKENS + ("files",), 0))
+    for result in files:
+        path = Path(result["path"])
+        result["path"] = path.relative_to(root).as_posix()
+        result["coverage"] = coverage(result)
+        package = packages[path.parent.relative_to(root).as_posix()]
+        package["files"] += 1
+        totals["files"] += 1
+        totals["errors"] += "error" in result
+        for key in COUNTS + TOKENS:
+            package[key] += result[key]
+            totals[key] += result[key]
+
+    for package in packages.values():
+        package["coverage"] = coverage(package)
+    totals["coverage"] = coverage(totals)
+    totals["seconds"] = time.perf_counter() - start
+    return {
+        "root": str(root),
+        "totals": totals,
+        "packages": dict(sorted(packages.items())),
+        "files": sorted(files, key=lambda result: result["path"]),
+    }
+
+
+def format_summary(report: dict, limit: int = 10) -> str:
+    """
+    Format the totals and the least covered packages.
+
+    Parameters
+    ----------
+    report : dict
+        The report from ``scan_coverage``.
+    limit : int, default=10
+        Packages listed.
+
+    Returns
+    -------
+    str
+        The summary.
+    """
+    totals = report["totals"]
+    lines = [
+        f"{totals['documented']}/{totals['functions']} functions documented "
+        f"({totals['coverage']:.1%}) in {totals['files']} files, "
+        f"{totals['undocumented_public']} undocumented public functions, "
+        f"~{totals['input_tokens'] + totals['output_tokens']} tokens to document the rest "
+        f"({totals['seconds']:.2f}s)"
+    ]
+    packages = sorted(
+        report["packages"].items(), key=lambda item: (item[1]["coverage"], -item[1]["functions"])
+    )
+    for name, package in packages[:limit]:
+        lines.append(
+            f"  {package['coverage']:7.1%}  {package['undocumented']:6d} undocumented  {name}"
+        )
+    return "\n".join(lines)
@@ -1,3 +1,4 @@
+import json
 import os
 import re
 from pathlib import Path
@@ -5,11 +6,14 @@ from typing import Optional
 
 import git
 import jsonlines
-import pandas
 
 from src.constants import Language
 from src.logger import doctify_logger
-from src.treesitter import Treesitter, TreesitterMethodNode
+from src.shards import dataset_shards, shard_path
+from src.treesitter import Treesitter, TreesitterMethodNode, read_source
+from src.walker import PythonFileWalker
+
+STATE_FILE = "scrape_state.json"
 
 
 class Scarper:
@@ -27,21 +31,108 @@ class Scarper:
         self.repo_url = repo_url
         self.repo_save_path = save_path
         self.repo_save_path += self.repo_url.split("/")[4]
-        self.ignores = [".git"]
+        self.walker = PythonFileWalker(max_file_size=None)
+        self.state_path = Path(save_path) / STATE_FILE
+        self.head_commit = None
+        self.previous_commit = None
+        self.tombstones = []
+
+    def load_state(self) -> dict:
+        """
+        Read the last scraped commit of every repo.
+
+        Returns
+        -------
+        dict
+            Repo URL to ``{"commit": sha, "shards": count}``.
+        """
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, shards: int):
+        """
+        Remember the scraped commit once its records are saved.
+
+        Parameters
+        ----------
+        shards : int
+            The number of incremental shards written on top of the full one.
+        """
+        state = self.load_state()
+        state[self.repo_url] = {"commit": self.head_commit, "shards": shards}
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.state_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, indent=2)
 
     def download_repo(self):
         """
         Download the repository to the local directory.
 
+        An existing clone is fetched and fast-forwarded instead of cloned
+        again.
+
         Parameters
         ----------
         repo_url : str
             The URL of the repository to download.
         repo_save_path : str
             The path to save the repository to.
+
+        Returns
+        -------
+        git.Repo
+            The up to date clone.
+        """
+        if not os.path.isdir(os.path.join(self.repo_save_path, ".git")):
+            doctify_logger.info(f"Cloning {self.repo_url} into {self.repo_save_path}")
+            return git.Repo.clone_from(self.repo_url, self.repo_save_path)
+
+        # an existing clone only needs the objects added upstream since
+        doctify_logger.info(f"Fetching {self.repo_url} into {self.repo_save_path}")
+        repo = git.Repo(self.repo_save_path)
+        repo.remotes.origin.fetch()
+        repo.git.reset("--hard", f"origin/{repo.active_branch.name}")
+        return repo
+
+    def changed_files(self, repo: "git.Repo") -> Optional[tuple[list[Path], list[Path]]]:
         """
-        doctify_logger.info(f"Cloning {self.repo_url} into {self.repo_save_path}")
-        git.Repo.clone_from(self.repo_url, self.repo_save_path)
+        Diff the last scraped commit against the fetched one.
+
+        Parameters
+        ----------
+        repo : git.Repo
+            The updated clone.
+
+        Returns
+        -------
+        tuple of (list of Path, list of Path) or None
+            The python files to extract and the files whose earlier records
+            are retracted, or None when there is no usable previous commit.
+        """
+        try:
+            previous = repo.commit(self.previous_commit)
+        except (ValueError, git.BadName, git.BadObject):
+            doctify_logger.warning(
+                f"{self.previous_commit} is not in {self.repo_save_path}, scraping everything"
+            )
+            return None
+
+        extract, tombstones = [], []
+        for diff in previous.diff(self.head_commit):
+            if diff.a_path and diff.a_path.endswith(".py") and not diff.new_file:
+                tombstones.append(Path(self.repo_save_path) / diff.a_path)
+            if diff.b_path and diff.b_path.endswith(".py") and not diff.deleted_file:
+                filepath = Path(self.repo_save_path) / diff.b_path
+                if self.accept_file(filepath):
+                    extract.append(filepath)
+        return extract, tombstones
+
+    def accept_file(self, filepath: Path) -> bool:
+        parts = filepath.relative_to(self.repo_save_path).parts
+        return not any(self.walker.is_excluded(part) for part in parts)
 
     def scrape_function_docstring(self):
         """
@@ -53,14 +144,12 @@ class Scarper:
             List of all function docstrings.
         """
         all_method_comments = []
+        treesitter_parser = Treesitter.create_treesitter(Language.PYTHON)
         for filename in self.filenames:
-            if not filename:
+            file_bytes = read_source(filename)
+            if self.walker.skips_source(file_bytes):
                 continue
 
-            with open(filename, "r") as file_content:
-                file_bytes = file_content.read().encode()
-
-            treesitter_parser = Treesitter.create_treesitter(Language.PYTHON)
             treesitterNodes: list[TreesitterMethodNode] = treesitter_parser.parse(
                 file_bytes
             )
@@ -97,6 +186,9 @@ class Scarper:
         """
         Scrape all function docstrings from the repo.
 
+        When a previous run saved the repo, only the python files added or
+        modified since the commit it scraped are extracted.
+
         Parameters
         ----------
         None
@@ -105,30 +197,27 @@ class Scarper:
         -------
         None
         """
-        self.download_repo()
+        repo = self.download_repo()
+        self.head_commit = repo.head.commit.hexsha
+        self.previous_commit = self.load_state().get(self.repo_url, {}).get("commit")
         self.all_file_paths = []
-        complete_filenames = []
-        for dirpath, dirnames, filenames in os.walk(self.repo_save_path):
-            if dirpath in self.ignores:
-                continue
-
-            complete_filenames.extend(
-                list(
-                    map(
-                        lambda x: (
-                            Path(dirpath) / x
-                            if os.path.splitext(x)[-1] == ".py"
-                            else None
-                        ),
-                        filenames,
-                    )
-                )
+        self.tombstones = []
+
+        changes = None
+        if self.previous_commit:
+            changes = self.changed_files(repo)
+        if changes is None:
+            self.previous_commit = None
+            self.filenames = list(self.walker.walk(self.repo_save_path))
+            doctify_logger.info(
+                f"{self.repo_save_path} repo has {len(self.filenames)} files"
+            )
+        else:
+            self.filenames, self.tombstones = changes
+            doctify_logger.info(
+                f"{self.repo_save_path} changed since {self.previous_commit[:12]}: "
+                f"{len(self.filenames)} files to extract, {len(self.tombstones)} retracted"
             )
-
-        self.filenames = set(complete_filenames)
-        doctify_logger.info(
-            f"{self.repo_save_path} repo has {len(self.filenames)} files"
-        )
         self.all_method_comments = self.scrape_function_docstring()
 
     def __clean_code__(self, source_code, docstring):
@@ -170,6 +259,10 @@ class Scarper:
             Path to save the jsonl file.
         """
         with jsonlines.open(data_save_path, mode="w") as writer:
+            writer.write_all(
+                {"filaname": str(filename), "tombstone": True}
+                for filename in self.tombstones
+            )
             writer.write_all(self.all_method_comments)
 
     def __save_as_csv__(self, data_save_path):
@@ -197,15 +290,26 @@ class Scarper:
         """
         os.makedirs(data_save_path, exist_ok=True)
 
-        filepath = (
-            Path(data_save_path) / f"docstrings_{self.repo_save_path.split('/')[-1]}"
-        )
+        dataset = f"docstrings_{self.repo_save_path.split('/')[-1]}"
         if filetype and filetype == "csv":
-            filepath = filepath.with_suffix(".csv")
+            filepath = (Path(data_save_path) / dataset).with_suffix(".csv")
             self.__save_as_csv__(filepath)
+            return
+
+        if self.previous_commit:
+            shards = self.load_state()[self.repo_url].get("shards", 0)
+            if not self.tombstones and not self.all_method_comments:
+                doctify_logger.info(f"{self.repo_url} has no python changes")
+                self.save_state(shards)
+                return
+            # an incremental scrape adds a shard on top of the earlier ones
+            shards += 1
         else:
-            filepath = filepath.with_suffix(".jsonl")
-            self.__save_as_jsonl__(filepath)
+            shards = 0
+            for stale in dataset_shards(data_save_path, dataset):
+                stale.unlink()
+        self.__save_as_jsonl__(shard_path(data_save_path, dataset, shards))
+        self.save_state(shards)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+import hashlib
+import re
+from pathlib import Path
+from typing import Iterator
+
+import jsonlines
+
+RE_SHARD = re.compile(r"(?P<dataset>.+?)(?:\.(?P<sequence>\d+))?\.jsonl")
+# share of the records kept out of training for ``doctify eval``
+HOLDOUT_FRACTION = 0.05
+
+
+def shard_path(directory: Path, dataset: str, sequence: int = 0) -> Path:
+    """
+    Location of one output shard of a dataset.
+
+    Parameters
+    ----------
+    directory : Path
+        The output directory.
+    dataset : str
+        The dataset name, e.g. ``docstrings_numpy``.
+    sequence : int, default=0
+        0 for the shard of a full scrape, then one more for every
+        incremental scrape on top of it.
+
+    Returns
+    -------
+    Path
+        ``<dataset>.jsonl`` or ``<dataset>.<sequence>.jsonl``.
+    """
+    if not sequence:
+        return Path(directory) / f"{dataset}.jsonl"
+    return Path(directory) / f"{dataset}.{sequence:04d}.jsonl"
+
+
+def dataset_shards(directory: Path, dataset: "str | None" = None) -> list[Path]:
+    """
+    List the shards of a directory in the order they were written.
+
+    Parameters
+    ----------
+    directory : Path
+        The output directory.
+    dataset : str, optional
+        Only list the shards of this dataset.
+
+    Returns
+    -------
+    list of Path
+        The shards, grouped by dataset and sorted by sequence.
+    """
+    shards = []
+    for path in Path(directory).glob("*.jsonl"):
+        match = RE_SHARD.fullmatch(path.name)
+        if match and dataset in (None, match["dataset"]):
+            shards.append((match["dataset"], int(match["sequence"] or 0), path))
+    return [path for _, _, path in sorted(shards)]
+
+
+def read_shards(paths: list[Path]) -> Iterator[dict]:
+    """
+    Read records from shards, dropping the ones tombstoned by later shards.
+
+    A tombstone ``{"filaname": ..., "tombstone": true}`` retracts every
+    earlier record of that file; records after it in the same or later
+    shards are kept.
+
+    Parameters
+    ----------
+    paths : list of Path
+        The shards, oldest first.
+
+    Yields
+    ------
+    dict
+        The live records, in shard order.
+    """
+    records: dict[str, list[dict]] = {}
+    for path in paths:
+        with jsonlines.open(path, "r") as reader:
+            for record in reader:
+                if record.get("tombstone"):
+                    records.pop(record["filaname"], None)
+                else:
+                    records.setdefault(record.get("filaname", ""), []).append(record)
+    for file_records in records.values():
+        yield from file_records
+
+
+def in_holdout(record: dict, fraction: float) -> bool:
+    """
+    Assign a record to the held-out split by hashing its location.
+
+    The split depends only on the file and method name, so it is stable
+    across runs. ``finetune`` trains without the records held out at
+    ``HOLDOUT_FRACTION``, so evaluating at that fraction, or a smaller one,
+    never scores a record the model was trained on.
+
+    Parameters
+    ----------
+    record : dict
+        A ``Scarper`` record.
+    fraction : float
+        Share of the records that are held out.
+
+    Returns
+    -------
+    bool
+        True if the record is held out.
+    """
+    key = f"{record.get('filaname', '')}::{record.get('method_name', '')}".encode()
+    bucket = int.from_bytes(hashlib.sha1(key).digest()[:4], "big") / 2**32
+    return bucket < fraction
@@ -0,0 +1,125 @@
+from typing import Callable
+
+from src.treesitter import FunctionSignature
+
+SUMMARY_TOKENS = 48
+DESCRIPTION_TOKENS = 32
+TYPE_TOKENS = 8
+
+
+class Slot:
+    __slots__ = ("kind", "max_tokens")
+
+    def __init__(self, kind: str, max_tokens: int):
+        """
+        A part of the docstring skeleton left for the model to write.
+
+        Parameters
+        ----------
+        kind : str
+            ``summary``, ``type`` or ``description``.
+        max_tokens : int
+            The most tokens the model may spend on it. Every slot ends at
+            the first newline.
+        """
+        self.kind = kind
+        self.max_tokens = max_tokens
+
+
+def body_indentation(code: str) -> str:
+    """
+    The indentation of the first body line, which docstring lines share.
+    """
+    body = code.split(":\n", 1)[-1]
+    for line in body.splitlines():
+        if line.strip():
+            return line[: len(line) - len(line.lstrip())]
+    return "    "
+
+
+def docstring_skeleton(signature: FunctionSignature, indent: str) -> list["str | Slot"]:
+    """
+    Lay out a numpy docstring with everything the signature already tells.
+
+    Section headers, parameter names, annotations, defaults, the return
+    annotation and the raised exceptions are fixed text. The summary, the
+    descriptions and any missing type are slots.
+
+    Parameters
+    ----------
+    signature : FunctionSignature
+        The parsed signature of the function.
+    indent : str
+        The indentation of the lines after the summary, like the fine-tuning
+        data which keeps the docstring's source indentation.
+
+    Returns
+    -------
+    list of str or Slot
+        The fixed text and the slots, in docstring order.
+    """
+    segments: list["str | Slot"] = [Slot("summary", SUMMARY_TOKENS), "\n"]
+
+    def section(header: str):
+        segments.append(f"\n{indent}{header}\n{indent}{'-' * len(header)}\n")
+
+    def entry(head: str, annotation: "str | None", suffix: str = ""):
+        if annotation is None:
+            segments.extend(
+                [f"{indent}{head}", Slot("type", TYPE_TOKENS), f"{suffix}\n{indent}    "]
+            )
+        else:
+            segments.append(f"{indent}{head}{annotation}{suffix}\n{indent}    ")
+        segments.extend([Slot("description", DESCRIPTION_TOKENS), "\n"])
+
+    if signature.parameters:
+        section("Parameters")
+        for parameter in signature.parameters:
+            suffix = f", default={parameter.default}" if parameter.default is not None else ""
+            entry(f"{parameter.prefix}{parameter.name} : ", parameter.annotation, suffix)
+
+    if signature.yields or signature.returns:
+        section("Yields" if signature.yields else "Returns")
+        entry("", signature.return_annotation)
+
+    if signature.raises:
+        section("Raises")
+        for exception in signature.raises:
+            entry("", exception)
+
+    # merge neighbouring text so every slot is preceded by one prefill
+    merged: list["str | Slot"] = []
+    for segment in segments:
+        if isinstance(segment, str) and merged and isinstance(merged[-1], str):
+            merged[-1] += segment
+        else:
+            merged.append(segment)
+    return merged
+
+
+def fill_skeleton(
+    segments: list["str | Slot"], generate_slot: Callable[[str, Slot], str]
+) -> str:
+    """
+    Render a skeleton, asking for the text of every slot in order.
+
+    Parameters
+    ----------
+    segments : list of str or Slot
+        The skeleton from ``docstring_skeleton``.
+    generate_slot : callable
+        Called with the docstring so far and the slot, returns the slot text
+        without a newline.
+
+    Returns
+    -------
+    str
+        The complete docstring.
+    """
+    docstring = ""
+    for segment in segments:
+        if isinstance(segment, Slot):
+            docstring += generate_slot(docstring, segment).strip()
+        else:
+            docstring += segment
+    return docstring.rstrip()
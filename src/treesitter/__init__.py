@@ -1,2 +1,3 @@
-from .treesitter import Treesitter, TreesitterMethodNode
-from .treesitter_py import TreesitterPython
+from .treesitter import Treesitter, TreesitterMethodNode, read_source
+from .treesitter_py import (FunctionFingerprint, FunctionSignature,
+                            SignatureParameter, TreesitterPython)
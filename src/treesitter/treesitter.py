@@ -1,4 +1,5 @@
 from abc import ABC
+from pathlib import Path
 
 import tree_sitter
 from tree_sitter_languages import get_language, get_parser
@@ -7,32 +8,105 @@ from src.constants import Language
 from src.treesitter.treesitter_registry import TreesitterRegistry
 
 
+def read_source(filepath: "Path | str") -> bytes:
+    """
+    Read a source file as bytes for parsing.
+
+    Line endings are normalized to ``\n`` like reading in text mode would,
+    so offsets and code match what the rest of doctify reads and writes.
+
+    Parameters
+    ----------
+    filepath : Path or str
+        The file to read.
+
+    Returns
+    -------
+    bytes
+        The file content.
+    """
+    with open(filepath, "rb") as file:
+        file_bytes = file.read()
+    if b"\r" in file_bytes:
+        file_bytes = file_bytes.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return file_bytes
+
+
+def node_span(node: "tree_sitter.Node | None") -> tuple[int, int]:
+    if node is None:
+        return -1, -1
+    return node.start_byte, node.end_byte
+
+
 class TreesitterMethodNode:
+    __slots__ = (
+        "source",
+        "start_byte",
+        "end_byte",
+        "name_start",
+        "name_end",
+        "doc_start",
+        "doc_end",
+    )
+
     def __init__(
         self,
-        name: "str | bytes | None",
-        doc_comment: "str | None",
-        method_source_code: "str | None",
-        node: tree_sitter.Node,
+        source: memoryview,
+        start_byte: int,
+        end_byte: int,
+        name_span: tuple[int, int] = (-1, -1),
+        doc_span: tuple[int, int] = (-1, -1),
     ):
         """
         Create a new method object.
 
+        The method only holds byte offsets into the source shared by all the
+        methods of a file. Text is decoded when accessed and no tree-sitter
+        objects are kept alive.
+
         Parameters
         ----------
-        name : str or bytes
-            The name of the method.
-        doc_comment : str or bytes or None
-            The doc comment of the method.
-        method_source_code : str or bytes or None
-            The source code of the method.
-        node : Node
-            The node of the method.
+        source : memoryview
+            The source of the whole file.
+        start_byte : int
+            Offset where the method starts.
+        end_byte : int
+            Offset where the method ends.
+        name_span : tuple of int, default=(-1, -1)
+            Offsets of the method name, (-1, -1) when it has none.
+        doc_span : tuple of int, default=(-1, -1)
+            Offsets of the doc comment, (-1, -1) when it has none.
         """
-        self.name = name
-        self.doc_comment = doc_comment
-        self.method_source_code = method_source_code or node.text.decode()
-        self.node = node
+        self.source = source
+        self.start_byte = start_byte
+        self.end_byte = end_byte
+        self.name_start, self.name_end = name_span
+        self.doc_start, self.doc_end = doc_span
+
+    def _decode(self, start: int, end: int) -> "str | None":
+        if start < 0:
+            return None
+        return str(self.source[start:end], "utf-8")
+
+    @property
+    def name(self) -> "str | None":
+        return self._decode(self.name_start, self.name_end)
+
+    @property
+    def doc_comment(self) -> "str | None":
+        return self._decode(self.doc_start, self.doc_end)
+
+    @property
+    def has_doc_comment(self) -> bool:
+        return self.doc_start >= 0
+
+    @property
+    def method_source_code(self) -> str:
+        return self._decode(self.start_byte, self.end_byte)
+
+    @property
+    def method_source_bytes(self) -> memoryview:
+        return self.source[self.start_byte : self.end_byte]
 
 
 class Treesitter(ABC):
@@ -81,14 +155,41 @@ class Treesitter(ABC):
         list of TreesitterMethodNode
             A list of method nodes.
         """
-        self.tree = self.parser.parse(file_bytes)
+        return self.methods_from_tree(self.parser.parse(file_bytes), file_bytes)
+
+    def methods_from_tree(
+        self, tree: tree_sitter.Tree, file_bytes: bytes
+    ) -> list[TreesitterMethodNode]:
+        """
+        Collect the method nodes of an already parsed file.
+
+        The tree is not kept, the nodes only hold byte offsets into
+        ``file_bytes``, so it is freed once the caller drops it.
+
+        Parameters
+        ----------
+        tree : tree_sitter.Tree
+            The parse tree of ``file_bytes``.
+        file_bytes : bytes
+            The parsed file bytes.
+
+        Returns
+        -------
+        list of TreesitterMethodNode
+            A list of method nodes.
+        """
+        source = memoryview(file_bytes)
         result = []
-        methods = self._query_all_methods(self.tree.root_node)
+        methods = self._query_all_methods(tree.root_node)
         for method in methods:
-            method_name = self._query_method_name(method["method"])
-            doc_comment = method["doc_comment"]
             result.append(
-                TreesitterMethodNode(method_name, doc_comment, None, method["method"])
+                TreesitterMethodNode(
+                    source,
+                    method["method"].start_byte,
+                    method["method"].end_byte,
+                    node_span(self._query_method_name_node(method["method"])),
+                    node_span(method["doc_comment"]),
+                )
             )
         return result
 
@@ -116,16 +217,16 @@ class Treesitter(ABC):
                 node.prev_named_sibling
                 and node.prev_named_sibling.type == self.doc_comment_identifier
             ):
-                doc_comment_node = node.prev_named_sibling.text.decode()
+                doc_comment_node = node.prev_named_sibling
             methods.append({"method": node, "doc_comment": doc_comment_node})
         else:
             for child in node.children:
                 methods.extend(self._query_all_methods(child))
         return methods
 
-    def _query_method_name(self, node: tree_sitter.Node):
+    def _query_method_name_node(self, node: tree_sitter.Node):
         """
-        Get the name of the method being called.
+        Get the identifier node of a method declaration.
 
         Parameters
         ----------
@@ -134,11 +235,11 @@ class Treesitter(ABC):
 
         Returns
         -------
-        str
-            The name of the method being called.
+        tree_sitter.Node or None
+            The identifier node.
         """
         if node.type == self.method_declaration_identifier:
             for child in node.children:
                 if child.type == self.method_name_identifier:
-                    return child.text.decode()
+                    return child
         return None
@@ -1,10 +1,116 @@
+import hashlib
+
 import tree_sitter
 
 from src.constants import Language
-from src.treesitter.treesitter import Treesitter, TreesitterMethodNode
+from src.treesitter.treesitter import (Treesitter, TreesitterMethodNode,
+                                       node_span)
 from src.treesitter.treesitter_registry import TreesitterRegistry
 
 
+NESTED_SCOPES = ("function_definition", "class_definition", "lambda")
+# nodes whose identifiers are bound by the construct, not read
+BINDING_PATTERNS = (
+    "pattern_list",
+    "tuple_pattern",
+    "list_pattern",
+    "list_splat_pattern",
+    "parenthesized_expression",
+    "as_pattern_target",
+)
+
+
+class SignatureParameter:
+    __slots__ = ("name", "annotation", "default", "prefix")
+
+    def __init__(
+        self,
+        name: str,
+        annotation: "str | None" = None,
+        default: "str | None" = None,
+        prefix: str = "",
+    ):
+        """
+        One parameter of a function signature.
+
+        Parameters
+        ----------
+        name : str
+            The parameter name.
+        annotation : str, optional
+            The source of the type annotation.
+        default : str, optional
+            The source of the default value.
+        prefix : str, default=""
+            ``*`` or ``**`` for variadic parameters.
+        """
+        self.name = name
+        self.annotation = annotation
+        self.default = default
+        self.prefix = prefix
+
+
+class FunctionSignature:
+    __slots__ = ("name", "parameters", "return_annotation", "returns", "yields", "raises")
+
+    def __init__(
+        self,
+        name: str,
+        parameters: list[SignatureParameter],
+        return_annotation: "str | None",
+        returns: bool,
+        yields: bool,
+        raises: list[str],
+    ):
+        """
+        What the parser knows about a function before it is documented.
+
+        Parameters
+        ----------
+        name : str
+            The function name.
+        parameters : list of SignatureParameter
+            The parameters, without ``self``, ``cls`` and separators.
+        return_annotation : str, optional
+            The source of the return annotation.
+        returns : bool
+            The function returns a value.
+        yields : bool
+            The function is a generator.
+        raises : list of str
+            The exception names raised in the function's own scope, in
+            order of first appearance.
+        """
+        self.name = name
+        self.parameters = parameters
+        self.return_annotation = return_annotation
+        self.returns = returns
+        self.yields = yields
+        self.raises = raises
+
+
+class FunctionFingerprint:
+    __slots__ = ("digest", "parameters")
+
+    def __init__(self, digest: str, parameters: list[str]):
+        """
+        The structure of a function with names that do not change its meaning
+        taken out.
+
+        Parameters
+        ----------
+        digest : str
+            Hash of the canonical form, equal for functions of the same name
+            that differ only in their parameter and local variable names,
+            comments, whitespace and docstring.
+        parameters : list of str
+            The parameter names in signature order, to map a docstring
+            written for one function onto another with the same digest.
+        """
+        self.digest = digest
+        self.parameters = parameters
+
+
 class TreesitterPython(Treesitter):
     def __init__(self):
         """
@@ -15,48 +121,282 @@ class TreesitterPython(Treesitter):
             Language.PYTHON, "function_definition", "identifier", "expression_statement"
         )
 
-    def parse(self, file_bytes: bytes) -> list[TreesitterMethodNode]:
+    def methods_from_tree(
+        self, tree: tree_sitter.Tree, file_bytes: bytes
+    ) -> list[TreesitterMethodNode]:
         """
-        Parse the given file bytes.
+        Collect the functions of an already parsed file.
 
         Parameters
         ----------
+        tree : tree_sitter.Tree
+            The parse tree of ``file_bytes``.
         file_bytes : bytes
-            The file bytes to parse.
+            The parsed file bytes.
 
         Returns
         -------
         list of TreesitterMethodNode
             The parsed methods.
         """
-        self.tree = self.parser.parse(file_bytes)
+        source = memoryview(file_bytes)
         result = []
-        methods = self._query_all_methods(self.tree.root_node)
+        methods = self._query_all_methods(tree.root_node)
         for method in methods:
-            method_name = self._query_method_name(method)
-            doc_comment = self._query_doc_comment(method)
-            result.append(TreesitterMethodNode(method_name, doc_comment, None, method))
+            result.append(
+                TreesitterMethodNode(
+                    source,
+                    method.start_byte,
+                    method.end_byte,
+                    node_span(self._query_method_name_node(method)),
+                    node_span(self._query_doc_comment_node(method)),
+                )
+            )
         return result
 
-    def _query_method_name(self, node: tree_sitter.Node):
+    def parse_signature(self, code: "str | bytes") -> "FunctionSignature | None":
+        """
+        Parse a function's source and extract its signature.
+
+        Parameters
+        ----------
+        code : str or bytes
+            The source code of the function.
+
+        Returns
+        -------
+        FunctionSignature or None
+            The signature, or None when the code holds no function.
+        """
+        source = code.encode() if isinstance(code, str) else bytes(code)
+        root = self.parser.parse(source).root_node
+        functions = [
+            node
+            for node in root.named_children
+            if node.type == self.method_declaration_identifier
+        ]
+        return self.extract_signature(functions[0]) if functions else None
+
+    def extract_signature(self, node: tree_sitter.Node) -> FunctionSignature:
         """
-        Get the name of the method being called.
+        Extract the parameters, return annotation and raised exceptions.
 
         Parameters
         ----------
         node : tree_sitter.Node
-            The node containing the method declaration.
+            The function definition.
 
         Returns
         -------
-        str
-            The name of the method being called.
+        FunctionSignature
+            The signature of the function.
         """
-        if node.type == self.method_declaration_identifier:
-            for child in node.children:
-                if child.type == self.method_name_identifier:
-                    return child.text.decode()
-        return None
+        parameters = []
+        for child in node.child_by_field_name("parameters").named_children:
+            parameter = self._signature_parameter(child)
+            if parameter is not None and parameter.name not in ("self", "cls"):
+                parameters.append(parameter)
+
+        return_type = node.child_by_field_name("return_type")
+        returns, yields, raises = False, False, []
+        stack = [node.child_by_field_name("body")]
+        while stack:
+            current = stack.pop()
+            if current.type == "return_statement" and current.named_child_count:
+                returns = True
+            elif current.type == "yield":
+                yields = True
+            elif current.type == "raise_statement" and current.named_child_count:
+                exception = current.named_children[0]
+                if exception.type == "call":
+                    exception = exception.child_by_field_name("function")
+                name = exception.text.decode()
+                if name not in raises:
+                    raises.append(name)
+            # children are pushed reversed so raises keep source order
+            stack.extend(
+                child
+                for child in reversed(current.children)
+                if child.type not in NESTED_SCOPES
+            )
+
+        return FunctionSignature(
+            self._query_method_name_node(node).text.decode(),
+            parameters,
+            return_type.text.decode() if return_type is not None else None,
+            returns,
+            yields,
+            raises,
+        )
+
+    def fingerprint(self, code: "str | bytes") -> "FunctionFingerprint | None":
+        """
+        Compute the structure-normalized fingerprint of a function.
+
+        The canonical form is the function name followed by the syntax tree
+        with comments and the docstring dropped, parameters renamed by
+        position and the other names bound in the function renamed in order
+        of binding. The name, annotations, defaults, literals, attributes,
+        keyword argument names and global names are kept as written: stub
+        bodies like ``raise NotImplementedError`` are shared by functions
+        that do very different things, and only the name tells them apart.
+
+        Parameters
+        ----------
+        code : str or bytes
+            The source code of the function.
+
+        Returns
+        -------
+        FunctionFingerprint or None
+            The fingerprint, or None when the code holds no function or
+            does not parse cleanly.
+        """
+        source = code.encode() if isinstance(code, str) else bytes(code)
+        root = self.parser.parse(source).root_node
+        functions = [
+            node
+            for node in root.named_children
+            if node.type == self.method_declaration_identifier
+        ]
+        if not functions or root.has_error:
+            return None
+        function = functions[0]
+
+        parameters = []
+        for child in function.child_by_field_name("parameters").named_children:
+            name = child.child_by_field_name("name")
+            if name is None:
+                name = child if child.type != "typed_parameter" else child.named_children[0]
+            if name.type in ("list_splat_pattern", "dictionary_splat_pattern"):
+                name = name.named_children[0]
+            if name.type == "identifier":
+                parameters.append(name.text.decode())
+        canonical = {name: f"p{index}" for index, name in enumerate(parameters)}
+
+        body = function.child_by_field_name("body")
+        declared_global = set()
+        for name in self._bound_names(body, declared_global):
+            if name not in canonical and name not in declared_global:
+                canonical[name] = f"v{len(canonical) - len(parameters)}"
+
+        docstring = self._query_doc_comment_node(function)
+        skipped = {function.child_by_field_name("name").id}
+        if docstring is not None and docstring.parent == body:
+            skipped.add(docstring.id)
+
+        tokens = [function.child_by_field_name("name").text.decode()]
+        stack = [function]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                tokens.append(")")
+                continue
+            if node.type == "comment" or node.id in skipped:
+                continue
+            if node.child_count == 0:
+                text = node.text.decode()
+                if node.type == "identifier" and not self._is_member_name(node):
+                    text = canonical.get(text, text)
+                tokens.append(text)
+                continue
+            if node.is_named:
+                tokens.append(f"({node.type}")
+                stack.append(None)
+            stack.extend(reversed(node.children))
+
+        digest = hashlib.sha1(" ".join(tokens).encode()).hexdigest()
+        return FunctionFingerprint(digest, parameters)
+
+    def _bound_names(self, node: tree_sitter.Node, declared_global: set) -> list[str]:
+        """
+        Names bound in a function body, in source order.
+
+        Assignment, loop, ``with``, ``except``, walrus, comprehension and
+        lambda targets and nested definitions count as bound. Names declared
+        ``global`` or ``nonlocal`` are added to ``declared_global``.
+        """
+        names = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.type in ("global_statement", "nonlocal_statement"):
+                declared_global.update(child.text.decode() for child in current.named_children)
+            targets = []
+            if current.type in (
+                "assignment",
+                "augmented_assignment",
+                "for_statement",
+                "for_in_clause",
+            ):
+                targets = [current.child_by_field_name("left")]
+            elif current.type == "as_pattern_target":
+                targets = [current]
+            elif current.type == "named_expression":
+                targets = [current.child_by_field_name("name")]
+            elif current.type == "lambda_parameters":
+                targets = current.named_children
+            elif current.type in ("function_definition", "class_definition"):
+                targets = [current.child_by_field_name("name")]
+                parameters = current.child_by_field_name("parameters")
+                targets.extend(parameters.named_children if parameters else [])
+            for target in targets:
+                names.extend(self._target_identifiers(target))
+            stack.extend(reversed(current.named_children))
+        return names
+
+    def _target_identifiers(self, node: "tree_sitter.Node | None") -> list[str]:
+        if node is None:
+            return []
+        if node.type == "identifier":
+            return [node.text.decode()]
+        if node.type in BINDING_PATTERNS:
+            return [
+                name for child in node.named_children for name in self._target_identifiers(child)
+            ]
+        if node.type in ("typed_parameter", "typed_default_parameter", "default_parameter"):
+            name = node.child_by_field_name("name") or node.named_children[0]
+            return self._target_identifiers(name)
+        if node.type in ("list_splat_pattern", "dictionary_splat_pattern"):
+            return self._target_identifiers(node.named_children[0])
+        return []
+
+    @staticmethod
+    def _is_member_name(node: tree_sitter.Node) -> bool:
+        """
+        Whether an identifier names an attribute or a keyword argument.
+        """
+        parent = node.parent
+        if parent is None:
+            return False
+        if parent.type == "attribute":
+            return parent.child_by_field_name("attribute") == node
+        if parent.type == "keyword_argument":
+            return parent.child_by_field_name("name") == node
+        return False
+
+    def _signature_parameter(self, node: tree_sitter.Node) -> "SignatureParameter | None":
+        """
+        Convert a node of a parameter list, None for the ``*`` and ``/`` separators.
+        """
+        annotation = node.child_by_field_name("type")
+        default = node.child_by_field_name("value")
+        name = node.child_by_field_name("name")
+        if name is None:
+            name = node if node.type != "typed_parameter" else node.named_children[0]
+
+        prefix = ""
+        if name.type in ("list_splat_pattern", "dictionary_splat_pattern"):
+            prefix = "*" if name.type == "list_splat_pattern" else "**"
+            name = name.named_children[0]
+        if name.type != "identifier":
+            return None
+        return SignatureParameter(
+            name.text.decode(),
+            annotation.text.decode() if annotation is not None else None,
+            default.text.decode() if default is not None else None,
+            prefix,
+        )
 
     def _query_all_methods(self, node: tree_sitter.Node):
         """
@@ -83,6 +423,37 @@ class TreesitterPython(Treesitter):
                         methods.append(child_node)
         return methods
 
+    def _query_doc_comment_node(self, node: tree_sitter.Node):
+        """
+        Query for the doc string node of a function definition.
+
+        Parameters
+        ----------
+        node : tree_sitter.Node
+            The node to query.
+
+        Returns
+        -------
+        tree_sitter.Node or None
+            The doc string node: the first statement of the function's own
+            body when it is a string. Docstrings of nested functions don't
+            count.
+        """
+        body = node.child_by_field_name("body")
+        if body is None:
+            return None
+        for statement in body.named_children:
+            if statement.type == "comment":
+                continue
+            if (
+                statement.type == self.doc_comment_identifier
+                and statement.named_child_count
+                and statement.named_children[0].type == "string"
+            ):
+                return statement
+            return None
+        return None
+
     def _query_doc_comment(self, node: tree_sitter.Node):
         """
         Query for doc string of a function definition.
@@ -97,17 +468,8 @@ class TreesitterPython(Treesitter):
         doc_str : str
             The doc string of the function definition.
         """
-        query_code = """
-            (function_definition
-                body: (block . (expression_statement (string)) @function_doc_str))
-        """
-        doc_str_query = self.language.query(query_code)
-        doc_strs = doc_str_query.captures(node)
-
-        if doc_strs:
-            return doc_strs[0][0].text.decode()
-        else:
-            return None
+        doc_str = self._query_doc_comment_node(node)
+        return doc_str.text.decode() if doc_str is not None else None
 
 
 # Register the TreesitterPython class in the registry
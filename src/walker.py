@@ -0,0 +1,282 @@
+import os
+import re
+from pathlib import Path
+from typing import Iterator
+
+DEFAULT_EXCLUDES = (
+    ".git",
+    ".hg",
+    ".svn",
+    ".venv",
+    "venv",
+    ".tox",
+    ".nox",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    "__pycache__",
+    "node_modules",
+    "site-packages",
+    "build",
+    "dist",
+    "*.egg-info",
+)
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+# only precise, case-sensitive markers on comment lines, so prose like "values
+# generated by the sampler" in a hand-written docstring doesn't hide the file
+GENERATED_PATTERN = r"@generated\b|^[ \t]*#[^\n]*\b(?:DO NOT EDIT|generated by SWIG)\b"
+GENERATED_HEAD_BYTES = 512
+RE_GENERATED = re.compile(GENERATED_PATTERN.encode(), re.MULTILINE)
+
+
+def is_generated(file_bytes: bytes) -> bool:
+    """
+    Tell whether the head of a file carries a generated-code marker.
+
+    Parameters
+    ----------
+    file_bytes : bytes
+        The file content, as read for parsing.
+
+    Returns
+    -------
+    bool
+        True when ``@generated``, or a comment line containing ``DO NOT EDIT``
+        or ``generated by SWIG``, appears in the first ``GENERATED_HEAD_BYTES``
+        bytes.
+
+    Examples
+    --------
+    >>> is_generated(b"# Generated by the protocol buffer compiler.  DO NOT EDIT!\\n")
+    True
+    >>> is_generated(b"# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!\\n")
+    True
+    >>> is_generated(b"# This file was automatically generated by SWIG (https://www.swig.org).\\n")
+    True
+    >>> is_generated(b"# Code generated by sqlc. DO NOT EDIT.\\n")
+    True
+    >>> is_generated(b"# @generated by thrift\\n")
+    True
+    >>> is_generated(b"# values generated by the sampler, do not edit them\\n")
+    False
+    >>> is_generated(b'x = "DO NOT EDIT"\\n')
+    False
+    """
+    return RE_GENERATED.search(file_bytes, 0, GENERATED_HEAD_BYTES) is not None
+
+
+def pattern_to_regex(pattern: str) -> re.Pattern:
+    """
+    Translate a gitignore glob into a regex matching relative posix paths.
+
+    Parameters
+    ----------
+    pattern : str
+        The glob, without negation, leading or trailing slashes.
+
+    Returns
+    -------
+    re.Pattern
+        The compiled regex.
+    """
+    regex, index = "", 0
+    while index < len(pattern):
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            regex += "(?:.*/)?"
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            regex += ".*"
+            index += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", index)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                regex += pattern[index : end + 1]
+                index = end
+        else:
+            regex += re.escape(char)
+        index += 1
+    return re.compile(regex + r"\Z")
+
+
+class IgnoreRule:
+    __slots__ = ("base", "regex", "negated", "dir_only", "anchored")
+
+    def __init__(self, base: str, line: str):
+        """
+        One pattern of a ``.gitignore`` file.
+
+        Parameters
+        ----------
+        base : str
+            Posix path of the directory holding the ``.gitignore``, relative
+            to the walk root ("" for the root).
+        line : str
+            The pattern line.
+        """
+        self.base = base
+        self.negated = line.startswith("!")
+        line = line[1:] if self.negated else line
+        self.dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        self.anchored = "/" in line
+        self.regex = pattern_to_regex(line.lstrip("/"))
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1 :]
+        if self.anchored:
+            return bool(self.regex.match(rel_path))
+        return bool(self.regex.match(rel_path.rsplit("/", 1)[-1]))
+
+
+def read_gitignore(directory: str, base: str) -> list[IgnoreRule]:
+    """
+    Read the rules of the ``.gitignore`` in a directory, if any.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to look in.
+    base : str
+        The directory relative to the walk root.
+
+    Returns
+    -------
+    list of IgnoreRule
+        The rules in file order.
+    """
+    try:
+        with open(os.path.join(directory, ".gitignore"), "r", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return []
+    return [
+        IgnoreRule(base, line.strip())
+        for line in lines
+        if line.strip() and not line.startswith("#")
+    ]
+
+
+class PythonFileWalker:
+    def __init__(
+        self,
+        excludes: "tuple[str, ...] | list[str]" = DEFAULT_EXCLUDES,
+        use_gitignore: bool = True,
+        max_file_size: "int | None" = DEFAULT_MAX_FILE_SIZE,
+        skip_generated: bool = True,
+        follow_symlinks: bool = True,
+    ):
+        """
+        Stream the python files of a tree, pruning ignored directories.
+
+        Parameters
+        ----------
+        excludes : sequence of str, default=DEFAULT_EXCLUDES
+            Glob patterns of file or directory names never walked into.
+        use_gitignore : bool, default=True
+            Also prune paths matched by ``.gitignore`` files in the tree.
+        max_file_size : int, optional, default=1 MiB
+            Skip files larger than this many bytes.
+        skip_generated : bool, default=True
+            Skip files whose first bytes carry a generated-code marker. The
+            marker is checked on the bytes read for parsing, by
+            ``skips_source``, so files are not opened twice.
+        follow_symlinks : bool, default=True
+            Follow symlinked directories, skipping any already visited so
+            symlink loops are walked only once.
+        """
+        self.excludes = [pattern_to_regex(pattern) for pattern in excludes]
+        self.use_gitignore = use_gitignore
+        self.max_file_size = max_file_size
+        self.skip_generated = skip_generated
+        self.follow_symlinks = follow_symlinks
+
+    def is_excluded(self, name: str) -> bool:
+        return any(regex.match(name) for regex in self.excludes)
+
+    def skips_source(self, file_bytes: bytes) -> bool:
+        return self.skip_generated and is_generated(file_bytes)
+
+    def walk(self, start_dir: "Path | str") -> Iterator[Path]:
+        """
+        Yield the python files below a directory.
+
+        Parameters
+        ----------
+        start_dir : Path or str
+            The directory to walk.
+
+        Yields
+        ------
+        Path
+            The python files, lazily, in directory order.
+        """
+        root = os.fspath(start_dir)
+        visited = set()
+        stack = [(root, "", [])]
+
+        while stack:
+            directory, rel_dir, rules = stack.pop()
+            try:
+                stat = os.stat(directory)
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) in visited:
+                continue
+            visited.add((stat.st_dev, stat.st_ino))
+
+            if self.use_gitignore:
+                rules = rules + read_gitignore(directory, rel_dir)
+
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+
+            subdirs = []
+            for entry in entries:
+                if self.is_excluded(entry.name):
+                    continue
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=self.follow_symlinks)
+                except OSError:
+                    continue
+                if self.ignored(rules, rel_path, is_dir):
+                    continue
+
+                if is_dir:
+                    subdirs.append((entry.path, rel_path, rules))
+                elif entry.name.endswith(".py") and self.accept_file(entry):
+                    yield Path(entry.path)
+
+            stack.extend(reversed(subdirs))
+
+    def ignored(self, rules: list[IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+        ignored = False
+        for rule in rules:
+            if rule.matches(rel_path, is_dir):
+                ignored = not rule.negated
+        return ignored
+
+    def accept_file(self, entry: os.DirEntry) -> bool:
+        if self.max_file_size is not None:
+            try:
+                if entry.stat().st_size > self.max_file_size:
+                    return False
+            except OSError:
+                return False
+        return True
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import queue
+import time
+from pathlib import Path
+
+from src import doctify
+from src.logger import doctify_logger
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+def file_hash(filepath: Path) -> "str | None":
+    """
+    Hash the content of a file.
+
+    Parameters
+    ----------
+    filepath : Path
+        The file to hash.
+
+    Returns
+    -------
+    str or None
+        The sha1 hex digest, or None if the file cannot be read.
+    """
+    try:
+        with open(filepath, "rb") as file:
+            return hashlib.sha1(file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class ChangeQueueHandler(FileSystemEventHandler):
+    def __init__(self, changes: queue.Queue):
+        """
+        Forward file system events for python files to a queue.
+
+        Parameters
+        ----------
+        changes : queue.Queue
+            Queue receiving the changed paths.
+        """
+        super().__init__()
+        self.changes = changes
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if path and path.endswith(".py"):
+                self.changes.put(Path(path))
+
+
+class DocumentWatcher:
+    def __init__(self, root: Path, debounce: float = 1.0, poll_interval: float = 1.0):
+        """
+        Keep the model loaded and document python files as they change.
+
+        File system events come from inotify through ``watchdog`` when it is
+        installed and from polling modification times otherwise.
+
+        Parameters
+        ----------
+        root : Path
+            The directory to watch.
+        debounce : float, default=1.0
+            Seconds a file must stay unchanged before it is processed, so a
+            burst of saves is handled once.
+        poll_interval : float, default=1.0
+            Seconds between scans when polling.
+        """
+        self.root = root
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.changes = queue.Queue()
+        self.pending: dict[Path, float] = {}
+        self.processed_hashes: dict[Path, str] = {}
+        self.mtimes: dict[Path, float] = {}
+
+    def is_watched(self, filepath: Path) -> bool:
+        try:
+            parts = filepath.relative_to(self.root).parts
+        except ValueError:
+            return False
+        return not any(doctify.walker.is_excluded(part) for part in parts)
+
+    def snapshot(self):
+        """
+        Record the current state of the tree without documenting it.
+        """
+        for filepath in doctify.iter_python_files(self.root):
+            self.processed_hashes[filepath] = file_hash(filepath)
+            self.mtimes[filepath] = os.stat(filepath).st_mtime
+
+    def poll(self):
+        """
+        Queue the files whose modification time changed since the last scan.
+        """
+        for filepath in doctify.iter_python_files(self.root):
+            try:
+                mtime = os.stat(filepath).st_mtime
+            except OSError:
+                continue
+            if self.mtimes.get(filepath) != mtime:
+                self.mtimes[filepath] = mtime
+                self.changes.put(filepath)
+
+    def process(self, filepath: Path):
+        """
+        Document the undocumented functions of a changed file.
+
+        The hash of the file is recorded after processing, so the write
+        doctify makes itself does not trigger another round.
+
+        Parameters
+        ----------
+        filepath : Path
+            The changed file.
+        """
+        current_hash = file_hash(filepath)
+        if current_hash is None or self.processed_hashes.get(filepath) == current_hash:
+            return
+
+        doctify_logger.info("%s changed, documenting...", filepath)
+        doctify.generate_docstring_for_file(filepath)
+        self.processed_hashes[filepath] = file_hash(filepath)
+
+    def run(self, initial: bool = False):
+        """
+        Watch the tree until interrupted.
+
+        Parameters
+        ----------
+        initial : bool, default=False
+            Document the whole tree once before watching.
+        """
+        backend = doctify.get_inference()
+        backend.warmup()
+
+        if initial:
+            doctify.generate_docstring_for_directory(self.root)
+        self.snapshot()
+
+        observer = None
+        if Observer is not None:
+            observer = Observer()
+            observer.schedule(ChangeQueueHandler(self.changes), str(self.root), recursive=True)
+            observer.start()
+            doctify_logger.info(f"Watching {self.root} for changes")
+        else:
+            doctify_logger.info(
+                f"Watching {self.root} by polling every {self.poll_interval}s, "
+                "install watchdog for inotify events"
+            )
+
+        try:
+            while True:
+                if observer is None:
+                    self.poll()
+                self.wait_for_changes()
+                self.process_settled()
+        except KeyboardInterrupt:
+            doctify_logger.info("Stopped watching")
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def wait_for_changes(self):
+        timeout = self.poll_interval if self.pending or Observer is None else None
+        try:
+            while True:
+                filepath = self.changes.get(timeout=timeout)
+                if self.is_watched(filepath):
+                    self.pending[filepath] = time.monotonic()
+                timeout = min(self.debounce, self.poll_interval)
+        except queue.Empty:
+            pass
+
+    def process_settled(self):
+        now = time.monotonic()
+        for filepath, changed_at in list(self.pending.items()):
+            if now - changed_at >= self.debounce:
+                del self.pending[filepath]
+                if filepath.exists():
+                    self.process(filepath)